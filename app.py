@@ -1,14 +1,33 @@
 import discord
 from discord import ui
-from discord.ext import commands, tasks
-import json
+from discord.ext import commands
 import os
+import subprocess
+import sys
 import time
 import datetime
-import random
 import asyncio
+import functools
+import hashlib
+import json
+import tempfile
+from collections import Counter, OrderedDict
+from typing import Literal
 from dotenv import load_dotenv
 
+from archive import GiveawayArchive
+from coalescer import UpdateCoalescer
+from eligibility import EligibilityRules, entry_weight, parse_bonus_roles, parse_role_ids
+from export import export_records, write_export
+from fanout import FanOut
+from locks import LockManager
+from monitoring import LoopLagMonitor, MetricsRegistry, MetricsServer, SamplingProfiler
+from outbound import ACK, COSMETIC, RESULT, OutboundQueue
+from router import InteractionRouter
+from scheduler import DeadlineScheduler
+from selection import draw_weighted, draw_winners
+from storage import AsyncDatabase, Database, VersionConflict, create_backend, is_message_id, migrate_json_to_sqlite
+
 # Carrega variáveis de ambiente do arquivo .env
 load_dotenv()
 
@@ -16,11 +35,55 @@ load_dotenv()
 intents = discord.Intents.default()
 intents.message_content = True
 
-# Defina seu bot
-bot = commands.Bot(command_prefix='!', intents=intents)
+# --- Sharding ---
+# SHARD_COUNT ativa o modo com shards; SHARD_IDS ("0-3" ou "0,2") limita quais este processo atende.
+# SHARD_PROCESSES > 1 faz este processo apenas dividir os shards entre N processos filhos.
+def parse_shard_ids(value):
+    ids = []
+    for part in value.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            ids.extend(range(int(first), int(last) + 1))
+        elif part.strip():
+            ids.append(int(part))
+    return ids
+
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = parse_shard_ids(os.getenv("SHARD_IDS", "")) or None
+SHARD_PROCESSES = int(os.getenv("SHARD_PROCESSES", "1"))
 
-# Nome do arquivo de banco de dados
-DB_FILE = "data.json"
+# Defina seu bot
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(command_prefix='!', intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+else:
+    bot = commands.Bot(command_prefix='!', intents=intents)
+
+# Banco de dados: "sqlite" (padrão) ou "json" (formato legado)
+DB_BACKEND = os.getenv("DB_BACKEND", "sqlite")
+DB_FILE = os.getenv("DB_FILE", "data.db" if DB_BACKEND == "sqlite" else "data.json")
+LEGACY_DB_FILE = "data.json"
+# Backend JSON: registros no journal entre um snapshot completo e outro
+JOURNAL_SNAPSHOT_EVERY = int(os.getenv("JOURNAL_SNAPSHOT_EVERY", "1000"))
+
+# Limite de durabilidade da fila de entradas: grava a cada N entradas ou N ms
+WRITE_BEHIND_MAX_ENTRIES = int(os.getenv("WRITE_BEHIND_MAX_ENTRIES", "500"))
+WRITE_BEHIND_MAX_MS = int(os.getenv("WRITE_BEHIND_MAX_MS", "200"))
+
+# Memória máxima do cache de leitura dos sorteios (dados sem participantes)
+GIVEAWAY_CACHE_MB = float(os.getenv("GIVEAWAY_CACHE_MB", "16"))
+
+# Bloqueios do event loop acima deste limite são registrados no log
+LOOP_LAG_THRESHOLD_MS = int(os.getenv("LOOP_LAG_THRESHOLD_MS", "250"))
+
+# Endpoint HTTP local de métricas (0 desliga); cada processo de shard usa porta + índice
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+SHARD_PROCESS_INDEX = int(os.getenv("SHARD_PROCESS_INDEX", "0"))
+# Habilita /profile/start e /profile/stop no endpoint de métricas
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+
+# Hash da última árvore de comandos sincronizada: só sincroniza de novo se ela mudar
+COMMAND_HASH_FILE = os.getenv("COMMAND_HASH_FILE", ".commands.sha256")
 
 # --- Constantes de ID para Componentes (Devem ser INT) ---
 ID_TITLE = 100
@@ -31,71 +94,118 @@ ID_DATE = 104
 ID_WINNERS_COUNT = 105
 ID_BTN_PARTICIPATE = 106
 ID_BTN_PARTICIPANTS_COUNT = 107
+ID_REQUIREMENTS = 108
+ID_BONUS = 109
 ID_WINNER_SECTION_BASE = 200 # Base para IDs dinâmicos de ganhadores
 
-# --- Gerenciamento de Banco de Dados JSON ---
-class Database:
-    def __init__(self, filename):
-        self.filename = filename
-        self.check_file()
-
-    def check_file(self):
-        if not os.path.exists(self.filename):
-            with open(self.filename, 'w', encoding='utf-8') as f:
-                json.dump({"giveaways": {}}, f, indent=4)
-
-    def load(self):
-        try:
-            with open(self.filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {"giveaways": {}}
-
-    def save(self, data):
-        with open(self.filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-
-    def get_giveaway(self, message_id):
-        data = self.load()
-        return data["giveaways"].get(str(message_id))
-
-    def update_giveaway(self, message_id, update_data):
-        data = self.load()
-        str_id = str(message_id)
-        if str_id not in data["giveaways"]:
-            data["giveaways"][str_id] = {}
-        data["giveaways"][str_id].update(update_data)
-        self.save(data)
-    
-    def end_giveaway_db(self, message_id):
-        """Marca um sorteio como finalizado no DB sem apagar os dados"""
-        self.update_giveaway(message_id, {"status": "ended"})
-
-    def add_participant(self, message_id, user_id):
-        data = self.load()
-        str_id = str(message_id)
-        if str_id in data["giveaways"]:
-            if "participants" not in data["giveaways"][str_id]:
-                data["giveaways"][str_id]["participants"] = []
-            
-            # Verifica se já existe (int ou str) para evitar duplicatas
-            participants = data["giveaways"][str_id]["participants"]
-            if user_id not in participants and str(user_id) not in participants:
-                # Salva sempre como INT para padronizar
-                data["giveaways"][str_id]["participants"].append(int(user_id))
-                self.save(data)
-                return True
-        return False
-
-db = Database(DB_FILE)
+# Janela mínima entre duas edições do contador "N participando" da mesma mensagem
+COUNTER_UPDATE_WINDOW_MS = int(os.getenv("COUNTER_UPDATE_WINDOW_MS", "2000"))
+
+# Encerramento em lote: edições de resultado em paralelo (teto global e por canal)
+FINALIZE_CONCURRENCY = int(os.getenv("FINALIZE_CONCURRENCY", os.getenv("RECOVERY_CONCURRENCY", "10")))
+FINALIZE_PER_CHANNEL = int(os.getenv("FINALIZE_PER_CHANNEL", "1"))
+FINALIZE_RETRIES = int(os.getenv("FINALIZE_RETRIES", "4"))
+# Sorteios sorteados e gravados por transação
+FINALIZE_BATCH = 100
+
+# Chamadas à API em voo ao mesmo tempo, pela fila de prioridades
+OUTBOUND_CONCURRENCY = int(os.getenv("OUTBOUND_CONCURRENCY", "50"))
+
+# Quantidade de views mantidas no cache de renderização (LRU)
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "256"))
+
+# Locks que serializam as mutações de cada sorteio (fixos, divididos por faixas)
+LOCK_STRIPES = int(os.getenv("LOCK_STRIPES", "256"))
+
+# Sorteios encerrados há mais de N dias saem do banco para o arquivo comprimido (0 desliga)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "6"))
+ARCHIVE_BATCH = 200
+
+# --- Banco de Dados ---
+if SHARD_COUNT and DB_BACKEND != "sqlite":
+    # Só o SQLite coordena escritas de vários processos no mesmo arquivo
+    raise RuntimeError("O modo com shards exige DB_BACKEND=sqlite.")
+
+backend = create_backend(DB_BACKEND, DB_FILE, snapshot_every=JOURNAL_SNAPSHOT_EVERY)
+if DB_BACKEND == "sqlite":
+    migrated = migrate_json_to_sqlite(LEGACY_DB_FILE, backend)
+    if migrated:
+        print(f"Migrados {migrated} sorteios de {LEGACY_DB_FILE} para {DB_FILE}.")
+
+db = Database(
+    backend, flush_max_entries=WRITE_BEHIND_MAX_ENTRIES, flush_max_ms=WRITE_BEHIND_MAX_MS,
+    cache_bytes=int(GIVEAWAY_CACHE_MB * 2**20),
+)
+# Handlers assíncronos usam sempre a fachada, que roda a E/S em um executor
+adb = AsyncDatabase(db)
+
+# Com vários processos de shard, só o primeiro grava no arquivo; os outros só leem
+archive = GiveawayArchive(ARCHIVE_DIR, readonly=SHARD_PROCESS_INDEX != 0)
+_archive_task = None
+
+loop_monitor = LoopLagMonitor(threshold_ms=LOOP_LAG_THRESHOLD_MS)
+
+# Cache de renderização: message_id -> (versão do conteúdo, SorteioView)
+_render_cache = OrderedDict()
+
+# Chamadas à API do Discord feitas pelo bot (por tipo)
+api_calls = Counter()
+
+# Exportações simultâneas (/exportar): cada uma ocupa uma thread comprimindo
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", "1"))
+
+# --- Métricas ---
+metrics = MetricsRegistry()
+api_latency = metrics.histogram("api_seconds", "Latência das chamadas à API do Discord", ("call",))
+rate_limits = metrics.counter("rate_limited_total", "Respostas 429 recebidas do Discord", ("call",))
+joins_rejected = metrics.counter("joins_ineligible_total", "Cliques em Participar barrados pelos requisitos")
+deletes_skipped = metrics.counter("message_deletes_skipped_total", "Exclusões de mensagens descartadas sem consultar o banco")
+ready_time = metrics.histogram(
+    "ready_seconds", "Tempo até ficar pronto: início do processo ou queda da conexão até READY/RESUMED",
+    ("kind",), buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+export_time = metrics.histogram(
+    "export_seconds", "Tempo para gerar o arquivo do /exportar", ("format",),
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+view_build = metrics.histogram("view_build_seconds", "Tempo para montar (build) ou atualizar (patch) a view", ("mode",))
+# Atraso real do encerramento em relação ao end_timestamp (inclui vencidos com o bot desligado)
+end_lag = metrics.histogram(
+    "end_lag_seconds", "Encerramento real menos end_timestamp",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 3600),
+)
+metrics_server = MetricsServer(
+    metrics, METRICS_HOST, METRICS_PORT + SHARD_PROCESS_INDEX,
+    profiler=SamplingProfiler() if PROFILER_ENABLED else None,
+)
+
+# Edições do contador de participantes, agrupadas por mensagem
+counter_updates = UpdateCoalescer(window=COUNTER_UPDATE_WINDOW_MS / 1000)
+
+# Uma mutação por vez em cada sorteio; sorteios diferentes seguem em paralelo
+giveaway_locks = LockManager(stripes=LOCK_STRIPES)
+
+# Toda chamada de saída: respostas às interações, depois resultados, depois o contador
+outbound = OutboundQueue(concurrency=OUTBOUND_CONCURRENCY)
+
+# Publicação dos resultados (edição das mensagens) com limites e novas tentativas
+result_edits = FanOut(
+    concurrency=FINALIZE_CONCURRENCY, per_channel=FINALIZE_PER_CHANNEL, retries=FINALIZE_RETRIES
+)
+
+# Exportações em andamento: a compressão roda fora do event loop, mas disputa CPU
+export_slots = asyncio.Semaphore(EXPORT_CONCURRENCY)
 
 # --- Modais de Edição ---
 
 class EditStringModal(ui.Modal):
-    def __init__(self, title, label, key, view_ref, placeholder=None, style=discord.TextStyle.paragraph, default_value=None):
+    def __init__(self, title, label, key, message_id, data, placeholder=None, style=discord.TextStyle.paragraph, default_value=None):
         super().__init__(title=title)
         self.key = key
-        self.view_ref = view_ref
+        self.message_id = message_id
+        self.data = data
         
         default_str = str(default_value) if default_value is not None else None
         
@@ -109,17 +219,19 @@ class EditStringModal(ui.Modal):
         self.add_item(self.input_field)
 
     async def on_submit(self, interaction: discord.Interaction):
-        self.view_ref.data[self.key] = self.input_field.value
-        db.update_giveaway(self.view_ref.message_id, {self.key: self.input_field.value})
+        self.data[self.key] = self.input_field.value
+        async with giveaway_locks.hold(self.message_id):
+            await adb.aupdate(self.message_id, {self.key: self.input_field.value})
         
-        new_view = SorteioView(self.view_ref.message_id, self.view_ref.data)
-        await interaction.response.edit_message(view=new_view)
+        new_view = SorteioView.render(self.message_id, self.data)
+        await ack_edit(interaction, new_view)
 
 class EditIntModal(ui.Modal):
-    def __init__(self, title, label, key, view_ref, placeholder="Digite apenas números inteiros", default_value=None):
+    def __init__(self, title, label, key, message_id, data, placeholder="Digite apenas números inteiros", default_value=None):
         super().__init__(title=title)
         self.key = key
-        self.view_ref = view_ref
+        self.message_id = message_id
+        self.data = data
         
         default_str = str(default_value) if default_value is not None else None
         
@@ -137,29 +249,117 @@ class EditIntModal(ui.Modal):
             value = int(self.input_field.value)
             if value < 1: raise ValueError
             
-            self.view_ref.data[self.key] = value
+            self.data[self.key] = value
             
             if self.key == "duration_days":
                 now = int(time.time())
                 end_ts = now + (value * 86400)
-                self.view_ref.data["end_timestamp"] = end_ts
-                db.update_giveaway(self.view_ref.message_id, {
-                    "duration_days": value,
-                    "end_timestamp": end_ts
-                })
+                self.data["end_timestamp"] = end_ts
+                async with giveaway_locks.hold(self.message_id):
+                    await adb.aupdate(self.message_id, {
+                        "duration_days": value,
+                        "end_timestamp": end_ts
+                    })
+                    if self.data["status"] == "running":
+                        scheduler.schedule(self.message_id, end_ts)
             else:
-                db.update_giveaway(self.view_ref.message_id, {self.key: value})
+                async with giveaway_locks.hold(self.message_id):
+                    await adb.aupdate(self.message_id, {self.key: value})
 
-            new_view = SorteioView(self.view_ref.message_id, self.view_ref.data)
-            await interaction.response.edit_message(view=new_view)
+            new_view = SorteioView.render(self.message_id, self.data)
+            await ack_edit(interaction, new_view)
         except ValueError:
-            await interaction.response.send_message("Por favor, insira um número inteiro válido.", ephemeral=True)
+            await reply(interaction, "Por favor, insira um número inteiro válido.")
+
+class EligibilityModal(ui.Modal):
+    def __init__(self, message_id, data):
+        super().__init__(title="Requisitos para Participar")
+        self.message_id = message_id
+        self.data = data
+        rules = EligibilityRules.from_data(data)
+        
+        self.required_field = ui.TextInput(
+            label="Cargos exigidos (basta ter um)",
+            placeholder="IDs ou menções dos cargos, separados por vírgula",
+            default=", ".join(str(r) for r in sorted(rules.required_roles)) or None,
+            required=False
+        )
+        self.excluded_field = ui.TextInput(
+            label="Cargos que não podem participar",
+            placeholder="IDs ou menções dos cargos, separados por vírgula",
+            default=", ".join(str(r) for r in sorted(rules.excluded_roles)) or None,
+            required=False
+        )
+        self.account_field = ui.TextInput(
+            label="Idade mínima da conta (dias)",
+            style=discord.TextStyle.short,
+            default=str(rules.min_account_days),
+            required=False
+        )
+        self.member_field = ui.TextInput(
+            label="Tempo mínimo no servidor (dias)",
+            style=discord.TextStyle.short,
+            default=str(rules.min_member_days),
+            required=False
+        )
+        for field in (self.required_field, self.excluded_field, self.account_field, self.member_field):
+            self.add_item(field)
+
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            min_account_days = int(self.account_field.value or 0)
+            min_member_days = int(self.member_field.value or 0)
+            if min_account_days < 0 or min_member_days < 0: raise ValueError
+        except ValueError:
+            await reply(interaction, "Por favor, insira um número inteiro válido de dias.")
+            return
+        
+        rules = EligibilityRules(
+            parse_role_ids(self.required_field.value),
+            parse_role_ids(self.excluded_field.value),
+            min_account_days,
+            min_member_days,
+        )
+        self.data["eligibility"] = rules.to_data()
+        async with giveaway_locks.hold(self.message_id):
+            await adb.aupdate(self.message_id, {"eligibility": self.data["eligibility"]})
+        
+        new_view = SorteioView.render(self.message_id, self.data)
+        await ack_edit(interaction, new_view)
+
+class BonusModal(ui.Modal):
+    def __init__(self, message_id, data):
+        super().__init__(title="Entradas Bônus")
+        self.message_id = message_id
+        self.data = data
+        current = data.get("bonus_roles") or {}
+        
+        self.bonus_field = ui.TextInput(
+            label="Cargo e entradas extras (um por linha)",
+            style=discord.TextStyle.paragraph,
+            placeholder="<@&ID do cargo> 2",
+            default="\n".join(f"{role_id} {extra}" for role_id, extra in current.items()) or None,
+            required=False
+        )
+        self.add_item(self.bonus_field)
+
+    async def on_submit(self, interaction: discord.Interaction):
+        self.data["bonus_roles"] = parse_bonus_roles(self.bonus_field.value)
+        async with giveaway_locks.hold(self.message_id):
+            await adb.aupdate(self.message_id, {"bonus_roles": self.data["bonus_roles"]})
+        
+        new_view = SorteioView.render(self.message_id, self.data)
+        await ack_edit(interaction, new_view)
 
 # --- View Principal (LayoutView) ---
 
+# Campos que mudam a estrutura/conteúdo fixo da view; o resto é atualizado no lugar
+STATIC_FIELDS = ("title", "rules", "prize", "image_url", "status", "eligibility", "bonus_roles")
+
 class SorteioView(ui.LayoutView):
     def __init__(self, message_id, data=None):
-        super().__init__()
+        # Sem timeout: a mesma instância é reaproveitada pelo cache de renderização
+        super().__init__(timeout=None)
         self.message_id = str(message_id)
         
         # Dados padrão
@@ -184,14 +384,52 @@ class SorteioView(ui.LayoutView):
             if key not in self.data:
                 self.data[key] = value
 
-        # Garante que dados existam no DB se não vieram
-        if not data:
-            db.update_giveaway(self.message_id, self.data)
+        # Índice ID -> componente, para find_item O(1)
+        self._items = {}
+        self._winner_texts = []
 
         # Constrói a UI inicial
         self.build_ui()
         self.update_components_visuals()
 
+    @staticmethod
+    def content_version(data):
+        return hash(tuple(str(data.get(key)) for key in STATIC_FIELDS))
+
+    @classmethod
+    def render(cls, message_id, data):
+        """Reaproveita a view em cache se o conteúdo fixo não mudou"""
+        started = time.perf_counter()
+        str_id = str(message_id)
+        version = cls.content_version(data)
+        
+        cached = _render_cache.get(str_id)
+        if cached and cached[0] == version:
+            _render_cache.move_to_end(str_id)
+            view = cached[1]
+            view.data = data
+            view.update_dynamic_visuals()
+            view_build.labels("patch").observe(time.perf_counter() - started)
+            return view
+
+        view = cls(str_id, data)
+        _render_cache[str_id] = (version, view)
+        if len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+        view_build.labels("build").observe(time.perf_counter() - started)
+        return view
+
+    @staticmethod
+    def forget(message_id):
+        _render_cache.pop(str(message_id), None)
+
+    def _track(self, item):
+        self._items[item.id] = item
+        return item
+
+    def find_item(self, id):
+        return self._items.get(id)
+
     def build_ui(self):
         # Container Principal
         self.container = ui.Container(accent_colour=discord.Colour(3948357))
@@ -200,6 +438,7 @@ class SorteioView(ui.LayoutView):
 
         # --- Helper para adicionar itens configuráveis ---
         def add_config_item(text_component, edit_key=None):
+            self._track(text_component)
             if is_setup and edit_key:
                 self.container.add_item(
                     ui.Section(text_component, accessory=self._create_edit_btn(edit_key))
@@ -223,6 +462,25 @@ class SorteioView(ui.LayoutView):
         )
         self.container.add_item(ui.Separator(visible=True, spacing=discord.SeparatorSpacing.small))
 
+        # --- Seção Requisitos (checados no clique) ---
+        requirements = EligibilityRules.from_data(self.data)
+        if is_setup or requirements:
+            self.container.add_item(ui.TextDisplay(content="### ✅ Requisitos"))
+            add_config_item(
+                ui.TextDisplay(content="...", id=ID_REQUIREMENTS),
+                "edit_requirements"
+            )
+            self.container.add_item(ui.Separator(visible=True, spacing=discord.SeparatorSpacing.small))
+
+        # --- Seção Entradas Bônus (peso no sorteio) ---
+        if is_setup or self.data.get("bonus_roles"):
+            self.container.add_item(ui.TextDisplay(content="### 🎟️ Entradas bônus"))
+            add_config_item(
+                ui.TextDisplay(content="...", id=ID_BONUS),
+                "edit_bonus"
+            )
+            self.container.add_item(ui.Separator(visible=True, spacing=discord.SeparatorSpacing.small))
+
         # --- Seção Prêmios ---
         self.container.add_item(ui.TextDisplay(content="### 🏆 Prêmio(s)"))
         add_config_item(
@@ -240,12 +498,12 @@ class SorteioView(ui.LayoutView):
                 discord.MediaGalleryItem(media=str(img_url).strip()),
                 id=ID_IMAGE
             )
-            self.container.add_item(self.media_gallery)
+            self.container.add_item(self._track(self.media_gallery))
 
         # Botão editar imagem (Apenas setup)
         if is_setup:
             row_img = ui.ActionRow(
-                ui.Button(style=discord.ButtonStyle.secondary, label="Editar Imagem (URL)", custom_id=f"edit_image_{self.message_id}")
+                self._button(style=discord.ButtonStyle.secondary, label="Editar Imagem (URL)", custom_id=router.custom_id("edit_image", self.message_id))
             )
             self.container.add_item(row_img)
 
@@ -273,19 +531,30 @@ class SorteioView(ui.LayoutView):
         self.action_row = ui.ActionRow()
         
         if is_setup:
-            self.action_row.add_item(ui.Button(style=discord.ButtonStyle.success, label="Iniciar", custom_id=f"start_{self.message_id}"))
+            self.action_row.add_item(self._button(style=discord.ButtonStyle.success, label="Iniciar", custom_id=router.custom_id("start", self.message_id)))
         
         if self.data['status'] == 'running':
-            self.action_row.add_item(ui.Button(style=discord.ButtonStyle.primary, label="Participar", emoji="🎉", custom_id=f"join_{self.message_id}", id=ID_BTN_PARTICIPATE))
+            self.action_row.add_item(self._track(self._button(style=discord.ButtonStyle.primary, label="Participar", emoji="🎉", custom_id=router.custom_id("join", self.message_id), id=ID_BTN_PARTICIPATE)))
         
         # Contador de participantes
-        count = len(self.data.get("participants", []))
-        self.action_row.add_item(ui.Button(style=discord.ButtonStyle.secondary, label=f"{count} participando", disabled=True, id=ID_BTN_PARTICIPANTS_COUNT))
+        count = self._participant_count()
+        self.action_row.add_item(self._track(ui.Button(style=discord.ButtonStyle.secondary, label=f"{count} participando", disabled=True, id=ID_BTN_PARTICIPANTS_COUNT)))
 
         self.add_item(self.action_row)
 
+    def _participant_count(self):
+        # Contagem vinda do conjunto em memória tem precedência sobre a lista
+        count = self.data.get("participant_count")
+        return count if count is not None else len(self.data.get("participants", []))
+
     def _create_edit_btn(self, type_key):
-        return ui.Button(style=discord.ButtonStyle.primary, label="Editar", emoji="✏️", custom_id=f"{type_key}_{self.message_id}")
+        return self._button(style=discord.ButtonStyle.primary, label="Editar", emoji="✏️", custom_id=router.custom_id(type_key, self.message_id))
+
+    def _button(self, **kwargs):
+        # Botões com custom_id são despachados nativamente pelo discord.py
+        button = ui.Button(**kwargs)
+        button.callback = handle_component
+        return button
 
     def update_components_visuals(self):
         # Título
@@ -300,6 +569,23 @@ class SorteioView(ui.LayoutView):
         t_prize = self.find_item(ID_PRIZE)
         if t_prize: t_prize.content = self.data['prize']
 
+        # Requisitos
+        t_requirements = self.find_item(ID_REQUIREMENTS)
+        if t_requirements:
+            lines = EligibilityRules.from_data(self.data).describe()
+            t_requirements.content = "\n".join(f"- {line}" for line in lines) or "Qualquer membro pode participar."
+
+        # Entradas bônus
+        t_bonus = self.find_item(ID_BONUS)
+        if t_bonus:
+            bonus = self.data.get("bonus_roles") or {}
+            lines = [f"- <@&{role_id}>: +{extra} {'entrada' if extra == 1 else 'entradas'}" for role_id, extra in bonus.items()]
+            t_bonus.content = "\n".join(lines) or "Todos participam com uma entrada."
+
+        self.update_dynamic_visuals()
+
+    def update_dynamic_visuals(self):
+        """Campos que mudam sem alterar a versão do conteúdo (contagem, prazo, ganhadores)"""
         # Data
         t_date = self.find_item(ID_DATE)
         if t_date:
@@ -334,8 +620,7 @@ class SorteioView(ui.LayoutView):
         # Participantes Count (Botão)
         b_part = self.find_item(ID_BTN_PARTICIPANTS_COUNT)
         if b_part: 
-            count = len(self.data.get("participants", []))
-            b_part.label = f"{count} participando"
+            b_part.label = f"{self._participant_count()} participando"
 
         # Se status == ended, adiciona seções de ganhadores se não existirem
         if self.data['status'] == 'ended':
@@ -346,179 +631,561 @@ class SorteioView(ui.LayoutView):
         
         for i, winner_id in enumerate(winners):
             section_id = ID_WINNER_SECTION_BASE + i
+            user_text = f"### 🥇 <@{winner_id}> - `{winner_id}`"
             
             if not self.find_item(section_id):
-                user_text = f"### 🥇 <@{winner_id}> - `{winner_id}`"
+                text = ui.TextDisplay(content=user_text)
                 section = ui.Section(
-                    ui.TextDisplay(content=user_text),
-                    accessory=ui.Button(style=discord.ButtonStyle.secondary, emoji="🔄", custom_id=f"reroll_{self.message_id}_{i}")
+                    text,
+                    accessory=self._button(style=discord.ButtonStyle.secondary, emoji="🔄", custom_id=router.custom_id("reroll", self.message_id, i))
                 )
                 section.id = section_id 
-                self.container.add_item(section)
-
+                self.container.add_item(self._track(section))
+                self._winner_texts.append(text)
+            else:
+                # Reroll: só troca o texto da seção já existente
+                self._winner_texts[i].content = user_text
 
 # --- Gerenciador de Eventos Global ---
 
+def is_admin(interaction):
+    return interaction.user.guild_permissions.administrator
+
+async def deny_not_admin(interaction):
+    await reply(interaction, "Apenas administradores podem gerenciar o sorteio.")
+
+async def load_giveaway(interaction, route, message_id):
+    """Dados do sorteio para um clique: só a contagem, nunca a lista de participantes"""
+    data = await adb.aget(message_id, include_participants=False)
+    if data is None:
+        # Sorteios antigos saem do banco: só um reroll tardio os traz de volta do arquivo
+        if route.action != "reroll" or await restore_for_click(interaction, message_id) is None:
+            return None
+        data = await adb.aget(message_id, include_participants=False)
+    # Contagem do conjunto em memória ou do cache; o executor só em uma falta
+    data["participant_count"] = await adb.aparticipant_count(message_id)
+    return data
+
+router = InteractionRouter(
+    loader=load_giveaway,
+    view_factory=SorteioView.render,
+    is_admin=is_admin,
+    deny=deny_not_admin,
+)
+
+def is_natively_dispatched(interaction):
+    """True se o discord.py vai entregar o clique a um item de uma SorteioView registrada
+
+    Mensagens de antes dos IDs "g1:" são reanexadas com os IDs novos, mas os
+    botões delas ainda têm os antigos: esses cliques não casam com nenhum item
+    da view e precisam seguir pelo roteador.
+    """
+    view_store = getattr(bot._connection, "_view_store", None)
+    views = getattr(view_store, "_views", None)
+    if views is None:
+        return False
+    key = (interaction.data.get("component_type"), interaction.data["custom_id"])
+    message_id = interaction.message.id if interaction.message else None
+    return key in views.get(message_id, {}) or key in views.get(None, {})
+
 @bot.event
 async def on_interaction(interaction: discord.Interaction):
     if not interaction.data.get('custom_id'):
         return
 
-    custom_id = interaction.data['custom_id']
-    
-    parts = custom_id.split('_')
-    if len(parts) < 2: return
-    
-    action = parts[0]
-    
-    # Tratamento para IDs
-    if action == "edit":
-        action = f"{parts[0]}_{parts[1]}"
-        msg_id = parts[2]
-    elif action == "reroll":
-        msg_id = parts[1]
-        winner_index = int(parts[2])
-    else:
-        msg_id = parts[1]
-
-    # Carregar dados
-    data = db.get_giveaway(msg_id)
-    if not data:
+    # Botões de uma view registrada chegam pelo callback do próprio item
+    if is_natively_dispatched(interaction):
         return
 
-    # Cria view
-    view = SorteioView(msg_id, data)
+    await handle_component(interaction)
 
-    # Permissão Admin
-    is_admin = interaction.user.guild_permissions.administrator
-    if action in ["edit_title", "edit_rules", "edit_prize", "edit_image", "edit_date", "edit_winners", "start", "reroll"] and not is_admin:
-        await interaction.response.send_message("Apenas administradores podem gerenciar o sorteio.", ephemeral=True)
-        return
+async def handle_component(interaction: discord.Interaction):
+    await router.dispatch(interaction, interaction.data['custom_id'])
 
-    # --- Ações ---
+# --- Ações ---
 
-    if action == "edit_title":
-        await interaction.response.send_modal(EditStringModal("Editar Título", "Novo Título", "title", view, default_value=data.get('title')))
-    
-    elif action == "edit_rules":
-        await interaction.response.send_modal(EditStringModal("Editar Regras", "Regras", "rules", view, style=discord.TextStyle.paragraph, default_value=data.get('rules')))
-        
-    elif action == "edit_prize":
-        await interaction.response.send_modal(EditStringModal("Editar Prêmio", "Prêmio", "prize", view, default_value=data.get('prize')))
-        
-    elif action == "edit_image":
-        await interaction.response.send_modal(EditStringModal("Imagem URL", "URL da Imagem", "image_url", view, placeholder="https://...", default_value=data.get('image_url')))
+@router.route("edit_title", "t", admin=True)
+async def edit_title(ctx):
+    await ctx.interaction.response.send_modal(EditStringModal("Editar Título", "Novo Título", "title", ctx.message_id, ctx.data, default_value=ctx.data.get('title')))
+
+@router.route("edit_rules", "r", admin=True)
+async def edit_rules(ctx):
+    await ctx.interaction.response.send_modal(EditStringModal("Editar Regras", "Regras", "rules", ctx.message_id, ctx.data, style=discord.TextStyle.paragraph, default_value=ctx.data.get('rules')))
+
+@router.route("edit_prize", "p", admin=True)
+async def edit_prize(ctx):
+    await ctx.interaction.response.send_modal(EditStringModal("Editar Prêmio", "Prêmio", "prize", ctx.message_id, ctx.data, default_value=ctx.data.get('prize')))
+
+@router.route("edit_image", "i", admin=True)
+async def edit_image(ctx):
+    await ctx.interaction.response.send_modal(EditStringModal("Imagem URL", "URL da Imagem", "image_url", ctx.message_id, ctx.data, placeholder="https://...", default_value=ctx.data.get('image_url')))
 
-    elif action == "edit_date":
-        await interaction.response.send_modal(EditIntModal("Tempo do Sorteio", "Duração em DIAS", "duration_days", view, default_value=data.get('duration_days')))
+@router.route("edit_date", "d", admin=True)
+async def edit_date(ctx):
+    await ctx.interaction.response.send_modal(EditIntModal("Tempo do Sorteio", "Duração em DIAS", "duration_days", ctx.message_id, ctx.data, default_value=ctx.data.get('duration_days')))
 
-    elif action == "edit_winners":
-        await interaction.response.send_modal(EditIntModal("Quantidade de Ganhadores", "Número de Ganhadores", "winners_count", view, default_value=data.get('winners_count')))
+@router.route("edit_winners", "w", admin=True)
+async def edit_winners(ctx):
+    await ctx.interaction.response.send_modal(EditIntModal("Quantidade de Ganhadores", "Número de Ganhadores", "winners_count", ctx.message_id, ctx.data, default_value=ctx.data.get('winners_count')))
 
-    elif action == "start":
-        duration_days = data.get("duration_days", 5)
+@router.route("edit_requirements", "q", admin=True)
+async def edit_requirements(ctx):
+    await ctx.interaction.response.send_modal(EligibilityModal(ctx.message_id, ctx.data))
+
+@router.route("edit_bonus", "b", admin=True)
+async def edit_bonus(ctx):
+    await ctx.interaction.response.send_modal(BonusModal(ctx.message_id, ctx.data))
+
+@router.route("start", "s", admin=True)
+async def start(ctx):
+    data = ctx.data
+    async with giveaway_locks.hold(ctx.message_id):
+        # Outro admin pode ter iniciado enquanto esperávamos o lock
+        current = await adb.aget(ctx.message_id, include_participants=False)
+        if current is None or current["status"] != "setup":
+            await reply(ctx.interaction, "Este sorteio já foi iniciado.")
+            return
+        
+        duration_days = current.get("duration_days", 5)
         new_end = int(time.time()) + (duration_days * 86400)
         
         data["status"] = "running"
         data["end_timestamp"] = new_end
-        db.update_giveaway(msg_id, data)
-        
-        new_view = SorteioView(msg_id, data)
-        await interaction.response.edit_message(view=new_view)
-        await interaction.followup.send(f"Sorteio iniciado! Acaba em <t:{new_end}:R>.", ephemeral=True)
-
-    elif action == "join":
-        # Verifica se o ID (inteiro OU string) está na lista de participantes
-        user_id = interaction.user.id
-        participants = data.get("participants", [])
-        
-        if user_id in participants or str(user_id) in participants:
-            await interaction.response.send_message("Tenha calma, você já está participando❗", ephemeral=True)
+        await adb.aupdate(ctx.message_id, {"status": "running", "end_timestamp": new_end})
+        scheduler.schedule(ctx.message_id, new_end)
+    
+    await ack_edit(ctx.interaction, ctx.view)
+    await followup(ctx.interaction, f"Sorteio iniciado! Acaba em <t:{new_end}:R>.")
+
+@router.route("join", "j")
+async def join(ctx):
+    interaction, msg_id, data = ctx.interaction, ctx.message_id, ctx.data
+    # Conjunto em memória: verificação O(1), gravação vai para a fila em lote
+    user_id = interaction.user.id
+    
+    # Requisitos vêm do payload do clique (cargos, data de entrada): sem E/S, antes do banco
+    reason = EligibilityRules.from_data(data).check(interaction.user)
+    if reason:
+        joins_rejected.labels().inc()
+        await reply(interaction, reason)
+        return
+    
+    # Carga do conjunto fora do lock (uma só para a rajada): dentro dele a entrada não espera E/S,
+    # então cliques simultâneos não fazem fila atrás do primeiro
+    await adb.aload_participants(msg_id)
+    
+    closed = False
+    async with giveaway_locks.hold(msg_id):
+        # Os dados podem ter sido lidos antes de um encerramento concorrente
+        closed = data["status"] == "ended" or db.is_closed(msg_id)
+        if not closed:
+            # Cargos bônus também vêm do payload: o peso é fixado na entrada
+            weight = entry_weight(data.get("bonus_roles"), interaction.user)
+            added = await adb.aadd_participant(msg_id, user_id, weight)
+    
+    if closed:
+        await reply(interaction, "Este sorteio já foi encerrado.")
+        return
+    
+    if not added:
+        await reply(interaction, "Tenha calma, você já está participando❗")
+        return
+    
+    # Confirmação imediata; a mensagem pública é atualizada em lote
+    await reply(interaction, "Você entrou no sorteio! Boa sorte! 🍀")
+    counter_updates.submit(msg_id, lambda: refresh_counter(msg_id, data))
+
+def pick_winners(msg_id, data, count, exclude=(), kind="final", rebuild=False):
+    """Sorteio uniforme ou, com entradas bônus, ponderado pela tabela de alias (roda no executor)
+
+    `rebuild` monta e grava a tabela a partir dos pesos (no encerramento);
+    rerolls reaproveitam a gravada, então cada um custa O(1) por tentativa.
+    """
+    source = db.participant_source(msg_id)
+    if not data.get("bonus_roles") or len(source) == 0:
+        return draw_winners(source, count, exclude=exclude, kind=kind)
+    table = db.alias_table(msg_id, rebuild=rebuild)
+    return draw_weighted(table, source, count, exclude=exclude, kind=kind,
+                         entries=lambda: db.participant_entries(msg_id))
+
+# Reroll num sorteio que outro processo arquivou enquanto este o tinha em cache
+ARCHIVED = object()
+
+@router.route("reroll", "x", admin=True, has_arg=True)
+async def reroll(ctx):
+    interaction, msg_id = ctx.interaction, ctx.message_id
+    new_winner = await _reroll(ctx)
+    if new_winner is ARCHIVED:
+        if await restore_for_click(interaction, msg_id) is None:
+            await reply(interaction, "Sorteio não encontrado.")
             return
-            
-        db.add_participant(msg_id, user_id)
-        
-        # Recarrega dados e recria view
-        data = db.get_giveaway(msg_id) 
-        new_view = SorteioView(msg_id, data)
-        await interaction.response.edit_message(view=new_view)
-        await interaction.followup.send("Você entrou no sorteio! Boa sorte! 🍀", ephemeral=True)
-
-    elif action == "reroll":
-        if data["status"] != "ended": return
+        new_winner = await _reroll(ctx, restored=True)
+    if new_winner is None:
+        return
+
+    await ack_edit(interaction, ctx.view)
+    await followup(interaction, f"Ganhador atualizado: <@{new_winner}>")
+
+async def _reroll(ctx, restored=False):
+    """Troca um ganhador sob o lock; devolve o novo, None (já respondido) ou ARCHIVED"""
+    interaction, msg_id = ctx.interaction, ctx.message_id
+
+    async with giveaway_locks.hold(msg_id):
+        # Relê sob o lock: outro reroll pode ter trocado os ganhadores
+        data = await adb.aget(msg_id, include_participants=False)
+        if data is None or data["status"] != "ended": return None
+        ctx.data.update(data)
         
-        participants = data["participants"]
         winners = data["winners"]
-        
-        if not participants:
-            await interaction.response.send_message("Sem participantes suficientes.", ephemeral=True)
-            return
-
+        winner_index = ctx.arg
+        if winner_index >= len(winners): return None
         current_winner_id = winners[winner_index]
-        available = [p for p in participants if p not in winners or p == current_winner_id]
         
-        if not available:
-            await interaction.response.send_message("Não há outros participantes para sortear.", ephemeral=True)
-            return
+        # Exclui os outros ganhadores com um set; o sorteio lê direto do banco
+        others = [w for i, w in enumerate(winners) if i != winner_index]
+        draw = await adb.arun(lambda: pick_winners(msg_id, data, 1, exclude=others, kind="reroll"))
+        
+        if draw.population == 0:
+            # Ninguém pode ser cache velho: o sorteio saiu do banco (arquivado por outro processo)
+            if not restored and not await adb.arun(db.revalidate, msg_id):
+                return ARCHIVED
+            await reply(interaction, "Sem participantes suficientes.")
+            return None
+        
+        if not draw.winners:
+            await reply(interaction, "Não há outros participantes para sortear.")
+            return None
             
-        new_winner = random.choice(available)
+        new_winner = draw.winners[0]
         winners[winner_index] = new_winner
+        data.setdefault("draws", []).append(draw.audit(slot=winner_index, replaced=current_winner_id))
         
-        db.update_giveaway(msg_id, {"winners": winners})
-        
-        final_view = SorteioView(msg_id, db.get_giveaway(msg_id))
-        await interaction.response.edit_message(view=final_view)
-        await interaction.followup.send(f"Ganhador atualizado: <@{new_winner}>", ephemeral=True)
+        try:
+            await adb.aupdate(msg_id, {"winners": winners, "draws": data["draws"]}, expected_version=data["version"])
+        except VersionConflict:
+            # Outro processo gravou o sorteio no meio do caminho
+            await reply(interaction, "O sorteio foi alterado agora mesmo, tente de novo.")
+            return None
+    return new_winner
+
+async def refresh_counter(msg_id, data):
+    """Reedita a mensagem com a contagem atual (chamado pelo agrupador)"""
+    data["participant_count"] = db.participant_count(msg_id)
+    view = SorteioView.render(msg_id, data)
+    await edit_message(data["channel_id"], msg_id, view, priority=COSMETIC)
+
+def edit_message(channel_id, msg_id, view, priority=RESULT):
+    """Edita pela referência parcial (canal + ID): nenhum fetch_message antes
+    
+    A chave é a mensagem: uma edição ainda na fila é substituída pela mais nova,
+    então o resultado nunca sai atrás de um contador antigo.
+    """
+    async def send():
+        if priority == COSMETIC and db.is_closed(msg_id):
+            # Encerrado enquanto esperava na fila: o contador não sobrescreve o resultado
+            return None
+        channel = bot.get_partial_messageable(channel_id)
+        return await api_call("edit", channel.get_partial_message(int(msg_id)).edit(view=view))
+    return outbound.call(priority, ("edit", channel_id), send, key=("message", str(msg_id)))
+
+def reply(interaction, content):
+    """Resposta efêmera ao clique: prazo de 3 s do Discord, sai antes de tudo na fila"""
+    if interaction.response.is_done():
+        # Clique já adiado (ex.: sorteio restaurado do arquivo): responde pelo followup
+        return followup(interaction, content)
+    return outbound.call(ACK, ("interaction", interaction.id),
+                         lambda: api_call("ack", interaction.response.send_message(content, ephemeral=True)))
+
+def ack_edit(interaction, view):
+    """Responde ao clique editando a própria mensagem do painel"""
+    if interaction.response.is_done():
+        return outbound.call(ACK, ("interaction", interaction.id),
+                             lambda: api_call("ack", interaction.edit_original_response(view=view)))
+    return outbound.call(ACK, ("interaction", interaction.id),
+                         lambda: api_call("ack", interaction.response.edit_message(view=view)))
+
+def followup(interaction, content):
+    return outbound.call(ACK, ("followup", interaction.id),
+                         lambda: api_call("followup", interaction.followup.send(content, ephemeral=True)))
+
+async def api_call(call, coro):
+    """Aguarda uma chamada à API do Discord contando quantidade, latência e 429"""
+    api_calls[call] += 1
+    started = time.perf_counter()
+    try:
+        return await coro
+    except discord.HTTPException as e:
+        if e.status == 429:
+            rate_limits.labels(call).inc()
+        raise
+    finally:
+        api_latency.labels(call).observe(time.perf_counter() - started)
 
 # --- Detector de Exclusão de Mensagem ---
 @bot.event
 async def on_message_delete(message):
     msg_id = str(message.id)
-    data_all = db.load()
+    # Quase toda mensagem apagada não é um sorteio: o filtro responde sem ir ao banco
+    if not db.might_exist(msg_id):
+        deletes_skipped.labels().inc()
+        return
+    giveaway = await adb.aget(msg_id, include_participants=False)
     
-    if msg_id in data_all["giveaways"]:
-        giveaway = data_all["giveaways"][msg_id]
+    if giveaway:
         if giveaway["status"] != "ended":
             print(f"Sorteio na mensagem {msg_id} foi excluído manualmente.")
-            db.end_giveaway_db(msg_id)
-
-# --- Tarefa em Background ---
-@tasks.loop(seconds=60)
-async def check_giveaways():
-    data = db.load()
+            async with giveaway_locks.hold(msg_id):
+                scheduler.cancel(msg_id)
+                SorteioView.forget(msg_id)
+                await adb.aend_giveaway(msg_id)
+
+# --- Encerramento Agendado ---
+async def check_giveaways(message_ids):
+    """Chamado pelo agendador com os sorteios cujo prazo venceu"""
+    # O lote confere de novo status e prazo: o sorteio pode ter mudado desde o agendamento
+    await finalize_giveaways(message_ids)
+
+scheduler = DeadlineScheduler(check_giveaways)
+
+# Métricas mantidas pelos próprios componentes, lidas na hora da coleta
+metrics.attach_histograms("interaction_seconds", "Tempo de atendimento por ação de botão", "action", router.latency)
+metrics.attach_histograms("db_seconds", "Tempo das operações no banco", "op", db.latency)
+metrics.collect("interactions_rejected_total", "custom_id inválidos ou desconhecidos", lambda: router.rejected, "counter")
+metrics.collect("api_calls_total", "Chamadas à API do Discord por tipo", lambda: dict(api_calls), "counter")
+metrics.collect("db_bytes_written_total", "Bytes de dados gravados pelo backend", lambda: backend.bytes_written, "counter")
+metrics.collect("write_behind_pending", "Entradas aguardando gravação em lote", lambda: len(db._queue))
+metrics.collect("loop_lag_max_ms", "Maior atraso observado no event loop", lambda: loop_monitor.snapshot()["max_lag_ms"])
+metrics.collect("loop_lag_breaches_total", "Atrasos do event loop acima do limite", lambda: loop_monitor.breaches, "counter")
+metrics.collect("counter_updates_total", "Pedidos e edições do contador de participantes", lambda: {
+    "requests": counter_updates.requests, "edits": counter_updates.edits, "rate_limited": counter_updates.rate_limited,
+}, "counter")
+metrics.collect("lock_contended_total", "Mutações que esperaram o lock do sorteio", lambda: giveaway_locks.contended, "counter")
+metrics.collect("scheduled_giveaways", "Sorteios com encerramento agendado", lambda: len(scheduler))
+metrics.collect("result_edits_total", "Edições de resultado enviadas, repetidas e que falharam", result_edits.stats, "counter")
+metrics.attach_histograms("outbound_wait_seconds", "Espera na fila de saída por prioridade", "priority", outbound.wait)
+metrics.collect("outbound_queued", "Chamadas na fila de saída por prioridade", outbound.depth)
+metrics.collect("outbound_total", "Chamadas da fila de saída enviadas, substituídas e com 429", lambda: {
+    "sent": outbound.sent, "merged": outbound.merged, "rate_limited": outbound.rate_limited,
+}, "counter")
+metrics.collect("giveaway_cache_total", "Leituras de sorteios atendidas pelo cache e pelo banco", lambda: {
+    "hit": db.cache.hits, "miss": db.cache.misses, "evicted": db.cache.evicted,
+}, "counter")
+metrics.collect("giveaway_cache_bytes", "Memória estimada do cache de sorteios", lambda: db.cache.bytes)
+metrics.collect("render_cache_size", "Views no cache de renderização", lambda: len(_render_cache))
+metrics.collect("archived_giveaways", "Sorteios no arquivo comprimido", lambda: len(archive))
+
+def served_shards():
+    """Shards deste processo; sem SHARD_IDS o discord.py deixa `bot.shard_ids` em None e atende todos"""
+    return bot.shard_ids or range(SHARD_COUNT)
+
+def owns_giveaway(data):
+    """No modo com shards, cada processo só agenda sorteios das guilds dos seus shards"""
+    if not SHARD_COUNT:
+        return True
+    guild_id = data.get("guild_id")
+    if guild_id is None:
+        # Sorteios antigos não guardam a guild: o canal só está no cache do processo dono
+        return bot.get_channel(data.get("channel_id")) is not None
+    return (int(guild_id) >> 22) % SHARD_COUNT in served_shards()
+
+# --- Recuperação na Inicialização ---
+async def recover_giveaways():
+    """Reanexa as views dos sorteios não encerrados e finaliza os vencidos"""
+    started = time.perf_counter()
+    calls_before = sum(api_calls.values())
     now = int(time.time())
     
-    for msg_id, g_data in list(data["giveaways"].items()):
-        if g_data["status"] == "running" and now >= g_data["end_timestamp"]:
-            await end_giveaway(msg_id, g_data)
-
-async def end_giveaway(message_id, data):
-    participants = data.get("participants", [])
-    count = data.get("winners_count", 1)
+    active = []
+    overdue = []
+    for status in ("setup", "running"):
+        for msg_id, g_data in await adb.aiter_giveaways(status=status, include_participants=False):
+            if not owns_giveaway(g_data):
+                continue
+            if status == "running" and g_data["end_timestamp"] <= now:
+                overdue.append((msg_id, g_data))
+            else:
+                active.append((msg_id, g_data))
     
-    winners = []
-    if len(participants) >= count:
-        winners = random.sample(participants, count)
-    else:
-        winners = participants 
+    deadlines = []
+    for msg_id, g_data in active:
+        # Só a contagem é necessária para desenhar o painel
+        g_data["participant_count"] = await adb.aparticipant_count(msg_id)
+        bot.add_view(SorteioView.render(msg_id, g_data), message_id=int(msg_id))
+        if g_data["status"] == "running":
+            deadlines.append((msg_id, g_data["end_timestamp"]))
+    scheduler.rebuild(deadlines)
     
-    data["status"] = "ended"
-    data["winners"] = winners
-    db.update_giveaway(message_id, data)
+    # Vencidos enquanto o bot estava fora: um único lote
+    await finalize_giveaways([msg_id for msg_id, _ in overdue])
     
-    channel_id = data.get("channel_id")
-    if channel_id:
-        channel = bot.get_channel(channel_id)
-        if channel:
-            try:
-                msg = await channel.fetch_message(int(message_id))
-                view = SorteioView(message_id, data)
-                await msg.edit(view=view)
-            except discord.NotFound:
-                print(f"Mensagem {message_id} não encontrada. Finalizando DB.")
-                db.end_giveaway_db(message_id)
-            except Exception as e:
-                print(f"Erro ao finalizar {message_id}: {e}")
+    elapsed = time.perf_counter() - started
+    calls = sum(api_calls.values()) - calls_before
+    print(
+        f"Recuperação: {len(active)} views reanexadas ({len(deadlines)} agendadas), "
+        f"{len(overdue)} vencidos finalizados em {elapsed:.2f}s com {calls} chamadas à API."
+    )
+
+async def end_giveaway(message_id):
+    await finalize_giveaways([message_id])
+
+async def finalize_giveaways(message_ids):
+    """Encerra sorteios vencidos em lote: sorteia, grava em uma transação e publica em paralelo"""
+    publishing = []
+    for start in range(0, len(message_ids), FINALIZE_BATCH):
+        ended = await _finalize_batch([str(m) for m in message_ids[start:start + FINALIZE_BATCH]])
+        if ended:
+            # O próximo lote já é sorteado enquanto as mensagens deste são editadas
+            publishing.append(asyncio.create_task(publish_results(ended)))
+    await asyncio.gather(*publishing)
+
+# Sorteios sendo encerrados por este processo: agendador, /sortearagora e a recuperação não sorteiam duas vezes
+finalizing = set()
+
+async def _finalize_batch(message_ids):
+    # Cada sorteio é fechado sob o próprio lock, só o bastante para recusar entradas novas: sorteios
+    # de outras faixas (e os demais do lote) seguem recebendo cliques enquanto este lote sorteia
+    closing = []
+    for msg_id in message_ids:
+        if msg_id in finalizing:
+            continue
+        async with giveaway_locks.hold(msg_id):
+            await adb.settle([msg_id])
+            data = await adb.aget(msg_id, include_participants=False)
+            if data is None or data["status"] == "ended" or data.get("end_timestamp", 0) > time.time():
+                continue
+            db.close_entries(msg_id)
+            finalizing.add(msg_id)
+            closing.append(msg_id)
+    if not closing:
+        return []
+
+    try:
+        return await _draw_and_save(closing)
+    finally:
+        finalizing.difference_update(closing)
+
+async def _draw_and_save(message_ids):
+    """Sorteia os sorteios já fechados, sem locks, e grava tudo em uma transação com checagem de versão"""
+    def draw_all():
+        drawn = []
+        for msg_id in message_ids:
+            data = db.get_giveaway(msg_id, include_participants=False)
+            # Encerrado ou arquivado por outro processo depois do fechamento
+            if data is None or data["status"] == "ended":
+                continue
+            # A mensagem do resultado mostra a contagem final, não a da leitura sem participantes
+            data["participant_count"] = db.participant_count(msg_id)
+            # Sorteio em fluxo sobre o banco; a semente fica registrada para auditoria
+            drawn.append((msg_id, data, pick_winners(msg_id, data, data.get("winners_count", 1), rebuild=True)))
+        return drawn
+
+    drawn = await adb.arun(draw_all)
+    updates = []
+    for msg_id, data, draw in drawn:
+        data["status"] = "ended"
+        data["winners"] = draw.winners
+        data.setdefault("draws", []).append(draw.audit())
+        updates.append((msg_id, {"status": "ended", "winners": draw.winners, "draws": data["draws"]}, data["version"]))
+    # A versão lida no sorteio garante que nada mudou enquanto ele rodava fora do lock
+    applied = set(await adb.arun(db.update_giveaways, updates)) if updates else set()
+
+    now = time.time()
+    for msg_id, data, _ in drawn:
+        if msg_id not in applied:
+            continue
+        end_lag.labels().observe(max(0.0, now - data.get("end_timestamp", now)))
+        scheduler.cancel(msg_id)
+        clicks, edits = counter_updates.cancel(msg_id)
+        if clicks:
+            print(f"Sorteio {msg_id}: {clicks} entradas atendidas com {edits} edições do contador.")
+
+    if len(applied) < len(drawn):
+        print(f"{len(drawn) - len(applied)} encerramentos abortados: sorteio alterado durante o sorteio.")
+    await _reopen([msg_id for msg_id in message_ids if msg_id not in applied])
+    return [(msg_id, data) for msg_id, data, _ in drawn if msg_id in applied]
+
+async def _reopen(message_ids):
+    """Encerramentos abortados: o sorteio volta a aceitar entradas e é reagendado pelo prazo atual"""
+    for msg_id in message_ids:
+        data = await adb.aget(msg_id, include_participants=False)
+        if data is None or data["status"] == "ended":
+            continue
+        db.reopen_entries(msg_id)
+        if data["status"] == "running":
+            scheduler.schedule(msg_id, data["end_timestamp"])
+
+async def publish_results(ended):
+    """Edita as mensagens dos sorteios encerrados, com teto de concorrência e novas tentativas"""
+    jobs = []
+    for msg_id, data in ended:
+        channel_id = data.get("channel_id")
+        if not channel_id:
+            continue
+        view = SorteioView.render(msg_id, data)
+        jobs.append((channel_id, msg_id, functools.partial(edit_message, channel_id, msg_id, view)))
+    
+    for msg_id, error in (await result_edits.run(jobs)).items():
+        if isinstance(error, discord.NotFound):
+            print(f"Mensagem {msg_id} não encontrada; o sorteio já está encerrado no banco.")
+        elif error is not None:
+            print(f"Erro ao publicar o resultado de {msg_id} após {FINALIZE_RETRIES} novas tentativas: {error}")
+
+# --- Arquivamento de Sorteios Encerrados ---
+async def compact_archive():
+    """Move para o arquivo os sorteios encerrados há mais de ARCHIVE_AFTER_DAYS"""
+    cutoff = int(time.time()) - ARCHIVE_AFTER_DAYS * 86400
+    moved = written = 0
+    while True:
+        batch = await adb.aiter_giveaways(
+            status="ended", due_before=cutoff, include_participants=False, limit=ARCHIVE_BATCH
+        )
+        if not batch:
+            break
+        # Compressão numa thread própria, com os participantes lidos em blocos: o executor do banco fica livre
+        written += await asyncio.to_thread(archive.append, batch, db.participant_entries)
+        # Um reroll no meio do caminho muda a versão: esse sorteio fica para a próxima rodada
+        deleted = await adb.arun(db.delete_giveaways, {msg_id: g_data["version"] for msg_id, g_data in batch})
+        for msg_id in deleted:
+            SorteioView.forget(msg_id)
+        moved += len(deleted)
+        if len(deleted) < len(batch):
+            break
+    if moved:
+        print(f"Arquivados {moved} sorteios encerrados ({written / 1024:.1f} KiB comprimidos).")
+    return moved
+
+async def archive_loop():
+    while True:
+        try:
+            await compact_archive()
+        except Exception as e:
+            print(f"Erro ao arquivar sorteios: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL_HOURS * 3600)
+
+async def is_archived(message_id):
+    if message_id not in archive:
+        # Outro processo pode ter arquivado depois da nossa última leitura do índice
+        await asyncio.to_thread(archive.refresh)
+    return message_id in archive
+
+async def restore_archived(message_id):
+    """Devolve um sorteio arquivado ao banco; None se ele não estiver no arquivo"""
+    # Descompressão do lote fora do executor do banco; só a gravação passa por ele
+    data = await asyncio.to_thread(archive.get, message_id)
+    if data is None:
+        return None
+    data.pop("version", None)
+    async with giveaway_locks.hold(message_id):
+        await adb.aupdate(message_id, data)
+    print(f"Sorteio {message_id} restaurado do arquivo.")
+    return data
+
+async def restore_for_click(interaction, message_id):
+    """Restaura o sorteio arquivado de um clique, adiando a resposta antes: pode passar dos 3 s"""
+    if not await is_archived(message_id):
+        return None
+    await api_call("defer", interaction.response.defer())
+    return await restore_archived(message_id)
 
 # --- Comando Slash: Criar Sorteio ---
 @bot.tree.command(name="sorteio", description="Cria um novo sorteio configurável")
@@ -536,6 +1203,7 @@ async def sorteio(interaction: discord.Interaction):
     
     initial_data = {
         "channel_id": interaction.channel_id,
+        "guild_id": interaction.guild_id,
         "title": "Sorteio Novo",
         "rules": "1 - Entre no servidor\n2 - Participe!",
         "prize": "Um prêmio legal",
@@ -547,9 +1215,9 @@ async def sorteio(interaction: discord.Interaction):
         "participants": [],
         "winners": []
     }
-    db.update_giveaway(msg.id, initial_data)
+    await adb.aupdate(msg.id, initial_data)
     
-    view = SorteioView(msg.id, initial_data)
+    view = SorteioView.render(msg.id, initial_data)
     await msg.edit(view=view)
 
 # --- Comando Slash: Sortear Agora ---
@@ -559,7 +1227,12 @@ async def sortear_agora(interaction: discord.Interaction, message_id: str):
         await interaction.response.send_message("Permissão negada.", ephemeral=True)
         return
 
-    data = db.get_giveaway(message_id)
+    if not is_message_id(message_id):
+        await interaction.response.send_message("ID de mensagem inválido.", ephemeral=True)
+        return
+
+    # Só o status importa aqui; o sorteio lê os participantes em fluxo do banco
+    data = await adb.aget(message_id, include_participants=False)
     if not data:
         await interaction.response.send_message("Sorteio não encontrado.", ephemeral=True)
         return
@@ -571,21 +1244,245 @@ async def sortear_agora(interaction: discord.Interaction, message_id: str):
     await interaction.response.send_message(f"Encerrando sorteio {message_id}...", ephemeral=True)
     
     data['end_timestamp'] = int(time.time())
-    db.update_giveaway(message_id, data)
+    await adb.aupdate(message_id, {"end_timestamp": data['end_timestamp']})
     
-    await end_giveaway(message_id, data)
+    await end_giveaway(message_id)
 
 
-@bot.event
-async def on_ready():
-    print(f'Bot logado como {bot.user}')
+# --- Comando Slash: Exportar ---
+@bot.tree.command(name="exportar", description="Exporta participantes, ganhadores e histórico de sorteios (CSV/JSONL)")
+async def exportar(interaction: discord.Interaction, message_id: str, formato: Literal["csv", "jsonl"] = "csv"):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("Permissão negada.", ephemeral=True)
+        return
+
+    if not is_message_id(message_id):
+        await interaction.response.send_message("ID de mensagem inválido.", ephemeral=True)
+        return
+
+    data = await adb.aget(message_id, include_participants=False)
+    if not data:
+        await interaction.response.send_message(
+            "Sorteio não encontrado. Se ele foi arquivado, restaure com /arquivo primeiro.", ephemeral=True
+        )
+        return
+
+    # A exportação pode passar dos 3 s do Discord: responde depois pelo followup
+    await api_call("defer", interaction.response.defer(ephemeral=True, thinking=True))
+
+    def build():
+        # Arquivo temporário em disco: nem os registros nem o .gz ficam inteiros na memória
+        out = tempfile.TemporaryFile()
+        try:
+            rows = write_export(export_records(db, message_id, data), out, formato)
+        except BaseException:
+            out.close()
+            raise
+        out.seek(0)
+        return out, rows
+
+    async with export_slots:
+        started = time.perf_counter()
+        try:
+            # Thread própria, não o executor do banco: escritas e cliques não esperam a exportação
+            out, rows = await asyncio.to_thread(build)
+        except Exception as e:
+            # Já adiado: sem o followup o usuário ficaria no "pensando..." para sempre
+            print(f"Erro ao exportar o sorteio {message_id}: {e}")
+            await api_call("followup", interaction.followup.send(
+                "Não foi possível gerar a exportação. Tente de novo em instantes.", ephemeral=True
+            ))
+            return
+        export_time.labels(formato).observe(time.perf_counter() - started)
+
+    with out:
+        size = os.fstat(out.fileno()).st_size
+        limit = interaction.guild.filesize_limit if interaction.guild else 10 * 2**20
+        if size > limit:
+            await api_call("followup", interaction.followup.send(
+                f"O arquivo ficou com {size / 2**20:.1f} MiB, acima do limite de {limit / 2**20:.0f} MiB do servidor.",
+                ephemeral=True
+            ))
+            return
+        filename = f"sorteio-{message_id}.{formato}.gz"
+        await api_call("followup", interaction.followup.send(
+            f"Exportação de **{data.get('title')}**: {rows} registros.",
+            file=discord.File(out, filename=filename), ephemeral=True
+        ))
+
+# --- Comando Slash: Arquivo ---
+@bot.tree.command(name="arquivo", description="Mostra o arquivo de sorteios encerrados ou restaura um sorteio dele")
+async def arquivo(interaction: discord.Interaction, message_id: str = None):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("Permissão negada.", ephemeral=True)
+        return
+
+    if message_id is None:
+        stats = await adb.arun(archive.stats)
+        lines = [
+            f"**{stats['entries']}** sorteios arquivados em {len(stats['files'])} arquivos "
+            f"({stats['bytes'] / 2**20:.2f} MiB + índice de {stats['index_bytes'] / 1024:.1f} KiB)."
+        ]
+        for name, size in list(stats["files"].items())[-12:]:
+            lines.append(f"`{name}`: {size / 1024:.1f} KiB")
+        await interaction.response.send_message("\n".join(lines), ephemeral=True)
+        return
+
+    if not is_message_id(message_id):
+        await interaction.response.send_message("ID de mensagem inválido.", ephemeral=True)
+        return
+
+    if await adb.aget(message_id, include_participants=False):
+        await interaction.response.send_message("Este sorteio já está no banco.", ephemeral=True)
+        return
+
+    if not await is_archived(message_id):
+        await interaction.response.send_message("Sorteio não encontrado no arquivo.", ephemeral=True)
+        return
+
+    # Descomprimir e regravar os participantes pode passar dos 3 s: responde pelo followup
+    await api_call("defer", interaction.response.defer(ephemeral=True, thinking=True))
+    data = await restore_archived(message_id)
+    if data is None:
+        await api_call("followup", interaction.followup.send("Sorteio não encontrado no arquivo.", ephemeral=True))
+        return
+
+    winners = ", ".join(f"<@{w}>" for w in data.get("winners", [])) or "nenhum"
+    await api_call("followup", interaction.followup.send(
+        f"Sorteio **{data.get('title')}** restaurado: {len(data.get('participants', []))} participantes, "
+        f"ganhadores: {winners}.",
+        ephemeral=True
+    ))
+
+# --- Inicialização ---
+# Início da conexão atual (processo ou última queda) e chamadas à API até ali
+_connect_started = time.perf_counter()
+_connect_calls = 0
+_connections = 0
+_recovered = False
+
+def command_tree_hash():
+    """SHA-256 da definição dos comandos slash, como é enviada ao Discord"""
+    payload = sorted((command.to_dict(bot.tree) for command in bot.tree.get_commands()), key=lambda c: c["name"])
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+async def sync_commands():
+    """Sincroniza os comandos só quando a definição mudou desde a última sincronização"""
+    digest = command_tree_hash()
     try:
-        synced = await bot.tree.sync()
-        print(f"Sincronizados {len(synced)} comandos slash.")
+        with open(COMMAND_HASH_FILE, encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = {}
+    if stored.get("application_id") == bot.application_id and stored.get("hash") == digest:
+        print("Comandos slash inalterados; sincronização ignorada.")
+        return
+    try:
+        synced = await api_call("sync", bot.tree.sync())
     except Exception as e:
         print(f"Erro ao sincronizar: {e}")
+        return
+    with open(COMMAND_HASH_FILE, "w", encoding="utf-8") as f:
+        json.dump({"application_id": bot.application_id, "hash": digest}, f)
+    print(f"Sincronizados {len(synced)} comandos slash.")
+
+async def setup_hook():
+    """Roda uma única vez, depois do login e antes da primeira conexão ao gateway"""
+    global _archive_task
+    # Comandos são globais: com vários processos, só o dono do shard 0 sincroniza
+    if not SHARD_COUNT or SHARD_IDS is None or 0 in SHARD_IDS:
+        await sync_commands()
+    
+    scheduler.start()
+    loop_monitor.start()
+    if ARCHIVE_AFTER_DAYS and not archive.readonly:
+        _archive_task = asyncio.create_task(archive_loop())
+    if METRICS_PORT:
+        try:
+            await metrics_server.start()
+        except OSError as e:
+            print(f"Erro ao abrir o endpoint de métricas: {e}")
+
+bot.setup_hook = setup_hook
+
+def log_connected(kind):
+    global _connections
+    _connections += 1
+    elapsed = time.perf_counter() - _connect_started
+    calls = sum(api_calls.values()) - _connect_calls
+    ready_time.labels(kind).observe(elapsed)
+    print(f"Conexão {_connections} ({kind}) pronta em {elapsed:.2f}s com {calls} chamadas à API.")
+
+@bot.event
+async def on_disconnect():
+    global _connect_started, _connect_calls
+    # Várias quedas seguidas contam a partir da primeira
+    if _connections and _connect_started is None:
+        _connect_started = time.perf_counter()
+        _connect_calls = sum(api_calls.values())
+
+@bot.event
+async def on_ready():
+    # Dispara de novo a cada nova sessão no gateway: nada aqui pode repetir trabalho
+    global _recovered, _connect_started
+    if _connect_started is None:
+        _connect_started = time.perf_counter()
+    print(f'Bot logado como {bot.user}')
+    if SHARD_COUNT:
+        print(f"Shards deste processo: {list(served_shards())} de {SHARD_COUNT}.")
+    
+    if not _recovered:
+        # Depende do cache de canais (owns_giveaway), por isso não roda no setup_hook
+        _recovered = True
+        await recover_giveaways()
+    log_connected("ready")
+    _connect_started = None
+
+@bot.event
+async def on_resumed():
+    global _connect_started
+    if _connect_started is not None:
+        log_connected("resumed")
+        _connect_started = None
+
+def run_shard_processes():
+    """Divide os shards em faixas contíguas e sobe um processo filho por faixa"""
+    shard_count = SHARD_COUNT or SHARD_PROCESSES
+    per_process = -(-shard_count // SHARD_PROCESSES)
+    children = []
+    for index in range(SHARD_PROCESSES):
+        first = index * per_process
+        last = min(shard_count, first + per_process) - 1
+        if first > last:
+            break
+        env = dict(
+            os.environ,
+            SHARD_COUNT=str(shard_count),
+            SHARD_IDS=f"{first}-{last}",
+            SHARD_PROCESSES="1",
+            SHARD_PROCESS_INDEX=str(index),
+        )
+        print(f"Iniciando processo {index} com os shards {first}-{last}.")
+        children.append(subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env))
     
-    check_giveaways.start()
+    try:
+        for child in children:
+            child.wait()
+    except KeyboardInterrupt:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.wait()
 
 if __name__ == "__main__":
-    bot.run(os.getenv("DISCORD_TOKEN"))
+    if SHARD_PROCESSES > 1:
+        # A migração do data.json já rodou aqui, antes de existir qualquer filho
+        adb.close()
+        archive.close()
+        run_shard_processes()
+    else:
+        try:
+            bot.run(os.getenv("DISCORD_TOKEN"))
+        finally:
+            adb.close()
+            archive.close()
@@ -0,0 +1,159 @@
+import gzip
+import itertools
+import json
+import os
+import threading
+import time
+
+# IDs de participantes formatados e comprimidos por vez
+PARTICIPANT_CHUNK = 5000
+
+
+# --- Arquivo de Sorteios Encerrados ---
+class GiveawayArchive:
+    """Sorteios antigos fora do banco: um `AAAA-MM.jsonl.gz` só-de-acréscimo por mês
+
+    Cada lote arquivado vira um novo membro gzip no fim do arquivo do mês (um
+    .gz com vários membros continua válido para o `zcat`). O `index.jsonl`
+    guarda message_id -> (arquivo, offset do membro), então uma consulta
+    descomprime só o lote do sorteio, nunca o mês inteiro. O arquivo de dados
+    é gravado e sincronizado antes do índice: um lote sem índice é apenas
+    arquivado de novo na próxima compactação.
+
+    Só um processo grava (`readonly=False`); os outros abrem somente leitura
+    e chamam `refresh()` para enxergar lotes novos.
+    """
+
+    def __init__(self, directory, readonly=False):
+        self.directory = directory
+        self.index_file = os.path.join(directory, "index.jsonl")
+        self.readonly = readonly
+        os.makedirs(directory, exist_ok=True)
+        self._index = {}
+        self._index_pos = 0
+        self._lock = threading.Lock()
+        self.refresh()
+        if not readonly and os.path.exists(self.index_file) and self._index_pos < os.path.getsize(self.index_file):
+            # Linha parcial de uma escrita interrompida
+            with open(self.index_file, 'r+b') as f:
+                f.truncate(self._index_pos)
+        self._index_fp = None if readonly else open(self.index_file, 'a', encoding='utf-8')
+
+    def refresh(self):
+        """Lê as entradas do índice gravadas desde a última leitura"""
+        if not os.path.exists(self.index_file):
+            return
+        with self._lock, open(self.index_file, 'rb') as f:
+            f.seek(self._index_pos)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(raw)
+                except json.JSONDecodeError:
+                    break
+                self._index_pos += len(raw)
+                self._index[record["id"]] = (record["file"], record["offset"])
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, message_id):
+        return str(message_id) in self._index
+
+    def append(self, giveaways, entries, archived_at=None):
+        """Arquiva [(message_id, dados sem participantes)] em um único membro gzip; devolve os bytes gravados
+
+        `entries(message_id)` percorre os pares (user_id, peso) do sorteio: os
+        participantes vão para o compressor em blocos, direto no arquivo do
+        mês, sem montar a lista nem o texto do lote na memória.
+        """
+        if self.readonly:
+            raise RuntimeError("Arquivo aberto somente para leitura")
+        if not giveaways:
+            return 0
+        archived_at = archived_at or int(time.time())
+        name = time.strftime("%Y-%m", time.gmtime(archived_at)) + ".jsonl.gz"
+
+        with self._lock:
+            with open(os.path.join(self.directory, name), 'ab') as f:
+                f.seek(0, os.SEEK_END)
+                offset = f.tell()
+                try:
+                    with gzip.GzipFile(fileobj=f, mode="wb") as out:
+                        for msg_id, data in giveaways:
+                            self._write_record(out, msg_id, data, entries(msg_id), archived_at)
+                    f.flush()
+                    os.fsync(f.fileno())
+                except BaseException:
+                    # Membro pela metade no fim do arquivo atrapalharia as leituras seguintes
+                    f.truncate(offset)
+                    raise
+                written = f.tell() - offset
+
+            for msg_id, _ in giveaways:
+                self._index_fp.write(json.dumps({"id": str(msg_id), "file": name, "offset": offset}) + "\n")
+            self._index_fp.flush()
+            os.fsync(self._index_fp.fileno())
+            self._index_pos = self._index_fp.tell()
+            for msg_id, _ in giveaways:
+                self._index[str(msg_id)] = (name, offset)
+        return written
+
+    @staticmethod
+    def _write_record(out, msg_id, data, entries, archived_at):
+        """Uma linha {"id", "archived_at", "data"} com `participants` e `weights` escritos em fluxo"""
+        data = {key: value for key, value in data.items() if key not in ("participants", "weights")}
+        head = json.dumps({"id": str(msg_id), "archived_at": archived_at, "data": data},
+                          ensure_ascii=False, separators=(",", ":"))
+        # Reabre o objeto `data` (termina em "}}") para acrescentar a lista de participantes
+        out.write((head[:-2] + ("," if data else "") + '"participants":[').encode('utf-8'))
+
+        weights = {}
+        entries = iter(entries)
+        separator = ""
+        while True:
+            chunk = list(itertools.islice(entries, PARTICIPANT_CHUNK))
+            if not chunk:
+                break
+            out.write((separator + ",".join(str(user_id) for user_id, _ in chunk)).encode('ascii'))
+            separator = ","
+            weights.update((str(user_id), weight) for user_id, weight in chunk if weight > 1)
+
+        tail = "]"
+        if weights:
+            tail += ',"weights":' + json.dumps(weights, separators=(",", ":"))
+        out.write((tail + "}}\n").encode('ascii'))
+
+    def get(self, message_id):
+        """Dados arquivados do sorteio (com participantes) ou None"""
+        str_id = str(message_id)
+        entry = self._index.get(str_id)
+        if entry is None:
+            return None
+        name, offset = entry
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            f.seek(offset)
+            with gzip.GzipFile(fileobj=f) as member:
+                for raw in member:
+                    record = json.loads(raw)
+                    if record["id"] == str_id:
+                        return record["data"]
+        return None
+
+    def stats(self):
+        files = {}
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".jsonl.gz"):
+                files[name] = os.path.getsize(os.path.join(self.directory, name))
+        return {
+            "entries": len(self._index),
+            "files": files,
+            "bytes": sum(files.values()),
+            "index_bytes": os.path.getsize(self.index_file) if os.path.exists(self.index_file) else 0,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._index_fp is not None:
+                self._index_fp.close()
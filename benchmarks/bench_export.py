@@ -0,0 +1,104 @@
+"""Benchmark: /exportar de um sorteio com 1M de participantes no SQLite
+
+Uso: python benchmarks/bench_export.py [participantes]
+
+Mede vazão (registros/s) e tamanho do .gz em CSV e JSONL, e o pico de
+memória de cada exportação em uma execução separada (o tracemalloc
+distorce o tempo). Falha (exit 1) se o pico passar de MEMORY_CEILING ou
+se o arquivo descomprimido não tiver todos os registros.
+"""
+import gzip
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from export import FORMATS, export_records, write_export  # noqa: E402
+from selection import draw_winners  # noqa: E402
+from storage import Database, SQLiteBackend  # noqa: E402
+
+# Teto de memória da exportação (não inclui o cache do SQLite)
+MEMORY_CEILING = 8 * 1024 * 1024
+MESSAGE_ID = 1
+WINNERS = 10
+REROLLS = 5
+BATCH = 50_000
+
+
+def populate(db, participants):
+    start = time.perf_counter()
+    db.update_giveaway(MESSAGE_ID, {"status": "running", "title": "Benchmark", "winners_count": WINNERS})
+    for base in range(0, participants, BATCH):
+        end = min(base + BATCH, participants)
+        db.backend.add_participants_bulk((MESSAGE_ID, 10**17 + i, 2 if i % 10 == 0 else 1) for i in range(base, end))
+
+    # Resultado com histórico: sorteio final e alguns rerolls
+    source = db.participant_source(MESSAGE_ID)
+    draw = draw_winners(source, WINNERS)
+    winners, draws = list(draw.winners), [draw.audit()]
+    for slot in range(REROLLS):
+        reroll = draw_winners(source, 1, exclude=winners, kind="reroll")
+        draws.append(reroll.audit(slot=slot, replaced=winners[slot]))
+        winners[slot] = reroll.winners[0]
+    db.update_giveaway(MESSAGE_ID, {"status": "ended", "winners": winners, "draws": draws})
+    print(f"Inseridos {participants} participantes em {time.perf_counter() - start:.1f}s")
+
+
+def export(db, fmt):
+    data = db.get_giveaway(MESSAGE_ID, include_participants=False)
+    out = tempfile.TemporaryFile()
+    rows = write_export(export_records(db, MESSAGE_ID, data), out, fmt)
+    return out, rows
+
+
+def main():
+    participants = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    expected = participants + WINNERS + WINNERS + REROLLS
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_export_"), "bench.db")
+    db = Database(SQLiteBackend(path))
+    populate(db, participants)
+
+    failed = False
+    peaks = []
+    for fmt in FORMATS:
+        start = time.perf_counter()
+        out, rows = export(db, fmt)
+        elapsed = time.perf_counter() - start
+        size = os.fstat(out.fileno()).st_size
+
+        # Conferência: o .gz descomprime com todas as linhas (CSV tem cabeçalho)
+        out.seek(0)
+        with gzip.GzipFile(fileobj=out) as f:
+            lines = sum(1 for _ in f) - (1 if fmt == "csv" else 0)
+        out.close()
+
+        tracemalloc.start()
+        out, _ = export(db, fmt)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        out.close()
+        peaks.append(peak)
+
+        print(f"{fmt:<6} {rows:>9} registros  {elapsed:>6.2f} s  {rows / elapsed:>10.0f} reg/s  "
+              f"{size / 2**20:>6.2f} MiB gz  pico {peak / 1024:>8.1f} KiB")
+        if rows != expected or lines != expected:
+            print(f"FALHA: {fmt} com {rows} registros gravados e {lines} linhas (esperado {expected})")
+            failed = True
+
+    db.close()
+    peak = max(peaks)
+    if peak > MEMORY_CEILING:
+        print(f"FALHA: pico de {peak / 1024 / 1024:.1f} MiB acima do teto de {MEMORY_CEILING / 1024 / 1024:.0f} MiB")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f"OK: pico de {peak / 1024 / 1024:.2f} MiB (teto {MEMORY_CEILING / 1024 / 1024:.0f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
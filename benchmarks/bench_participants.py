@@ -0,0 +1,82 @@
+"""Benchmark: memória e tamanho serializado dos participantes
+
+Compara a lista de ints (formato antigo), um set de ints e o
+ParticipantSet (array('Q') ordenado) com 100k e 1M de participantes.
+
+Uso: python benchmarks/bench_participants.py
+"""
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from participants import ParticipantSet  # noqa: E402
+
+# Faixa realista de snowflakes de usuários do Discord
+SNOWFLAKE_MIN = 10**17
+SNOWFLAKE_MAX = 2 * 10**18
+
+
+def measure(build):
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def fmt(n):
+    return f"{n / 1024 / 1024:>8.2f} MiB"
+
+
+def run(count):
+    ids = random.sample(range(SNOWFLAKE_MIN, SNOWFLAKE_MAX), count)
+    print(f"\n=== {count:,} participantes ===")
+
+    # Parte de strings para que cada estrutura aloque seus próprios objetos int
+    as_str = [str(i) for i in ids]
+    as_list, list_mem = measure(lambda: [int(s) for s in as_str])
+    _, set_mem = measure(lambda: {int(s) for s in as_str})
+    compact, compact_mem = measure(lambda: ParticipantSet(as_str))
+    print("Memória")
+    print(f"  lista de int              {fmt(list_mem)}")
+    print(f"  set de int                {fmt(set_mem)}")
+    print(f"  ParticipantSet            {fmt(compact_mem)}")
+
+    pretty, pretty_ms = timed(lambda: json.dumps(as_list, indent=4))
+    plain, plain_ms = timed(lambda: json.dumps(as_list))
+    raw, raw_ms = timed(compact.to_bytes)
+    _, load_json_ms = timed(lambda: json.loads(pretty))
+    _, load_raw_ms = timed(lambda: ParticipantSet.from_bytes(raw))
+    print("Serialização (tamanho / escrita / leitura)")
+    print(f"  JSON indent=4             {fmt(len(pretty))} {pretty_ms:>8.1f} ms {load_json_ms:>8.1f} ms")
+    print(f"  JSON compacto             {fmt(len(plain))} {plain_ms:>8.1f} ms")
+    print(f"  binário (array 'Q')       {fmt(len(raw))} {raw_ms:>8.1f} ms {load_raw_ms:>8.1f} ms")
+
+    probes = random.sample(ids, 1000) + [SNOWFLAKE_MIN - 1] * 1000
+    _, lookup_ms = timed(lambda: sum(p in compact for p in probes))
+    print(f"Pertinência: {len(probes)} consultas em {lookup_ms:.2f} ms")
+
+    fresh = ParticipantSet()
+    _, add_ms = timed(lambda: [fresh.add(i) for i in ids])
+    print(f"Inserção incremental: {count / (add_ms / 1000):,.0f} entradas/s")
+
+
+def main():
+    for count in (100_000, 1_000_000):
+        run(count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Microbenchmark: renderizações de SorteioView por segundo, sem e com cache
+
+Uso: python benchmarks/bench_render.py [iterações]
+"""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Banco temporário, para não tocar no data.db real
+os.chdir(tempfile.mkdtemp(prefix="bench_render_"))
+os.environ.setdefault("DB_FILE", "bench.db")
+
+from app import SorteioView  # noqa: E402
+
+
+def sample_data(participants):
+    return {
+        "channel_id": 1,
+        "title": "Sorteio de Benchmark",
+        "rules": "1 - Entre no servidor\n2 - Participe!",
+        "prize": "Um prêmio legal",
+        "image_url": "https://i.imgur.com/joSz2Qb.png",
+        "duration_days": 5,
+        "end_timestamp": int(time.time()) + 5 * 86400,
+        "winners_count": 3,
+        "status": "running",
+        "participants": list(range(participants)),
+        "winners": [],
+    }
+
+
+def bench(label, render, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        render(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {iterations / elapsed:>10.0f} renders/s")
+    return iterations / elapsed
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    data = sample_data(1000)
+
+    # Antes: cada interação montava a view do zero
+    before = bench("SorteioView() sem cache", lambda i: SorteioView("1", dict(data)), iterations)
+
+    # Depois: só os campos dinâmicos são atualizados (simula o contador subindo)
+    def cached(i):
+        data["participants"].append(10_000 + i)
+        SorteioView.render("1", data)
+
+    after = bench("SorteioView.render() cache", cached, iterations)
+    print(f"Ganho: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Benchmark: sorteio de ganhadores com 1M de participantes no SQLite
+
+Uso: python benchmarks/bench_selection.py [participantes] [ganhadores]
+
+Falha (exit 1) se o pico de memória do sorteio passar de MEMORY_CEILING ou
+se a montagem da tabela de alias (sorteio ponderado) passar de ALIAS_MEMORY_CEILING.
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from selection import DrawRNG, _reservoir, draw_weighted, draw_winners  # noqa: E402
+from storage import Database, SQLiteBackend  # noqa: E402
+
+# Teto de memória do motor de sorteio (não inclui o cache do SQLite)
+MEMORY_CEILING = 8 * 1024 * 1024
+# A tabela de alias ocupa 8 bytes por participante, mais os temporários da montagem
+ALIAS_MEMORY_CEILING = 32 * 1024 * 1024
+MESSAGE_ID = 1
+WEIGHTED_MESSAGE_ID = 2
+# Sorteio ponderado: um em cada BONUS_EVERY participantes tem BONUS_WEIGHT entradas
+BONUS_EVERY = 10
+BONUS_WEIGHT = 3
+BATCH = 50_000
+
+
+def populate(db, participants, message_id=MESSAGE_ID, weighted=False):
+    db.update_giveaway(message_id, {"status": "running", "winners_count": 1})
+    start = time.perf_counter()
+    for base in range(0, participants, BATCH):
+        end = min(base + BATCH, participants)
+        if weighted:
+            entries = ((message_id, 10**17 + i, BONUS_WEIGHT if i % BONUS_EVERY == 0 else 1) for i in range(base, end))
+        else:
+            entries = ((message_id, 10**17 + i) for i in range(base, end))
+        db.backend.add_participants_bulk(entries)
+    print(f"Inseridos {participants} participantes em {time.perf_counter() - start:.1f}s")
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<40} {elapsed * 1000:>9.1f} ms   pico {peak / 1024:>9.1f} KiB")
+    return result, peak
+
+
+def measure_apart(label, fn):
+    """Tempo e pico em execuções separadas: o tracemalloc distorce o tempo de laços que alocam muito"""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<40} {elapsed * 1000:>9.1f} ms   pico {peak / 1024:>9.1f} KiB")
+    return result, peak
+
+
+def main():
+    participants = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    winners = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_selection_"), "bench.db")
+    db = Database(SQLiteBackend(path))
+    populate(db, participants)
+
+    source = db.participant_source(MESSAGE_ID)
+    draw, peak_final = measure(f"Sorteio final ({winners} ganhadores)", lambda: draw_winners(source, winners))
+    _, peak_reroll = measure("Reroll (exclui os demais)", lambda: draw_winners(source, 1, exclude=draw.winners[1:], kind="reroll"))
+
+    # Caminho em fluxo: quase todos excluídos obriga a varrer a fonte inteira
+    _, peak_stream = measure("Reservatório (varredura completa)", lambda: _reservoir(source, winners, set(), DrawRNG()))
+
+    # Reprodutibilidade: mesma semente, mesmo resultado
+    replay = draw_winners(source, winners, seed=draw.seed)
+    assert replay.winners == draw.winners, "Sorteio não reproduzível com a mesma semente"
+    print(f"Semente {draw.seed[:16]}... reproduzida com sucesso")
+
+    # --- Sorteio ponderado (entradas bônus) ---
+    populate(db, participants, WEIGHTED_MESSAGE_ID, weighted=True)
+    weighted_source = db.participant_source(WEIGHTED_MESSAGE_ID)
+    table, peak_alias = measure_apart("Tabela de alias (montagem + gravação)",
+                                      lambda: db.alias_table(WEIGHTED_MESSAGE_ID, rebuild=True))
+    weighted, _ = measure(f"Sorteio ponderado ({winners} ganhadores)",
+                          lambda: draw_weighted(table, weighted_source, winners))
+    # Reroll como depois de um restart: tabela lida do banco, não da memória
+    db._alias_tables.clear()
+    _, peak_alias_load = measure("Reroll ponderado (tabela gravada)", lambda: draw_weighted(
+        db.alias_table(WEIGHTED_MESSAGE_ID), weighted_source, 1, exclude=weighted.winners[1:], kind="reroll"
+    ))
+    replay = draw_weighted(db.alias_table(WEIGHTED_MESSAGE_ID), weighted_source, winners, seed=weighted.seed)
+    assert replay.winners == weighted.winners, "Sorteio ponderado não reproduzível com a mesma semente"
+
+    # Proporção: participantes com bônus devem sair na razão do peso deles
+    draws = 20_000
+    bonus_hits = sum(
+        (table.sample(rng) % BONUS_EVERY == 0) for rng in [DrawRNG()] for _ in range(draws)
+    )
+    bonus_share = (participants + BONUS_EVERY - 1) // BONUS_EVERY * BONUS_WEIGHT
+    expected = bonus_share / (bonus_share + participants - (participants + BONUS_EVERY - 1) // BONUS_EVERY)
+    print(f"Bônus sorteados: {bonus_hits / draws:.3f} (esperado {expected:.3f})")
+
+    db.close()
+    peak = max(peak_final, peak_reroll, peak_stream)
+    peak_alias = max(peak_alias, peak_alias_load)
+    failed = False
+    if peak > MEMORY_CEILING:
+        print(f"FALHA: pico de {peak / 1024 / 1024:.1f} MiB acima do teto de {MEMORY_CEILING / 1024 / 1024:.0f} MiB")
+        failed = True
+    if peak_alias > ALIAS_MEMORY_CEILING:
+        print(f"FALHA: tabela de alias com pico de {peak_alias / 1024 / 1024:.1f} MiB "
+              f"(teto {ALIAS_MEMORY_CEILING / 1024 / 1024:.0f} MiB)")
+        failed = True
+    if abs(bonus_hits / draws - expected) > 0.02:
+        print("FALHA: proporção dos bônus fora do esperado")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f"OK: pico de {peak / 1024 / 1024:.2f} MiB (teto {MEMORY_CEILING / 1024 / 1024:.0f} MiB), "
+          f"alias {peak_alias / 1024 / 1024:.2f} MiB (teto {ALIAS_MEMORY_CEILING / 1024 / 1024:.0f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Objetos falsos do discord.py para rodar os handlers do bot sem gateway/API
+
+Só implementam o que os handlers usam; cada resposta fica registrada para
+conferência. `FakeDiscord.install(bot)` troca a busca de canais do bot pelos
+canais falsos, que contam as chamadas à API e podem simular latência de rede.
+"""
+import asyncio
+import itertools
+import time
+from collections import Counter
+
+
+class FakePermissions:
+    def __init__(self, administrator=False):
+        self.administrator = administrator
+
+
+class FakeUser:
+    def __init__(self, user_id, administrator=False):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+        self.guild_permissions = FakePermissions(administrator)
+
+
+class FakeResponse:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.sent = []
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def _respond(self, kind, payload):
+        if self._done:
+            raise RuntimeError("Interação já respondida")
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self._done = True
+        self.sent.append((kind, payload, time.perf_counter()))
+
+    async def send_message(self, content=None, **kwargs):
+        await self._respond("message", content)
+
+    async def edit_message(self, **kwargs):
+        await self._respond("edit", kwargs)
+
+    async def send_modal(self, modal):
+        await self._respond("modal", modal)
+
+    async def defer(self, **kwargs):
+        await self._respond("defer", None)
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+
+
+class FakeInteraction:
+    _ids = itertools.count(1_200_000_000_000_000_000)
+
+    def __init__(self, custom_id, user_id, administrator=False, latency=0.0, channel=None):
+        self.id = next(self._ids)
+        self.data = {"custom_id": custom_id, "component_type": 2}
+        self.user = FakeUser(user_id, administrator)
+        self.message = None
+        self.channel = channel
+        self.channel_id = channel.id if channel is not None else None
+        self.guild_id = 1
+        self.response = FakeResponse(latency)
+        self.followup = FakeFollowup()
+        # Edições da mensagem do painel depois de uma resposta adiada
+        self.edits = []
+
+    async def edit_original_response(self, **kwargs):
+        self.edits.append(kwargs)
+
+
+class FakeMessage:
+    def __init__(self, channel, message_id):
+        self.channel = channel
+        self.id = message_id
+
+    async def edit(self, **kwargs):
+        await self.channel.discord.call("edit")
+        self.channel.edits[self.id] = kwargs
+        self.channel.edited_at[self.id] = time.perf_counter()
+        return self
+
+
+class FakeChannel:
+    def __init__(self, discord, channel_id):
+        self.discord = discord
+        self.id = channel_id
+        # Último conteúdo enviado em cada mensagem editada e quando
+        self.edits = {}
+        self.edited_at = {}
+
+    async def fetch_message(self, message_id):
+        await self.discord.call("fetch_message")
+        return FakeMessage(self, message_id)
+
+    def get_partial_message(self, message_id):
+        return FakeMessage(self, message_id)
+
+    async def send(self, content=None, **kwargs):
+        await self.discord.call("send")
+        return FakeMessage(self, self.discord.next_id())
+
+
+class FakeDiscord:
+    """Lado REST do Discord: canais por ID, chamadas contadas, latência opcional"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.channels = {}
+        self._next_id = 1_300_000_000_000_000_000
+
+    def next_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def channel(self, channel_id):
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            channel = self.channels[channel_id] = FakeChannel(self, channel_id)
+        return channel
+
+    async def call(self, kind):
+        self.calls[kind] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def install(self, bot):
+        bot.get_channel = self.channel
+        bot.get_partial_messageable = self.channel
@@ -0,0 +1,466 @@
+"""Bancada de benchmarks offline: cargas sintéticas pelo código real do bot
+
+Cada cenário roda em um processo próprio (banco temporário novo, pico de RSS
+isolado) e passa pelos handlers reais — on_interaction, end_giveaway,
+check_giveaways, recover_giveaways e SorteioView — com o Discord trocado por
+objetos falsos (benchmarks/fakes.py). Nenhum token é necessário.
+
+Uso:
+    python benchmarks/harness.py                      # todos os cenários
+    python benchmarks/harness.py join_storm mass_expiry
+    python benchmarks/harness.py --scale 0.1          # cargas 10x menores
+    python benchmarks/harness.py --api-latency-ms 50  # simula a rede do Discord
+    python benchmarks/harness.py --save base.json     # grava a linha de base
+    python benchmarks/harness.py --compare base.json  # falha se houver regressão
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fakes import FakeDiscord, FakeInteraction
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+FIRST_USER = 10_000
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KiB, macOS em bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# --- Cenários (rodam no processo filho, com o app importado) ---
+
+async def create_giveaway(app, msg_id, status="running", end_in=3600, winners=1, channel_id=1):
+    await app.adb.aupdate(msg_id, {
+        "channel_id": channel_id,
+        "guild_id": 1,
+        "title": f"Sorteio {msg_id}",
+        "status": status,
+        "end_timestamp": int(time.time()) + end_in,
+        "winners_count": winners,
+        "winners": [],
+    })
+
+
+async def timed_click(app, discord, msg_id, user_id, latencies):
+    interaction = FakeInteraction(app.router.custom_id("join", msg_id), user_id, channel=discord.channel(1))
+    started = time.perf_counter()
+    await app.on_interaction(interaction)
+    latencies.append(time.perf_counter() - started)
+
+
+async def join_storm(app, discord, scale):
+    """Uma rajada de cliques em "Participar" no mesmo sorteio"""
+    clicks = int(20_000 * scale)
+    msg_id = str(discord.next_id())
+    await create_giveaway(app, msg_id)
+
+    latencies = []
+    await asyncio.gather(*(timed_click(app, discord, msg_id, FIRST_USER + i, latencies) for i in range(clicks)))
+    await app.adb.arun(app.db.flush)
+    assert app.db.participant_count(msg_id) == clicks
+    return {"ops": clicks, "latencies": latencies}
+
+
+async def concurrent_giveaways(app, discord, scale):
+    """Muitos sorteios abertos recebendo cliques intercalados"""
+    giveaways = max(1, int(500 * scale))
+    per_giveaway = 40
+    ids = [str(discord.next_id()) for _ in range(giveaways)]
+    for msg_id in ids:
+        await create_giveaway(app, msg_id)
+
+    latencies = []
+    clicks = [
+        timed_click(app, discord, msg_id, FIRST_USER + i, latencies)
+        for i in range(per_giveaway) for msg_id in ids
+    ]
+    await asyncio.gather(*clicks)
+    return {"ops": len(clicks), "latencies": latencies}
+
+
+async def large_history(app, discord, scale):
+    """Banco com muito histórico encerrado: recuperação no boot e cliques continuam rápidos"""
+    ended = int(20_000 * scale)
+    running = max(1, int(200 * scale))
+
+    def populate():
+        entries = []
+        for i in range(ended):
+            msg_id = str(discord.next_id())
+            app.db.update_giveaway(msg_id, {
+                "channel_id": 1, "guild_id": 1, "title": f"Antigo {i}", "status": "ended",
+                "end_timestamp": int(time.time()) - 86400, "winners": [FIRST_USER],
+            })
+            entries.extend((msg_id, FIRST_USER + u) for u in range(20))
+        app.db.backend.add_participants_bulk(entries)
+
+    await app.adb.arun(populate)
+    ids = [str(discord.next_id()) for _ in range(running)]
+    for msg_id in ids:
+        await create_giveaway(app, msg_id)
+
+    started = time.perf_counter()
+    await app.recover_giveaways()
+    recovery = time.perf_counter() - started
+
+    latencies = []
+    clicks = [timed_click(app, discord, msg_id, FIRST_USER + u, latencies) for u in range(10) for msg_id in ids]
+    await asyncio.gather(*clicks)
+    return {"ops": len(clicks), "latencies": latencies, "history": ended, "recovery_s": round(recovery, 3)}
+
+
+async def archive_compaction(app, discord, scale):
+    """Arquivamento de sorteios antigos com muitos participantes enquanto os cliques continuam"""
+    ended = max(1, int(500 * scale))
+    per_giveaway = 2000
+    running = max(1, int(100 * scale))
+    old = int(time.time()) - (app.ARCHIVE_AFTER_DAYS + 1) * 86400
+    ended_ids = [str(discord.next_id()) for _ in range(ended)]
+
+    def populate():
+        for msg_id in ended_ids:
+            app.db.update_giveaway(msg_id, {
+                "channel_id": 1, "guild_id": 1, "title": f"Antigo {msg_id}", "status": "ended",
+                "end_timestamp": old, "winners": [FIRST_USER],
+            })
+        # Um participante com entradas bônus por sorteio: o peso precisa sobreviver ao arquivo
+        app.db.backend.add_participants_bulk([
+            (msg_id, FIRST_USER + u, 3 if u == 0 else 1) for msg_id in ended_ids for u in range(per_giveaway)
+        ])
+
+    await app.adb.arun(populate)
+    ids = [str(discord.next_id()) for _ in range(running)]
+    for msg_id in ids:
+        await create_giveaway(app, msg_id)
+
+    # Dados em cache antes do arquivamento, como num processo que não foi o que arquivou
+    stale = await app.adb.aget(ended_ids[1], include_participants=False)
+
+    latencies = []
+    clicks = [timed_click(app, discord, msg_id, FIRST_USER + u, latencies) for u in range(20) for msg_id in ids]
+    moved, _ = await asyncio.gather(app.compact_archive(), asyncio.gather(*clicks))
+    assert moved == ended, f"{moved} de {ended} sorteios arquivados"
+
+    restored = await app.restore_archived(ended_ids[-1])
+    assert restored["participants"] == [FIRST_USER + u for u in range(per_giveaway)]
+    assert restored["weights"] == {str(FIRST_USER): 3}
+
+    # Clique em "Participar" num sorteio arquivado não restaura nada
+    join = FakeInteraction(app.router.custom_id("join", ended_ids[0]), FIRST_USER, channel=discord.channel(1))
+    await app.on_interaction(join)
+    assert ended_ids[0] in app.archive and not await app.adb.aget(ended_ids[0], include_participants=False)
+
+    # Reroll tardio: adia a resposta, restaura e edita a mensagem pela resposta original
+    click = FakeInteraction(app.router.custom_id("reroll", ended_ids[0], 0), 1, administrator=True,
+                            channel=discord.channel(1))
+    await app.on_interaction(click)
+    assert click.response.sent[0][0] == "defer", "Reroll de sorteio arquivado respondeu sem adiar"
+    assert click.edits and click.followup.sent, "Reroll restaurado sem resultado"
+
+    # Cache velho (outro processo arquivou): o reroll confere o banco e restaura em vez de achar zero participantes
+    app.db.cache.put(ended_ids[1], stale)
+    click = FakeInteraction(app.router.custom_id("reroll", ended_ids[1], 0), 1, administrator=True,
+                            channel=discord.channel(1))
+    await app.on_interaction(click)
+    assert click.edits and click.followup.sent[-1].startswith("Ganhador atualizado"), click.followup.sent
+    return {"ops": len(clicks), "latencies": latencies, "archived": moved}
+
+
+async def mass_expiry(app, discord, scale):
+    """Centenas de sorteios vencendo juntos, encerrados pelo callback do agendador"""
+    giveaways = max(1, int(500 * scale))
+    per_giveaway = 200
+    channels = 50
+    ids = [str(discord.next_id()) for _ in range(giveaways)]
+    for i, msg_id in enumerate(ids):
+        await create_giveaway(app, msg_id, end_in=-1, winners=3, channel_id=1 + i % channels)
+    await app.adb.arun(
+        app.db.backend.add_participants_bulk,
+        [(msg_id, FIRST_USER + u) for msg_id in ids for u in range(per_giveaway)],
+    )
+
+    started = time.perf_counter()
+    await app.check_giveaways(ids)
+    # Latência de cada sorteio: do vencimento até o resultado publicado na mensagem
+    latencies = [
+        discord.channel(1 + i % channels).edited_at[int(msg_id)] - started for i, msg_id in enumerate(ids)
+    ]
+
+    ended = await app.adb.aiter_giveaways(status="ended", include_participants=False)
+    assert len(ended) == giveaways
+    return {"ops": giveaways, "latencies": latencies}
+
+
+async def finalize_during_joins(app, discord, scale):
+    """Lote de sorteios ponderados grandes encerrando enquanto outros sorteios recebem cliques"""
+    expiring = max(1, int(100 * scale))
+    per_giveaway = 20_000
+    running = max(1, int(500 * scale))
+    due = [str(discord.next_id()) for _ in range(expiring)]
+    for i, msg_id in enumerate(due):
+        await create_giveaway(app, msg_id, end_in=-1, winners=3, channel_id=1 + i % 50)
+        # Entradas bônus: o encerramento monta a tabela de alias de cada um
+        await app.adb.aupdate(msg_id, {"bonus_roles": {"1": 2}})
+    await app.adb.arun(
+        app.db.backend.add_participants_bulk,
+        [(msg_id, FIRST_USER + u, 3 if u % 10 == 0 else 1) for msg_id in due for u in range(per_giveaway)],
+    )
+    # IDs espaçados: caem em faixas de lock espalhadas, como snowflakes reais (os seguidos não)
+    ids = [str([discord.next_id() for _ in range(97)][-1]) for _ in range(running)]
+    for msg_id in ids:
+        await create_giveaway(app, msg_id)
+    # Primeiro clique de cada um carrega o conjunto de participantes (fora da medição)
+    await asyncio.gather(*(timed_click(app, discord, msg_id, FIRST_USER, []) for msg_id in ids))
+
+    latencies = []
+    finalize_time = []
+
+    async def finalize():
+        started = time.perf_counter()
+        await app.check_giveaways(due)
+        finalize_time.append(time.perf_counter() - started)
+
+    clicks = [timed_click(app, discord, msg_id, FIRST_USER + u, latencies) for u in range(1, 21) for msg_id in ids]
+    await asyncio.gather(finalize(), *clicks)
+    ended = await app.adb.aiter_giveaways(status="ended", include_participants=False)
+    assert len(ended) == expiring
+    # Cliques em sorteios que dividem faixa de lock com o lote não esperam o lote inteiro
+    assert percentile(latencies, 0.99) < finalize_time[0] / 2, "Cliques presos atrás do encerramento em lote"
+    return {"ops": len(latencies), "latencies": latencies, "finalize_s": round(finalize_time[0], 3)}
+
+
+async def expiry_retry(app, discord, scale):
+    """O callback do agendador falha uma vez: os sorteios vencidos voltam ao heap e encerram na nova tentativa"""
+    giveaways = max(1, int(100 * scale))
+    ids = [str(discord.next_id()) for _ in range(giveaways)]
+    for msg_id in ids:
+        await create_giveaway(app, msg_id, end_in=-1)
+
+    calls = []
+
+    async def flaky(due):
+        calls.append(len(due))
+        if len(calls) == 1:
+            raise RuntimeError("falha simulada")
+        await app.check_giveaways(due)
+
+    app.scheduler.on_due = flaky
+    app.scheduler.retry_delay = 0
+    started = time.perf_counter()
+    app.scheduler.start()
+    app.scheduler.rebuild((msg_id, time.time() - 1) for msg_id in ids)
+    while len(await app.adb.aiter_giveaways(status="ended", include_participants=False)) < giveaways:
+        assert time.perf_counter() - started < 10, "Sorteios não encerrados depois da falha do agendador"
+        await asyncio.sleep(0.05)
+    app.scheduler.stop()
+
+    assert len(calls) >= 2 and calls[0] == giveaways
+    return {"ops": giveaways, "latencies": [time.perf_counter() - started]}
+
+
+async def sharded_recovery(app, discord, scale):
+    """SHARD_COUNT sem SHARD_IDS (o padrão): o processo atende todos os shards e recupera todos os sorteios"""
+    giveaways = max(2, int(200 * scale))
+    ids = [str(discord.next_id()) for _ in range(giveaways)]
+    for i, msg_id in enumerate(ids):
+        await create_giveaway(app, msg_id)
+        # Guilds espalhadas pelos shards (shard = (guild_id >> 22) % SHARD_COUNT)
+        await app.adb.aupdate(msg_id, {"guild_id": (i << 22) + 1})
+
+    started = time.perf_counter()
+    await app.recover_giveaways()
+    latency = time.perf_counter() - started
+    assert len(app.scheduler) == giveaways, f"{len(app.scheduler)} de {giveaways} sorteios agendados"
+    return {"ops": giveaways, "latencies": [latency]}
+
+
+async def legacy_buttons(app, discord, scale):
+    """Mensagens de antes dos IDs "g1:": depois da recuperação os botões antigos ainda funcionam"""
+    giveaways = max(1, int(100 * scale))
+    per_giveaway = 10
+    ids = [str(discord.next_id()) for _ in range(giveaways)]
+    for msg_id in ids:
+        await create_giveaway(app, msg_id)
+    # Reanexa as views (só com os IDs novos), como no boot depois da atualização
+    await app.recover_giveaways()
+
+    def legacy_click(msg_id, user_id, custom_id):
+        interaction = FakeInteraction(custom_id, user_id, channel=discord.channel(1))
+        interaction.message = discord.channel(1).get_partial_message(int(msg_id))
+        return interaction
+
+    latencies = []
+    for msg_id in ids:
+        for u in range(per_giveaway):
+            interaction = legacy_click(msg_id, FIRST_USER + u, f"join_{msg_id}")
+            started = time.perf_counter()
+            await app.on_interaction(interaction)
+            latencies.append(time.perf_counter() - started)
+            assert interaction.response.sent, f"Clique legado em {msg_id} descartado sem resposta"
+
+    # Botão com ID novo na mesma mensagem fica com a view registrada, não com o roteador
+    native = legacy_click(ids[0], 1, app.router.custom_id("join", ids[0]))
+    await app.on_interaction(native)
+    assert not native.response.sent, "Clique com ID novo atendido duas vezes"
+
+    await app.adb.arun(app.db.flush)
+    for msg_id in ids:
+        assert app.db.participant_count(msg_id) == per_giveaway
+    return {"ops": len(latencies), "latencies": latencies}
+
+
+SCENARIOS = {
+    "join_storm": join_storm,
+    "concurrent_giveaways": concurrent_giveaways,
+    "large_history": large_history,
+    "mass_expiry": mass_expiry,
+    "archive_compaction": archive_compaction,
+    "finalize_during_joins": finalize_during_joins,
+    "expiry_retry": expiry_retry,
+    "legacy_buttons": legacy_buttons,
+    "sharded_recovery": sharded_recovery,
+}
+
+# Variáveis de ambiente próprias de um cenário, aplicadas antes de importar o app
+SCENARIO_ENV = {
+    "sharded_recovery": {"SHARD_COUNT": "4"},
+}
+
+
+def run_child(name, scale, api_latency):
+    """Executa um cenário neste processo e imprime o resultado como JSON"""
+    os.chdir(tempfile.mkdtemp(prefix=f"bench_{name}_"))
+    os.environ["DB_FILE"] = "bench.db"
+    # Contador reeditado durante a carga, não depois dela
+    os.environ.setdefault("COUNTER_UPDATE_WINDOW_MS", "100")
+    os.environ["METRICS_PORT"] = "0"
+    os.environ.update(SCENARIO_ENV.get(name, {}))
+    sys.path.insert(0, os.path.dirname(ROOT))
+
+    import app
+
+    discord = FakeDiscord(latency=api_latency)
+    discord.install(app.bot)
+
+    async def main():
+        started = time.perf_counter()
+        result = await SCENARIOS[name](app, discord, scale)
+        elapsed = time.perf_counter() - started
+        await app.adb.arun(app.db.flush)
+        # Deixa as últimas edições agrupadas do contador saírem
+        await asyncio.sleep(app.counter_updates.window * 2)
+        return result, elapsed
+
+    try:
+        result, elapsed = asyncio.run(main())
+    finally:
+        app.adb.close()
+
+    latencies = result.pop("latencies")
+    peak = peak_rss()
+    print("RESULT " + json.dumps({
+        "scenario": name,
+        **result,
+        "seconds": round(elapsed, 3),
+        "throughput": round(result["ops"] / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "peak_rss_mib": round(peak / 2**20, 1) if peak else None,
+        "bytes_written": app.backend.bytes_written,
+        "api_calls": dict(discord.calls),
+    }))
+
+
+def run_scenario(name, scale, api_latency):
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", name,
+         "--scale", str(scale), "--api-latency-ms", str(api_latency * 1000)],
+        capture_output=True, text=True,
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    sys.stderr.write(proc.stdout + proc.stderr)
+    raise RuntimeError(f"Cenário {name} falhou (código {proc.returncode})")
+
+
+def print_table(results):
+    print(f"{'cenário':<22}{'ops':>8}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'RSS MiB':>9}{'gravado':>12}")
+    for r in results:
+        print(
+            f"{r['scenario']:<22}{r['ops']:>8}{r['throughput']:>10.0f}{r['p50_ms']:>10.2f}"
+            f"{r['p99_ms']:>10.2f}{r['peak_rss_mib'] or 0:>9.1f}{r['bytes_written'] / 2**20:>9.1f} MiB"
+        )
+
+
+def compare(results, baseline, tolerance):
+    """Regressão = vazão menor ou p99/RSS/bytes maiores que a base além da tolerância"""
+    failures = []
+    base = {r["scenario"]: r for r in baseline}
+    for r in results:
+        ref = base.get(r["scenario"])
+        if ref is None:
+            continue
+        if r["throughput"] < ref["throughput"] * (1 - tolerance):
+            failures.append(f"{r['scenario']}: vazão {r['throughput']:.0f} < {ref['throughput']:.0f} ops/s")
+        for key in ("p99_ms", "peak_rss_mib", "bytes_written"):
+            if ref.get(key) and r.get(key) and r[key] > ref[key] * (1 + tolerance):
+                failures.append(f"{r['scenario']}: {key} {r[key]} > {ref[key]}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", help=f"cenários a rodar (padrão: todos): {', '.join(SCENARIOS)}")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplica o tamanho das cargas")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="latência simulada de cada chamada à API")
+    parser.add_argument("--save", help="grava os resultados em JSON (linha de base)")
+    parser.add_argument("--compare", help="compara com uma linha de base e falha em regressão")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="folga relativa para --compare")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.scale, args.api_latency_ms / 1000)
+        return
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    results = [run_scenario(name, args.scale, args.api_latency_ms / 1000) for name in args.scenarios or SCENARIOS]
+    print_table(results)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            failures = compare(results, json.load(f), args.tolerance)
+        for failure in failures:
+            print(f"REGRESSÃO {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
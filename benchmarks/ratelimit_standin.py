@@ -0,0 +1,343 @@
+"""Fila de saída contra um Discord de mentira que devolve 429
+
+Sobe um servidor HTTP local que imita o rate limit da API: edições de
+mensagem limitadas por canal (janela fixa), com os cabeçalhos
+X-RateLimit-Limit/Remaining/Reset-After/Bucket e 429 + retry_after quando o
+bucket estoura; respostas a interações sem limite. O servidor atende poucas
+requisições por vez, como o pool de conexões do cliente.
+
+A mesma rajada (edições do contador, respostas aos cliques e, no meio dela,
+os resultados) é enviada de dois jeitos:
+    direct  cada chamada disparada na hora, repetindo após o retry_after
+    queue   pela OutboundQueue do bot (prioridades, buckets, substituição)
+
+Confere que todas as respostas e resultados chegaram, que nenhum resultado
+foi sobrescrito por um contador antigo e compara latência das respostas e
+quantidade de 429. À parte, uma chamada feita pelo atalho (fila vazia, sem
+workers) que leva 429 precisa ser repetida e chegar ao servidor, e um
+contador enfileirado depois de um resultado pendente não pode substituí-lo.
+
+Uso: python benchmarks/ratelimit_standin.py [--edits N] [--acks N] [--latency-ms MS]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbound import ACK, COSMETIC, RESULT, OutboundQueue  # noqa: E402
+
+CHANNELS = 3
+MESSAGES_PER_CHANNEL = 10
+EDIT_LIMIT = 5
+EDIT_WINDOW = 1.0
+POOL = 20
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# --- Servidor (stand-in da API) ---
+class StandIn:
+    def __init__(self, latency):
+        self.latency = latency
+        self.slots = asyncio.Semaphore(POOL)
+        # (bucket, canal) -> [início da janela, usadas]
+        self.windows = {}
+        self.requests = 0
+        self.rate_limited = 0
+        # Último conteúdo de cada mensagem: resultado não pode ser sobrescrito
+        self.bodies = {}
+
+    def _rate_limit(self, channel_id):
+        now = time.monotonic()
+        window = self.windows.get(channel_id)
+        if window is None or now - window[0] >= EDIT_WINDOW:
+            window = self.windows[channel_id] = [now, 0]
+        reset_after = max(0.0, window[0] + EDIT_WINDOW - now)
+        headers = {
+            "X-RateLimit-Bucket": "edit-bucket",
+            "X-RateLimit-Limit": str(EDIT_LIMIT),
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+        }
+        if window[1] >= EDIT_LIMIT:
+            headers["X-RateLimit-Remaining"] = "0"
+            headers["Retry-After"] = f"{reset_after:.3f}"
+            return False, headers, reset_after
+        window[1] += 1
+        headers["X-RateLimit-Remaining"] = str(EDIT_LIMIT - window[1])
+        return True, headers, reset_after
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            method, path, _ = request_line.decode().split(" ", 2)
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode().partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            body = await reader.readexactly(length) if length else b""
+            status, headers, payload = await self.route(method, path, body)
+            head = [f"HTTP/1.1 {status} X", f"Content-Length: {len(payload)}", "Connection: close"]
+            head.extend(f"{k}: {v}" for k, v in headers.items())
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + payload)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        async with self.slots:
+            self.requests += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            parts = path.strip("/").split("/")
+            if parts[0] == "interactions":
+                return 204, {}, b""
+            # PATCH /channels/{canal}/messages/{mensagem}
+            channel_id, message_id = parts[1], parts[3]
+            allowed, headers, reset_after = self._rate_limit(channel_id)
+            if not allowed:
+                self.rate_limited += 1
+                payload = {"message": "You are being rate limited.", "retry_after": reset_after, "global": False}
+                return 429, headers, json.dumps(payload).encode()
+            self.bodies[message_id] = body.decode()
+            return 200, headers, b"{}"
+
+
+# --- Cliente ---
+class StandInResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class StandInError(Exception):
+    """Como discord.HTTPException: `status`, `retry_after` e a resposta com os cabeçalhos"""
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status}")
+        self.status = response.status
+        self.response = response
+        data = json.loads(response.body or b"{}")
+        self.retry_after = data.get("retry_after")
+        self.is_global = data.get("global", False)
+
+
+async def http(port, method, path, body=""):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = body.encode()
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        headers[name.strip()] = value.strip()
+    data = await reader.read()
+    writer.close()
+    response = StandInResponse(status, headers, data)
+    if status >= 400:
+        raise StandInError(response)
+    return response
+
+
+# --- Carga ---
+async def run(mode, edits, acks, latency):
+    server = StandIn(latency)
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    queue = OutboundQueue(concurrency=POOL) if mode == "queue" else None
+    pool = asyncio.Semaphore(POOL)
+
+    async def direct(fn):
+        # Como a biblioteca faz sozinha: espera o retry_after e tenta de novo (até 3 vezes)
+        for attempt in range(4):
+            try:
+                async with pool:
+                    return await fn()
+            except StandInError as e:
+                if e.status != 429 or attempt == 3:
+                    raise
+                await asyncio.sleep(e.retry_after)
+
+    def send(priority, route, fn, key=None):
+        if queue is not None:
+            return queue.submit(priority, route, fn, key)
+        return asyncio.ensure_future(direct(fn))
+
+    messages = [(c, 1000 + c * 100 + m) for c in range(CHANNELS) for m in range(MESSAGES_PER_CHANNEL)]
+    finished = {c: set() for c in range(CHANNELS)}
+    expected = {}
+    ack_latency, result_latency = [], []
+    tasks = []
+
+    async def timed(future, started, samples):
+        await future
+        samples.append(time.perf_counter() - started)
+
+    rng = random.Random(42)
+    started = time.perf_counter()
+    acks_every = max(1, edits // max(1, acks))
+    sent_acks = 0
+    for i in range(edits):
+        channel_id, message_id = rng.choice(messages)
+        if message_id not in finished[channel_id]:
+            body = f"contador {i}"
+            expected[message_id] = body
+            path = f"/channels/{channel_id}/messages/{message_id}"
+            tasks.append(send(COSMETIC, ("edit", channel_id), lambda p=path, b=body: http(port, "PATCH", p, b),
+                              key=("message", message_id)))
+        if i % acks_every == 0 and sent_acks < acks:
+            sent_acks += 1
+            path = f"/interactions/{i}/callback"
+            tasks.append(timed(send(ACK, ("interaction", i), lambda p=path: http(port, "POST", p)),
+                               time.perf_counter(), ack_latency))
+        if i == edits // 2:
+            # Sorteios do canal 0 vencem no meio da rajada
+            for channel_id, message_id in messages:
+                if channel_id != 0:
+                    continue
+                finished[0].add(message_id)
+                expected[message_id] = "resultado"
+                path = f"/channels/0/messages/{message_id}"
+                tasks.append(timed(
+                    send(RESULT, ("edit", 0), lambda p=path: http(port, "PATCH", p, "resultado"),
+                         key=("message", message_id)),
+                    time.perf_counter(), result_latency,
+                ))
+        if i % 50 == 49:
+            await asyncio.sleep(0.005)
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    listener.close()
+    if queue is not None:
+        queue.stop()
+
+    failures = sum(1 for r in results if isinstance(r, Exception))
+    overwritten = [m for c, m in messages if c == 0 and server.bodies.get(str(m)) != "resultado"]
+    stale = [m for m, body in expected.items() if server.bodies.get(str(m)) != body]
+    return {
+        "mode": mode,
+        "seconds": round(elapsed, 2),
+        "requests": server.requests,
+        "rate_limited": server.rate_limited,
+        "failures": failures,
+        "ack_p50_ms": round(percentile(ack_latency, 0.5) * 1000, 1),
+        "ack_p99_ms": round(percentile(ack_latency, 0.99) * 1000, 1),
+        "result_p99_ms": round(percentile(result_latency, 0.99) * 1000, 1),
+        "acks": len(ack_latency),
+        "results": len(result_latency),
+        "merged": queue.merged if queue is not None else 0,
+        "overwritten": len(overwritten),
+        "stale": len(stale),
+    }
+
+
+async def inline_rate_limited(latency):
+    """Primeira chamada da fila sai pelo atalho (sem workers) e leva 429: precisa ser repetida"""
+    server = StandIn(latency)
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    queue = OutboundQueue(concurrency=POOL)
+    path = "/channels/9/messages/9000"
+    # Bucket do canal já esgotado por edições de fora da fila
+    for i in range(EDIT_LIMIT):
+        await http(port, "PATCH", path, f"fora da fila {i}")
+    try:
+        await asyncio.wait_for(
+            queue.call(RESULT, ("edit", 9), lambda: http(port, "PATCH", path, "resultado")),
+            timeout=EDIT_WINDOW * 5,
+        )
+        done = server.bodies.get("9000") == "resultado"
+    except asyncio.TimeoutError:
+        done = False
+    finally:
+        listener.close()
+        queue.stop()
+    return {"done": done, "rate_limited": server.rate_limited}
+
+
+async def cosmetic_after_result(latency):
+    """Contador enfileirado depois de um resultado pendente da mesma mensagem não pode trocá-lo"""
+    server = StandIn(latency)
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    queue = OutboundQueue(concurrency=POOL)
+    path = "/channels/8/messages/8000"
+    for i in range(EDIT_LIMIT):
+        await http(port, "PATCH", path, f"fora da fila {i}")
+    key = ("message", 8000)
+    try:
+        # Bucket esgotado: o resultado ainda está na fila quando o contador chega
+        result = queue.submit(RESULT, ("edit", 8), lambda: http(port, "PATCH", path, "resultado"), key=key)
+        counter = queue.submit(COSMETIC, ("edit", 8), lambda: http(port, "PATCH", path, "contador"), key=key)
+        await asyncio.wait_for(asyncio.gather(result, counter), timeout=EDIT_WINDOW * 5)
+        done = True
+    except asyncio.TimeoutError:
+        done = False
+    finally:
+        listener.close()
+        queue.stop()
+    return {"done": done, "body": server.bodies.get("8000")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--edits", type=int, default=600, help="edições do contador na rajada")
+    parser.add_argument("--acks", type=int, default=300, help="respostas a cliques na rajada")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latência de cada requisição no servidor")
+    args = parser.parse_args()
+
+    rows = [asyncio.run(run(mode, args.edits, args.acks, args.latency_ms / 1000)) for mode in ("direct", "queue")]
+    print(f"{'modo':<8}{'s':>7}{'reqs':>7}{'429':>6}{'falhas':>8}{'ack p50':>9}{'ack p99':>9}"
+          f"{'res p99':>9}{'fundidas':>10}")
+    for r in rows:
+        print(f"{r['mode']:<8}{r['seconds']:>7}{r['requests']:>7}{r['rate_limited']:>6}{r['failures']:>8}"
+              f"{r['ack_p50_ms']:>9}{r['ack_p99_ms']:>9}{r['result_p99_ms']:>9}{r['merged']:>10}")
+
+    queue = rows[1]
+    problems = []
+    if queue["acks"] != args.acks or queue["results"] != MESSAGES_PER_CHANNEL:
+        problems.append("respostas ou resultados perdidos")
+    if queue["failures"]:
+        problems.append(f"{queue['failures']} chamadas falharam")
+    if queue["overwritten"]:
+        problems.append(f"{queue['overwritten']} resultados sobrescritos por contador antigo")
+    if queue["stale"]:
+        problems.append(f"{queue['stale']} mensagens sem a última edição")
+    inline = asyncio.run(inline_rate_limited(args.latency_ms / 1000))
+    if not inline["done"]:
+        problems.append("chamada pelo atalho com 429 nunca foi repetida")
+    elif not inline["rate_limited"]:
+        problems.append("atalho com 429 não exercitado (nenhum 429 devolvido)")
+    superseded = asyncio.run(cosmetic_after_result(args.latency_ms / 1000))
+    if not superseded["done"] or superseded["body"] != "resultado":
+        problems.append(f"resultado pendente trocado por contador (mensagem ficou com {superseded['body']!r})")
+    for problem in problems:
+        print(f"FALHA: {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
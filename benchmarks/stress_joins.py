@@ -0,0 +1,116 @@
+"""Teste de estresse: milhares de cliques em "Participar" ao mesmo tempo
+
+Dispara as entradas pelo roteador real, com interações falsas, enquanto o
+sorteio é encerrado no meio da rajada. Confere que nenhuma entrada aceita foi
+perdida, que nenhuma entrou depois do encerramento e que o p99 ficou abaixo
+do limite.
+
+Uso: python benchmarks/stress_joins.py [cliques] [limite_p99_ms]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Banco temporário, para não tocar no data.db real
+os.chdir(tempfile.mkdtemp(prefix="stress_joins_"))
+os.environ.setdefault("DB_FILE", "stress.db")
+
+import app  # noqa: E402
+from fakes import FakeDiscord, FakeInteraction  # noqa: E402
+
+MESSAGE_ID = "1300000000000000001"
+OTHER_ID = "1300000000000000002"
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def setup_giveaway(msg_id):
+    await app.adb.aupdate(msg_id, {
+        "channel_id": 1,
+        "guild_id": 1,
+        "title": "Estresse",
+        "status": "running",
+        "end_timestamp": int(time.time()) + 3600,
+        "winners_count": 3,
+        "winners": [],
+    })
+
+
+async def click(msg_id, user_id, latencies):
+    interaction = FakeInteraction(app.router.custom_id("join", msg_id), user_id)
+    started = time.perf_counter()
+    await app.handle_component(interaction)
+    latencies.append(time.perf_counter() - started)
+    return interaction.response.sent[0][1]
+
+
+async def main():
+    clicks = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    p99_limit_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    # Sem Discord: a edição do contador só é contada
+    edits = []
+
+    async def fake_refresh(msg_id, data):
+        edits.append(msg_id)
+
+    app.refresh_counter = fake_refresh
+    # Publicação do resultado em canais falsos (sem login não há HTTP)
+    FakeDiscord().install(app.bot)
+    await setup_giveaway(MESSAGE_ID)
+    await setup_giveaway(OTHER_ID)
+
+    latencies = []
+    # Metade antes do encerramento, metade disputando com ele
+    first = [click(MESSAGE_ID, 10_000 + i, latencies) for i in range(clicks // 2)]
+    # Um segundo sorteio recebe cliques em paralelo: não pode ser bloqueado pelo primeiro
+    other = [click(OTHER_ID, 10_000 + i, latencies) for i in range(clicks // 10)]
+    started = time.perf_counter()
+    accepted_first = await asyncio.gather(*first, *other)
+
+    second = [click(MESSAGE_ID, 10_000 + i, latencies) for i in range(clicks // 2, clicks)]
+    # Como o /sortearagora: o prazo vence agora, senão o encerramento ignora o sorteio
+    await app.adb.aupdate(MESSAGE_ID, {"end_timestamp": int(time.time())})
+    results = await asyncio.gather(app.end_giveaway(MESSAGE_ID), *second)
+    elapsed = time.perf_counter() - started
+
+    replies = accepted_first[:clicks // 2] + results[1:]
+    accepted = {10_000 + i for i, reply in enumerate(replies) if reply.startswith("Você entrou")}
+    closed = sum(1 for reply in replies if "encerrado" in reply)
+
+    # Depois do encerramento tudo já está gravado
+    stored = set(app.db.backend.iter_participants(MESSAGE_ID))
+    other_stored = app.db.backend.count_participants(OTHER_ID)
+    final = app.db.get_giveaway(MESSAGE_ID, include_participants=False)
+    late_join = await click(MESSAGE_ID, 1, latencies)
+
+    p50 = percentile(latencies, 0.50) * 1000
+    p99 = percentile(latencies, 0.99) * 1000
+    print(f"{len(latencies)} cliques em {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s)")
+    print(f"Aceitos: {len(accepted)}, recusados por encerramento: {closed}, gravados: {len(stored)}")
+    print(f"Latência p50 {p50:.2f} ms, p99 {p99:.2f} ms (limite {p99_limit_ms:.0f} ms)")
+    print(f"Locks: {app.giveaway_locks.stats()}")
+
+    assert stored == accepted, f"{len(accepted - stored)} entradas perdidas, {len(stored - accepted)} a mais"
+    assert other_stored == clicks // 10, "Entradas perdidas no sorteio paralelo"
+    assert final["status"] == "ended" and len(final["draws"]) == 1, "Encerramento duplicado ou ausente"
+    assert set(final["winners"]) <= stored, "Ganhador fora da lista de participantes"
+    assert "encerrado" in late_join, "Entrada aceita depois do encerramento"
+    assert p99 <= p99_limit_ms, f"p99 {p99:.2f} ms acima do limite"
+    print("OK")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        app.adb.close()
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+
+# Custo fixo estimado de cada entrada (dict, chave, nó do LRU) além do conteúdo
+ENTRY_OVERHEAD = 256
+
+
+def _normalize(data):
+    """Mesmo formato que uma leitura do backend devolveria (JSON ida e volta) e o tamanho"""
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return json.loads(raw), len(raw) + ENTRY_OVERHEAD
+
+
+def copy_giveaway(data):
+    # Quem lê pode alterar listas (ganhadores, sorteios) sem tocar na entrada do cache
+    return {key: list(value) if isinstance(value, list) else value for key, value in data.items()}
+
+
+# --- Cache de Sorteios ---
+class GiveawayCache:
+    """LRU dos dados dos sorteios (sem participantes), limitado em bytes
+
+    Só o Database escreve aqui, e sempre dentro do mesmo lock em que lê ou
+    grava o backend: um preenchimento nunca chega depois de uma gravação
+    mais nova. Updates de sorteios em cache são aplicados na entrada
+    (versão + 1, como no backend); conflitos e exclusões a invalidam.
+    A contagem de participantes fica junto da entrada e sai com ela.
+    """
+
+    def __init__(self, max_bytes=16 * 2**20):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        # message_id -> participantes gravados (só de sorteios com entrada no cache)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, message_id):
+        with self._lock:
+            entry = self._entries.get(str(message_id))
+            if entry is None:
+                # Faltas são contadas por quem vai ao backend (uma por leitura, não por tentativa)
+                return None
+            self._entries.move_to_end(str(message_id))
+            self.hits += 1
+            return copy_giveaway(entry[0])
+
+    def put(self, message_id, data):
+        data = dict(data)
+        data.pop("participants", None)
+        data.pop("weights", None)
+        data, size = _normalize(data)
+        self._store(str(message_id), data, size)
+
+    def apply(self, message_id, changes):
+        """Write-through de um update já gravado: só mexe em sorteios que estão no cache"""
+        str_id = str(message_id)
+        with self._lock:
+            entry = self._entries.get(str_id)
+        if entry is None:
+            return
+        changes = dict(changes)
+        if changes.pop("participants", None):
+            # Participantes acrescentados pelo update: a contagem guardada ficou velha
+            self._counts.pop(str_id, None)
+        changes.pop("weights", None)
+        changes.pop("version", None)
+        data = dict(entry[0])
+        data.update(changes)
+        data["version"] = data.get("version", 0) + 1
+        data, size = _normalize(data)
+        self._store(str_id, data, size)
+
+    def _store(self, str_id, data, size):
+        with self._lock:
+            old = self._entries.pop(str_id, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[str_id] = (data, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                evicted_id, (_, evicted_size) = self._entries.popitem(last=False)
+                self._counts.pop(evicted_id, None)
+                self.bytes -= evicted_size
+                self.evicted += 1
+
+    def invalidate(self, message_id):
+        with self._lock:
+            entry = self._entries.pop(str(message_id), None)
+            self._counts.pop(str(message_id), None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def get_count(self, message_id):
+        return self._counts.get(str(message_id))
+
+    def put_count(self, message_id, count):
+        """Guarda a contagem só se o sorteio está no cache (o limite de memória vale para as duas)"""
+        with self._lock:
+            if str(message_id) in self._entries:
+                self._counts[str(message_id)] = count
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evicted": self.evicted,
+                "entries": len(self._entries), "bytes": self.bytes}
+
+
+# --- Filtro de IDs Conhecidos ---
+class BloomFilter:
+    """Conjunto aproximado de IDs: "não" é sempre certo, "talvez" erra em ~`error_rate`
+
+    Usado para descartar sem E/S eventos de mensagens que não são sorteios.
+    Não permite remoção; IDs apagados só saem quando o filtro é reconstruído.
+    """
+
+    def __init__(self, capacity=100_000, error_rate=0.001):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(str(key).encode(), digest_size=16).digest()
+        # Hash duplo (Kirsch-Mitzenmacher): k posições a partir de dois hashes de 64 bits
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        new = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                self._bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, key):
+        return all(self._bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
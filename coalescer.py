@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+
+# --- Agrupador de Edições de Mensagem ---
+class UpdateCoalescer:
+    """Agrupa atualizações da mesma mensagem em no máximo uma edição por janela
+
+    Cada `submit` substitui a edição pendente anterior da mesma chave, então
+    só o estado mais recente chega ao Discord. Em caso de 429 a janela da
+    chave dobra (até `max_backoff`) e volta ao normal após um sucesso.
+    """
+
+    def __init__(self, window=2.0, max_backoff=60.0):
+        self.window = window
+        self.max_backoff = max_backoff
+        self._pending = {}
+        self._tasks = {}
+        self._next_allowed = {}
+        self._backoff = {}
+        # Por chave: [pedidos, edições]
+        self._key_stats = {}
+
+        # Métricas: pedidos recebidos x edições realmente enviadas
+        self.requests = 0
+        self.edits = 0
+        self.rate_limited = 0
+
+    @property
+    def saved(self):
+        return self.requests - self.edits - len(self._pending)
+
+    def submit(self, key, edit):
+        """Agenda `edit` (coroutine function sem argumentos) para a chave"""
+        self.requests += 1
+        self._key_stats.setdefault(key, [0, 0])[0] += 1
+        self._pending[key] = edit
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._drain(key))
+
+    def cancel(self, key):
+        """Descarta a edição pendente e devolve (pedidos, edições) da chave"""
+        self._pending.pop(key, None)
+        return tuple(self._key_stats.pop(key, (0, 0)))
+
+    async def _drain(self, key):
+        try:
+            while key in self._pending:
+                delay = self._next_allowed.get(key, 0) - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                # cancel() pode ter descartado a edição enquanto esperávamos a janela
+                edit = self._pending.pop(key, None)
+                if edit is None:
+                    break
+                try:
+                    await edit()
+                except Exception as e:
+                    if getattr(e, "status", None) != 429:
+                        print(f"Erro ao atualizar mensagem {key}: {e}")
+                        continue
+                    self.rate_limited += 1
+                    backoff = min(max(self._backoff.get(key, self.window) * 2, self.window), self.max_backoff)
+                    self._backoff[key] = backoff
+                    retry_after = getattr(e, "retry_after", None) or 0
+                    self._next_allowed[key] = time.monotonic() + max(backoff, retry_after)
+                    # Tenta de novo, a menos que uma versão mais nova já esteja na fila
+                    self._pending.setdefault(key, edit)
+                    continue
+
+                self.edits += 1
+                if key in self._key_stats:
+                    self._key_stats[key][1] += 1
+                self._backoff.pop(key, None)
+                self._next_allowed[key] = time.monotonic() + self.window
+        finally:
+            self._tasks.pop(key, None)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "edits": self.edits,
+            "saved": self.saved,
+            "rate_limited": self.rate_limited,
+        }
@@ -0,0 +1,132 @@
+import functools
+import re
+import time
+
+# Início da contagem dos snowflakes do Discord (2015-01-01), em ms
+DISCORD_EPOCH_MS = 1420070400000
+
+_SNOWFLAKE = re.compile(r"\d{15,20}")
+
+# Limite de cargos em cada lista (o modal aceita texto livre)
+MAX_ROLES = 25
+
+# Entradas bônus: "<cargo> <extra>" por linha; o peso total de um membro é limitado
+_BONUS_LINE = re.compile(r"(\d{15,20})\D+(\d{1,3})")
+MAX_WEIGHT = 100
+
+
+def snowflake_time(snowflake):
+    """Instante (Unix, segundos) embutido no ID: a criação da conta, no caso de um usuário"""
+    return ((int(snowflake) >> 22) + DISCORD_EPOCH_MS) / 1000
+
+
+def parse_role_ids(text):
+    """IDs de cargos em texto livre: menções (<@&id>), IDs soltos, separados por vírgula ou espaço"""
+    ids = []
+    for match in _SNOWFLAKE.findall(text or ""):
+        role_id = int(match)
+        if role_id not in ids:
+            ids.append(role_id)
+    return ids[:MAX_ROLES]
+
+
+def parse_bonus_roles(text):
+    """Linhas "<@&cargo> 2" viram {cargo (str): entradas extras}; extras 0 são ignorados"""
+    bonus = {}
+    for line in (text or "").splitlines():
+        match = _BONUS_LINE.search(line)
+        if match and int(match.group(2)) > 0 and len(bonus) < MAX_ROLES:
+            bonus[match.group(1)] = min(int(match.group(2)), MAX_WEIGHT - 1)
+    return bonus
+
+
+def entry_weight(bonus_roles, member):
+    """Entradas de um membro: 1 + os extras de cada cargo bônus que ele tem"""
+    if not bonus_roles:
+        return 1
+    role_ids = {str(role.id) for role in getattr(member, "roles", ())}
+    extra = sum(n for role_id, n in bonus_roles.items() if role_id in role_ids)
+    return min(1 + extra, MAX_WEIGHT)
+
+
+# --- Requisitos de Entrada ---
+class EligibilityRules:
+    """Requisitos de um sorteio: cargos exigidos/excluídos, idade da conta e tempo no servidor
+
+    Tudo é avaliado com o membro que vem no próprio payload da interação
+    (cargos e data de entrada), então um clique nunca faz fetch_member.
+    Basta ter um dos cargos exigidos; qualquer cargo excluído barra.
+    """
+
+    __slots__ = ("required_roles", "excluded_roles", "min_account_days", "min_member_days")
+
+    def __init__(self, required_roles=(), excluded_roles=(), min_account_days=0, min_member_days=0):
+        self.required_roles = frozenset(required_roles)
+        self.excluded_roles = frozenset(excluded_roles)
+        self.min_account_days = min_account_days
+        self.min_member_days = min_member_days
+
+    def __bool__(self):
+        return bool(self.required_roles or self.excluded_roles or self.min_account_days or self.min_member_days)
+
+    @classmethod
+    def from_data(cls, data):
+        rules = data.get("eligibility") or {}
+        return _compile(
+            tuple(rules.get("required_roles", ())),
+            tuple(rules.get("excluded_roles", ())),
+            rules.get("min_account_days", 0),
+            rules.get("min_member_days", 0),
+        )
+
+    def to_data(self):
+        return {
+            "required_roles": sorted(self.required_roles),
+            "excluded_roles": sorted(self.excluded_roles),
+            "min_account_days": self.min_account_days,
+            "min_member_days": self.min_member_days,
+        }
+
+    def check(self, member, now=None):
+        """None se o membro pode entrar; senão o motivo, pronto para a resposta efêmera"""
+        if not self:
+            return None
+        now = now or time.time()
+
+        if self.min_account_days:
+            age_days = (now - snowflake_time(member.id)) / 86400
+            if age_days < self.min_account_days:
+                return f"Sua conta precisa ter pelo menos {self.min_account_days} dias para participar."
+
+        if self.required_roles or self.excluded_roles:
+            # Member.roles só existe em interações dentro de servidores
+            role_ids = {role.id for role in getattr(member, "roles", ())}
+            if role_ids & self.excluded_roles:
+                return "Um dos seus cargos não pode participar deste sorteio."
+            if self.required_roles and not role_ids & self.required_roles:
+                return "Você não tem nenhum dos cargos exigidos para participar deste sorteio."
+
+        if self.min_member_days:
+            joined_at = getattr(member, "joined_at", None)
+            if joined_at is None or (now - joined_at.timestamp()) / 86400 < self.min_member_days:
+                return f"Você precisa estar no servidor há pelo menos {self.min_member_days} dias para participar."
+        return None
+
+    def describe(self):
+        """Linhas para o painel do sorteio"""
+        lines = []
+        if self.required_roles:
+            lines.append("Ter um destes cargos: " + " ".join(f"<@&{r}>" for r in sorted(self.required_roles)))
+        if self.excluded_roles:
+            lines.append("Não ter os cargos: " + " ".join(f"<@&{r}>" for r in sorted(self.excluded_roles)))
+        if self.min_account_days:
+            lines.append(f"Conta com pelo menos {self.min_account_days} dias")
+        if self.min_member_days:
+            lines.append(f"No servidor há pelo menos {self.min_member_days} dias")
+        return lines
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile(required_roles, excluded_roles, min_account_days, min_member_days):
+    # Sorteios com os mesmos requisitos compartilham a mesma instância (imutável na prática)
+    return EligibilityRules(required_roles, excluded_roles, min_account_days, min_member_days)
@@ -0,0 +1,69 @@
+import csv
+import gzip
+import io
+import itertools
+import json
+
+# Formatos aceitos pelo comando /exportar
+FORMATS = ("csv", "jsonl")
+
+# Colunas do CSV; cada registro preenche só as que fazem sentido para ele
+CSV_FIELDS = ("record", "index", "user_id", "weight", "kind", "seed", "population", "at", "replaced")
+
+# Linhas acumuladas antes de cada escrita no gzip
+CHUNK_ROWS = 5000
+
+
+def export_records(db, message_id, data):
+    """Registros do sorteio em fluxo: ganhadores, histórico de sorteios e participantes
+
+    `data` são os dados do sorteio sem participantes (leitura barata, pelo
+    cache); os participantes vêm em blocos do backend, na ordem de entrada,
+    sem nunca montar a lista inteira.
+    """
+    for slot, user_id in enumerate(data.get("winners", [])):
+        yield {"record": "winner", "index": slot, "user_id": user_id}
+
+    # Um registro por ganhador de cada sorteio (final e rerolls), com a semente para auditoria
+    for number, draw in enumerate(data.get("draws", [])):
+        for user_id in draw.get("winners", []):
+            yield {
+                "record": "draw", "index": number, "user_id": user_id, "kind": draw.get("kind"),
+                "seed": draw.get("seed"), "population": draw.get("population"), "at": draw.get("at"),
+                "replaced": draw.get("replaced"),
+            }
+
+    for position, (user_id, weight) in enumerate(db.participant_entries(message_id)):
+        yield {"record": "participant", "index": position, "user_id": user_id, "weight": weight}
+
+
+def write_export(records, fileobj, fmt="csv", chunk_rows=CHUNK_ROWS):
+    """Grava os registros comprimidos (gzip) em `fileobj`; devolve quantos foram gravados
+
+    As linhas são formatadas em blocos de `chunk_rows` e cada bloco vai de
+    uma vez para o compressor: a memória fica em um bloco, não no arquivo.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de exportação desconhecido: {fmt}")
+
+    count = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    encode = json.JSONEncoder(separators=(",", ":")).encode
+    with gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=6) as out:
+        if fmt == "csv":
+            writer.writerow(CSV_FIELDS)
+        records = iter(records)
+        while True:
+            chunk = list(itertools.islice(records, chunk_rows))
+            if not chunk:
+                break
+            if fmt == "csv":
+                writer.writerows([record.get(field) for field in CSV_FIELDS] for record in chunk)
+            else:
+                buffer.write("\n".join(map(encode, chunk)) + "\n")
+            out.write(buffer.getvalue().encode("utf-8"))
+            buffer.seek(0)
+            buffer.truncate()
+            count += len(chunk)
+    return count
@@ -0,0 +1,81 @@
+import asyncio
+import random
+
+
+# --- Envio em Paralelo com Limites ---
+class FanOut:
+    """Executa chamadas à API em paralelo, com teto global e por canal
+
+    Cada tarefa é `(canal, chave, fn)`, onde `fn()` devolve a coroutine da
+    chamada. O Discord limita edições por canal, então cada canal tem no
+    máximo `per_channel` chamadas em voo; o teto global (`concurrency`) vale
+    para todos os `run` ao mesmo tempo. Falhas temporárias (429, 5xx, rede)
+    são repetidas com backoff exponencial; um 429 espera o `retry_after`
+    segurando a vaga do canal, para as próximas edições dele não baterem no
+    mesmo limite.
+    """
+
+    # Erros definitivos: repetir não adianta
+    PERMANENT = (400, 401, 403, 404)
+
+    def __init__(self, concurrency=10, per_channel=1, retries=4, base_delay=1.0, max_delay=30.0):
+        self.per_channel = max(1, per_channel)
+        self.retries = max(0, retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        # canal -> [semáforo, tarefas usando]; removido quando o canal fica ocioso
+        self._channels = {}
+
+        # Métricas
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _retry_delay(self, error, attempt):
+        status = getattr(error, "status", None)
+        if status is None and not isinstance(error, (OSError, asyncio.TimeoutError)):
+            return None
+        if status in self.PERMANENT:
+            return None
+        retry_after = getattr(error, "retry_after", None)
+        if status == 429 and retry_after:
+            return retry_after
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def _run_one(self, channel_id, fn):
+        entry = self._channels.get(channel_id)
+        if entry is None:
+            entry = self._channels[channel_id] = [asyncio.Semaphore(self.per_channel), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                for attempt in range(self.retries + 1):
+                    async with self._slots:
+                        try:
+                            await fn()
+                        except Exception as e:
+                            error = e
+                        else:
+                            self.sent += 1
+                            return None
+                    delay = self._retry_delay(error, attempt)
+                    if delay is None or attempt == self.retries:
+                        break
+                    self.retried += 1
+                    await asyncio.sleep(delay)
+            self.failed += 1
+            return error
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._channels[channel_id]
+
+    async def run(self, jobs):
+        """Executa todas as tarefas; devolve {chave: None ou a última exceção}"""
+        jobs = list(jobs)
+        results = await asyncio.gather(*(self._run_one(channel_id, fn) for channel_id, _, fn in jobs))
+        return {key: result for (_, key, _), result in zip(jobs, results)}
+
+    def stats(self):
+        return {"sent": self.sent, "retried": self.retried, "failed": self.failed}
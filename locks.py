@@ -0,0 +1,58 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+# --- Locks por Sorteio ---
+class LockManager:
+    """Locks assíncronos listrados: cada sorteio cai sempre na mesma faixa
+
+    Mutações do mesmo sorteio (entrada, início, edição, reroll, encerramento)
+    são serializadas; sorteios em faixas diferentes seguem em paralelo. O
+    número de locks é fixo, não cresce com a quantidade de sorteios. Os locks
+    não são reentrantes: para segurar vários, use só `hold_many`, que os
+    pega sempre na mesma ordem.
+    """
+
+    def __init__(self, stripes=256):
+        self.stripes = max(1, stripes)
+        self._locks = [asyncio.Lock() for _ in range(self.stripes)]
+        # Métricas: aquisições totais x aquisições que precisaram esperar
+        self.acquired = 0
+        self.contended = 0
+
+    def _index(self, message_id):
+        # Snowflake: mistura o timestamp com os bits baixos para espalhar as faixas
+        value = int(message_id)
+        return ((value >> 22) ^ value) % self.stripes
+
+    def lock_for(self, message_id):
+        return self._locks[self._index(message_id)]
+
+    @asynccontextmanager
+    async def hold(self, message_id):
+        lock = self.lock_for(message_id)
+        self.acquired += 1
+        if lock.locked():
+            self.contended += 1
+        async with lock:
+            yield
+
+    @asynccontextmanager
+    async def hold_many(self, message_ids):
+        """Segura os locks de vários sorteios (em ordem crescente de faixa, sem deadlock)"""
+        locks = [self._locks[i] for i in sorted({self._index(m) for m in message_ids})]
+        held = []
+        try:
+            for lock in locks:
+                self.acquired += 1
+                if lock.locked():
+                    self.contended += 1
+                await lock.acquire()
+                held.append(lock)
+            yield
+        finally:
+            for lock in reversed(held):
+                lock.release()
+
+    def stats(self):
+        return {"stripes": self.stripes, "acquired": self.acquired, "contended": self.contended}
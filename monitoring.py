@@ -0,0 +1,345 @@
+import asyncio
+import collections
+import os
+import sys
+import threading
+import time
+
+# --- Monitor de Atraso do Event Loop ---
+class LoopLagMonitor:
+    """Mede quanto o loop demora para acordar além do esperado"""
+
+    def __init__(self, interval=0.1, threshold_ms=250):
+        self.interval = interval
+        self.threshold = threshold_ms / 1000
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.breaches = 0
+        self.samples = 0
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.running:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+
+            self.samples += 1
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.breaches += 1
+                print(f"Event loop bloqueado por {lag * 1000:.0f} ms (limite {self.threshold * 1000:.0f} ms).")
+
+    def snapshot(self):
+        return {
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "breaches": self.breaches,
+            "samples": self.samples,
+        }
+
+
+# --- Histograma de Latência ---
+# Limites superiores dos buckets, em segundos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Histograma cumulativo de buckets fixos (estilo Prometheus)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q):
+        """Estimativa pelo limite superior do bucket que contém o quantil"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, bound in enumerate(self.buckets):
+            seen += self.counts[i]
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+        }
+
+
+# --- Registro de Métricas ---
+class _Family:
+    def __init__(self, name, kind, help_text, labelnames, factory, children=None):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labelnames = labelnames
+        self.factory = factory
+        # Tupla de valores dos rótulos -> Counter/Histogram
+        self.children = children if children is not None else {}
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self.factory()
+        return child
+
+
+class CounterValue:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class MetricsRegistry:
+    """Contadores, histogramas e gauges exportados no formato texto do Prometheus
+
+    Tudo roda no event loop (ou sob o GIL em incrementos simples), então não
+    há locks: um valor lido no meio de uma atualização só fica um passo atrás.
+    """
+
+    def __init__(self, prefix="sorteio"):
+        self.prefix = prefix
+        self._families = {}
+        # Valores lidos na hora da coleta: nome -> (tipo, ajuda, função)
+        self._collected = {}
+
+    def _family(self, name, kind, help_text, labelnames, factory, children=None):
+        family = self._families.get(name)
+        if family is None:
+            family = _Family(f"{self.prefix}_{name}", kind, help_text, tuple(labelnames), factory, children)
+            self._families[name] = family
+        return family
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._family(name, "counter", help_text, labelnames, CounterValue)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._family(name, "histogram", help_text, labelnames, lambda: Histogram(buckets))
+
+    def attach_histograms(self, name, help_text, label, children):
+        """Exporta um dict {valor: Histogram} já mantido por outro componente"""
+        return self._family(name, "histogram", help_text, (label,), Histogram, _KeyView(children))
+
+    def collect(self, name, help_text, fn, kind="gauge"):
+        """`fn()` devolve um número ou um dict {valor do rótulo: número} (rótulo "key")
+
+        Para valores já mantidos por outros componentes (contadores próprios,
+        tamanhos de fila); `kind="counter"` quando o valor só cresce.
+        """
+        self._collected[name] = (kind, help_text, fn)
+
+    def render(self):
+        lines = []
+        for family in self._families.values():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, child in list(family.children.items()):
+                labels = dict(zip(family.labelnames, values))
+                if family.kind == "counter":
+                    lines.append(f"{family.name}{_labels(labels)} {child.value}")
+                else:
+                    lines.extend(_histogram_lines(family.name, labels, child))
+        for name, (kind, help_text, fn) in self._collected.items():
+            full_name = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            value = fn()
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    lines.append(f"{full_name}{_labels({'key': key})} {item}")
+            else:
+                lines.append(f"{full_name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class _KeyView:
+    """Adapta {valor: filho} para o formato {(valor,): filho} das famílias"""
+
+    def __init__(self, mapping):
+        self.mapping = mapping
+
+    def get(self, key):
+        return self.mapping.get(key[0])
+
+    def __setitem__(self, key, value):
+        self.mapping[key[0]] = value
+
+    def items(self):
+        return [((key,), value) for key, value in self.mapping.items()]
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': repr(float(bound))})} {cumulative}")
+    lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return lines
+
+
+# --- Profiler por Amostragem ---
+class SamplingProfiler:
+    """Amostra a pilha de uma thread em intervalos fixos (formato "collapsed")
+
+    Roda em uma thread própria e só lê `sys._current_frames()`, então o custo
+    no event loop é o de algumas trocas de GIL por amostra. A saída alimenta
+    direto ferramentas de flame graph.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._target = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, thread_id=None):
+        if self.running:
+            return False
+        self._target = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if self.running:
+            self._stop.set()
+            self._thread.join()
+        return self.collapsed()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# --- Servidor HTTP de Métricas ---
+class MetricsServer:
+    """HTTP mínimo (só GET) para o Prometheus e para ligar/desligar o profiler
+
+    GET /metrics          -> métricas em texto
+    GET /profile/start    -> começa a amostrar o event loop (se o profiler estiver habilitado)
+    GET /profile/stop     -> para e devolve as pilhas no formato collapsed
+    """
+
+    def __init__(self, registry, host="127.0.0.1", port=9100, profiler=None):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.profiler = profiler
+        self._server = None
+
+    @property
+    def running(self):
+        return self._server is not None
+
+    async def start(self):
+        if self._server is None:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            print(f"Métricas em http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Cabeçalhos são ignorados, mas precisam ser consumidos
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.decode("latin-1").split()
+            path = parts[1] if len(parts) >= 2 else "/"
+            status, body = self._route(parts[0] if parts else "", path)
+            payload = body.encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _route(self, method, path):
+        if method != "GET":
+            return "405 Method Not Allowed", "Só GET.\n"
+        if path == "/metrics":
+            return "200 OK", self.registry.render()
+        if path.startswith("/profile/"):
+            if self.profiler is None:
+                return "404 Not Found", "Profiler desabilitado (PROFILER_ENABLED=1).\n"
+            if path == "/profile/start":
+                started = self.profiler.start()
+                return "200 OK", "Profiler iniciado.\n" if started else "Profiler já estava rodando.\n"
+            if path == "/profile/stop":
+                return "200 OK", self.profiler.stop()
+        return "404 Not Found", "Não encontrado.\n"
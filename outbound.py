@@ -0,0 +1,336 @@
+import asyncio
+import collections
+import heapq
+import itertools
+import time
+
+from monitoring import Histogram
+
+# --- Prioridades ---
+# Respostas a interações têm prazo de 3 s no Discord; resultados vêm antes de enfeites
+ACK = 0
+RESULT = 1
+COSMETIC = 2
+
+PRIORITY_NAMES = {ACK: "ack", RESULT: "result", COSMETIC: "cosmetic"}
+
+# Espera enquanto a primeira chamada de uma rota descobre o bucket dela
+DISCOVERY_WAIT = 0.05
+
+
+# --- Buckets de Rate Limit ---
+class TokenBucket:
+    """Espelho local de um bucket do Discord (X-RateLimit-Limit/Remaining/Reset-After)"""
+
+    def __init__(self, limit=1, remaining=1, reset_at=0.0):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_at = reset_at
+        # Duração da janela, aprendida do Reset-After com o bucket cheio
+        self.window = 1.0
+        # Sem cabeçalhos ainda: uma chamada por vez até aprender o limite
+        self.learned = False
+        self.inflight = 0
+
+    def wait_time(self, now):
+        if not self.learned:
+            return 0.0 if self.inflight == 0 else DISCOVERY_WAIT
+        if now >= self.reset_at:
+            return 0.0
+        return 0.0 if self.remaining > 0 else self.reset_at - now
+
+    def take(self, now):
+        if self.learned and now >= self.reset_at:
+            # Janela nova começa agora; os cabeçalhos da resposta corrigem a estimativa
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+        self.remaining -= 1
+        self.inflight += 1
+
+    def update(self, limit, remaining, reset_after, now):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_at = now + reset_after
+        if remaining == limit - 1:
+            self.window = reset_after
+        self.learned = True
+
+
+class RateLimits:
+    """Rotas -> buckets, como o Discord informa nos cabeçalhos
+
+    Uma rota é `(nome, parâmetro principal)`, ex.: `("edit", channel_id)`.
+    Rotas diferentes que o Discord diz compartilhar o mesmo X-RateLimit-Bucket
+    passam a consumir o mesmo balde (por parâmetro principal).
+    """
+
+    def __init__(self, max_buckets=10000):
+        self.max_buckets = max_buckets
+        self._route_hash = {}
+        self._buckets = {}
+        # Limite global (429 com "global": true): ninguém sai até este instante
+        self.global_reset_at = 0.0
+
+    def _key(self, route):
+        name, major = route
+        return (self._route_hash.get(name, name), major)
+
+    def bucket(self, route):
+        key = self._key(route)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._prune(time.monotonic())
+            bucket = self._buckets[key] = TokenBucket()
+        return bucket
+
+    def _prune(self, now):
+        # Buckets já renovados e sem chamadas em voo voltam ao estado "desconhecido" sem custo
+        for key in [k for k, b in self._buckets.items() if b.inflight == 0 and now >= b.reset_at]:
+            del self._buckets[key]
+
+    def wait_time(self, route, now):
+        return max(self.global_reset_at - now, self.bucket(route).wait_time(now), 0.0)
+
+    def take(self, route, now):
+        self.bucket(route).take(now)
+
+    def release(self, route, headers, now):
+        """Fim de uma chamada: devolve a vaga em voo e aprende com os cabeçalhos"""
+        bucket = self.bucket(route)
+        bucket.inflight = max(0, bucket.inflight - 1)
+        if not headers:
+            return
+        bucket_hash = headers.get("X-RateLimit-Bucket")
+        name, major = route
+        if bucket_hash and self._route_hash.get(name) != bucket_hash:
+            self._route_hash[name] = bucket_hash
+            self._buckets[self._key(route)] = bucket
+        try:
+            bucket.update(
+                int(headers["X-RateLimit-Limit"]),
+                int(headers["X-RateLimit-Remaining"]),
+                float(headers["X-RateLimit-Reset-After"]),
+                now,
+            )
+        except (KeyError, ValueError):
+            pass
+
+    def block(self, route, retry_after, is_global, now):
+        if is_global:
+            self.global_reset_at = max(self.global_reset_at, now + retry_after)
+            return
+        bucket = self.bucket(route)
+        bucket.remaining = 0
+        bucket.reset_at = max(bucket.reset_at, now + retry_after)
+        bucket.learned = True
+
+
+def _headers(obj):
+    """Cabeçalhos da resposta, se a chamada os expõe (direto ou via `.response`)"""
+    headers = getattr(obj, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(obj, "response", None), "headers", None)
+    return headers
+
+
+class _Request:
+    __slots__ = ("priority", "route", "fn", "key", "future", "enqueued_at", "attempts", "superseded")
+
+    def __init__(self, priority, route, fn, key, future):
+        self.priority = priority
+        self.route = route
+        self.fn = fn
+        self.key = key
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+        self.superseded = False
+
+
+# --- Fila de Saída ---
+class OutboundQueue:
+    """Todas as chamadas à API passam por aqui, em ordem de prioridade
+
+    Entre as chamadas prontas sai sempre a de maior prioridade (ACK, depois
+    RESULT, depois COSMETIC). Uma rota sem token disponível fica de lado até o
+    reset do bucket, sem segurar as outras rotas. Uma chamada com `key` substitui
+    a pendente de mesma chave (a edição antiga nunca chega ao Discord) e herda a
+    maior prioridade das duas; quem aguardava a antiga recebe o resultado da
+    nova. Uma chamada de prioridade menor nunca substitui a pendente (um
+    contador não troca o resultado): só aguarda o resultado dela. Um 429
+    bloqueia o bucket pelo `retry_after` e devolve a chamada à fila.
+    """
+
+    def __init__(self, concurrency=50, max_retries=3):
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.limits = RateLimits()
+        self._ready = []
+        self._deferred = []
+        self._pending_keys = {}
+        self._seq = itertools.count()
+        # Um future por worker ocioso: cada chamada nova acorda um só, não todos
+        self._idle = collections.deque()
+        self._workers = []
+        # Chamadas em execução (workers e atalhos); nunca passa de `concurrency`
+        self._running = 0
+
+        # Métricas
+        self.sent = 0
+        self.merged = 0
+        self.rate_limited = 0
+        self.wait = {name: Histogram() for name in PRIORITY_NAMES.values()}
+
+    def __len__(self):
+        return len(self._ready) + len(self._deferred)
+
+    def depth(self):
+        counts = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        for _, _, request in itertools.chain(self._ready, self._deferred):
+            if not request.superseded:
+                counts[PRIORITY_NAMES[request.priority]] += 1
+        return counts
+
+    @property
+    def running(self):
+        return any(not worker.done() for worker in self._workers)
+
+    def start(self):
+        if not self.running:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    def submit(self, priority, route, fn, key=None):
+        """Enfileira `fn()` (devolve a coroutine da chamada); devolve um future com o resultado"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        if key is not None:
+            previous = self._pending_keys.get(key)
+            if previous is not None and previous.priority < priority:
+                # A pendente é mais importante e fica com a própria chamada
+                previous.future.add_done_callback(lambda done: _copy_result(done, future))
+                self.merged += 1
+                return future
+            if previous is not None:
+                # Versão mais nova da mesma edição: a antiga sai da fila sem ser enviada
+                previous.superseded = True
+                priority = min(priority, previous.priority)
+                future.add_done_callback(lambda done, old=previous.future: _copy_result(done, old))
+                self.merged += 1
+        request = _Request(priority, route, fn, key, future)
+        if key is not None:
+            self._pending_keys[key] = request
+        self._push(request)
+        return future
+
+    async def call(self, priority, route, fn, key=None):
+        now = time.monotonic()
+        if (not self._ready and self._running < self.concurrency
+                and (key is None or key not in self._pending_keys) and self.limits.wait_time(route, now) <= 0):
+            # Nada na frente e vaga livre: executa na própria task, sem passar por um worker
+            request = _Request(priority, route, fn, key, asyncio.get_running_loop().create_future())
+            await self._execute(request)
+            return await request.future
+        return await self.submit(priority, route, fn, key)
+
+    def _push(self, request):
+        heapq.heappush(self._ready, (request.priority, next(self._seq), request))
+        self._wake_one()
+
+    def _wake_one(self):
+        while self._idle:
+            waiter = self._idle.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def _next(self, now):
+        # Adiados cujo bucket já renovou voltam a disputar por prioridade
+        while self._deferred and self._deferred[0][0] <= now:
+            _, _, request = heapq.heappop(self._deferred)
+            heapq.heappush(self._ready, (request.priority, next(self._seq), request))
+
+        while self._ready:
+            _, _, request = heapq.heappop(self._ready)
+            if request.superseded:
+                continue
+            wait = self.limits.wait_time(request.route, now)
+            if wait > 0:
+                heapq.heappush(self._deferred, (now + wait, next(self._seq), request))
+                # Um ocioso recalcula o prazo de espera com o novo adiado
+                self._wake_one()
+                continue
+            if request.key is not None and self._pending_keys.get(request.key) is request:
+                del self._pending_keys[request.key]
+            return request
+        return None
+
+    async def _worker(self):
+        while True:
+            now = time.monotonic()
+            request = self._next(now) if self._running < self.concurrency else None
+            if request is None:
+                waiter = asyncio.get_running_loop().create_future()
+                self._idle.append(waiter)
+                timeout = self._deferred[0][0] - now if self._deferred else None
+                try:
+                    await asyncio.wait_for(waiter, timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(request)
+
+    async def _execute(self, request):
+        if request.attempts == 0:
+            self.wait[PRIORITY_NAMES[request.priority]].observe(time.monotonic() - request.enqueued_at)
+        self.limits.take(request.route, time.monotonic())
+        self._running += 1
+        try:
+            result = await request.fn()
+        except Exception as e:
+            self.limits.release(request.route, _headers(e), time.monotonic())
+            if getattr(e, "status", None) == 429 and request.attempts < self.max_retries:
+                self.rate_limited += 1
+                request.attempts += 1
+                retry_after = getattr(e, "retry_after", None) or 1.0
+                self.limits.block(request.route, retry_after, getattr(e, "is_global", False), time.monotonic())
+                # Chamada feita pelo atalho pode ter chegado aqui sem nenhum worker rodando
+                self.start()
+                self._push(request)
+                return
+            if not request.future.done():
+                request.future.set_exception(e)
+        except BaseException as e:
+            self.limits.release(request.route, None, time.monotonic())
+            if not request.future.done():
+                request.future.set_exception(e)
+            raise
+        else:
+            self.limits.release(request.route, _headers(result), time.monotonic())
+            self.sent += 1
+            if not request.future.done():
+                request.future.set_result(result)
+        finally:
+            self._running -= 1
+            if self._ready or self._deferred:
+                # Vaga liberada: um ocioso pega o próximo da fila
+                self._wake_one()
+
+    def stats(self):
+        return {"sent": self.sent, "merged": self.merged, "rate_limited": self.rate_limited, "queued": len(self)}
+
+
+def _copy_result(done, target):
+    if target.done():
+        return
+    if done.cancelled():
+        target.cancel()
+    elif done.exception() is not None:
+        target.set_exception(done.exception())
+    else:
+        target.set_result(done.result())
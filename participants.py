@@ -0,0 +1,109 @@
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+
+# Entradas novas ficam num set pequeno até serem fundidas no array ordenado
+MERGE_THRESHOLD = 4096
+
+
+# --- Conjunto Compacto de Participantes ---
+class ParticipantSet:
+    """IDs (snowflakes) num array('Q') ordenado: 8 bytes por participante
+
+    Pertinência por busca binária; serializa direto para bytes
+    (little-endian) em vez de uma lista JSON. Entradas (event loop) e
+    leituras/persistência (threads do banco) chegam ao mesmo conjunto: `add` e
+    a fusão rodam sob um lock, e o array fundido nunca é alterado no lugar.
+    """
+
+    __slots__ = ("_base", "_pending", "_lock")
+
+    def __init__(self, ids=()):
+        # Aceita listas legadas com IDs misturados entre int e str
+        self._base = array("Q", sorted({int(user_id) for user_id in ids}))
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_bytes(cls, raw):
+        participants = cls()
+        participants._base.frombytes(raw)
+        if sys.byteorder == "big":
+            participants._base.byteswap()
+        return participants
+
+    def to_bytes(self):
+        self._merge()
+        if sys.byteorder == "big":
+            swapped = array("Q", self._base)
+            swapped.byteswap()
+            return swapped.tobytes()
+        return self._base.tobytes()
+
+    @property
+    def nbytes(self):
+        return self._base.buffer_info()[1] * self._base.itemsize
+
+    def _merge(self):
+        if not self._pending:
+            return
+        with self._lock:
+            self._merge_locked()
+
+    def _merge_locked(self):
+        if not self._pending:
+            return
+        # Fatias do array são cópias em C; o laço Python é só sobre as entradas novas
+        base = self._base
+        merged = array("Q")
+        start = 0
+        for user_id in sorted(self._pending):
+            index = bisect_left(base, user_id, start)
+            merged.extend(base[start:index])
+            merged.append(user_id)
+            start = index
+        merged.extend(base[start:])
+        self._base = merged
+        self._pending = set()
+
+    def snapshot(self):
+        """Cópia do array ordenado com todos os IDs (8 bytes por participante)"""
+        self._merge()
+        return self._base[:]
+
+    def _in_base(self, user_id):
+        index = bisect_left(self._base, user_id)
+        return index < len(self._base) and self._base[index] == user_id
+
+    def __contains__(self, user_id):
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return False
+        return user_id in self._pending or self._in_base(user_id)
+
+    def add(self, user_id):
+        """Adiciona e devolve True se o ID ainda não estava no conjunto"""
+        user_id = int(user_id)
+        with self._lock:
+            if user_id in self._pending or self._in_base(user_id):
+                return False
+            self._pending.add(user_id)
+            if len(self._pending) >= MERGE_THRESHOLD:
+                self._merge_locked()
+        return True
+
+    def __len__(self):
+        return len(self._base) + len(self._pending)
+
+    def __getitem__(self, index):
+        self._merge()
+        return self._base[index]
+
+    def __iter__(self):
+        self._merge()
+        return iter(self._base)
+
+    def __repr__(self):
+        return f"<ParticipantSet {len(self)} participantes>"
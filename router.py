@@ -0,0 +1,120 @@
+import re
+import time
+from collections import defaultdict
+
+from monitoring import Histogram
+
+# --- Formato dos custom_id ---
+# Atual (v1): "g1:<código>:<message_id>[:<argumento>]", ex.: "g1:j:1234" ou "g1:x:1234:0"
+# Legado: "join_1234", "edit_title_1234", "reroll_1234_0" (mensagens antigas continuam funcionando)
+CUSTOM_ID_VERSION = "g1"
+
+_V1_PATTERN = re.compile(r"g1:([a-z]):(\d{1,20})(?::(\d{1,3}))?")
+_LEGACY_PATTERN = re.compile(r"([a-z_]{4,12}?)_(\d{1,20})(?:_(\d{1,3}))?")
+
+
+class Route:
+    def __init__(self, action, code, handler, admin, has_arg):
+        self.action = action
+        self.code = code
+        self.handler = handler
+        self.admin = admin
+        self.has_arg = has_arg
+
+
+class RouteContext:
+    """Dados de uma interação roteada; a view só é montada se o handler pedir"""
+
+    def __init__(self, router, interaction, route, message_id, arg, data):
+        self.router = router
+        self.interaction = interaction
+        self.route = route
+        self.message_id = message_id
+        self.arg = arg
+        self.data = data
+        self._view = None
+
+    @property
+    def view(self):
+        if self._view is None:
+            self._view = self.router.view_factory(self.message_id, self.data)
+        return self._view
+
+
+# --- Roteador de Interações ---
+class InteractionRouter:
+    """Tabela custom_id -> handler, com checagem de permissão antes do banco
+
+    `loader(interaction, route, message_id)` carrega os dados (None encerra
+    sem resposta),
+    `view_factory(message_id, data)` monta a view sob demanda e
+    `deny(interaction)` responde quando falta permissão de administrador.
+    """
+
+    def __init__(self, loader, view_factory, is_admin, deny):
+        self.loader = loader
+        self.view_factory = view_factory
+        self.is_admin = is_admin
+        self.deny = deny
+        self._by_code = {}
+        self._by_action = {}
+        self.latency = defaultdict(Histogram)
+        self.rejected = 0
+
+    def route(self, action, code, admin=False, has_arg=False):
+        def decorator(handler):
+            route = Route(action, code, handler, admin, has_arg)
+            self._by_code[code] = route
+            self._by_action[action] = route
+            return handler
+        return decorator
+
+    def custom_id(self, action, message_id, arg=None):
+        route = self._by_action[action]
+        custom_id = f"{CUSTOM_ID_VERSION}:{route.code}:{message_id}"
+        return f"{custom_id}:{arg}" if arg is not None else custom_id
+
+    def parse(self, custom_id):
+        """Devolve (route, message_id, arg) ou None para IDs desconhecidos/malformados"""
+        if not custom_id or len(custom_id) > 48:
+            return None
+
+        match = _V1_PATTERN.fullmatch(custom_id)
+        if match:
+            route = self._by_code.get(match.group(1))
+        else:
+            match = _LEGACY_PATTERN.fullmatch(custom_id)
+            route = self._by_action.get(match.group(1)) if match else None
+        if route is None:
+            return None
+
+        arg = match.group(3)
+        if route.has_arg != (arg is not None):
+            return None
+        return route, match.group(2), int(arg) if arg is not None else None
+
+    async def dispatch(self, interaction, custom_id):
+        parsed = self.parse(custom_id)
+        if parsed is None:
+            self.rejected += 1
+            return False
+
+        route, message_id, arg = parsed
+        started = time.perf_counter()
+        try:
+            # Permissão primeiro: cliques sem permissão nunca tocam o banco
+            if route.admin and not self.is_admin(interaction):
+                await self.deny(interaction)
+                return True
+
+            data = await self.loader(interaction, route, message_id)
+            if not data:
+                return True
+
+            await route.handler(RouteContext(self, interaction, route, message_id, arg, data))
+            return True
+        finally:
+            self.latency[route.action].observe(time.perf_counter() - started)
+
+    def stats(self):
+        return {action: hist.snapshot() for action, hist in self.latency.items()}
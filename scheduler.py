@@ -0,0 +1,142 @@
+import asyncio
+import heapq
+import math
+import time
+
+# Teto de cada espera, para acompanhar ajustes no relógio do sistema
+MAX_SLEEP = 3600
+
+# Espera antes de repetir um lote cujo `on_due` falhou; dobra a cada falha seguida
+RETRY_DELAY = 5
+MAX_RETRY_DELAY = 300
+
+
+# --- Agendador de Prazos ---
+class DeadlineScheduler:
+    """Min-heap de `end_timestamp`; dorme exatamente até o próximo prazo
+
+    Reagendar ou cancelar não remove nada do heap: a entrada antiga fica
+    obsoleta e é descartada quando chega ao topo. Se `on_due` falha, os
+    sorteios do lote voltam ao heap com espera crescente, até darem certo.
+    """
+
+    def __init__(self, on_due, retry_delay=RETRY_DELAY, max_retry_delay=MAX_RETRY_DELAY):
+        self.on_due = on_due
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._heap = []
+        self._deadlines = {}
+        # Falhas seguidas de cada sorteio, para o backoff das novas tentativas
+        self._failures = {}
+        # Criado em start(), já dentro do event loop do bot
+        self._wakeup = None
+        self._task = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def schedule(self, message_id, deadline):
+        str_id = str(message_id)
+        deadline = int(deadline)
+        if self._deadlines.get(str_id) == deadline:
+            return
+        self._deadlines[str_id] = deadline
+        self._failures.pop(str_id, None)
+        heapq.heappush(self._heap, (deadline, str_id))
+        # Só precisa acordar o loop se o novo prazo passou a ser o primeiro
+        if self._heap[0] == (deadline, str_id):
+            self._notify()
+
+    def cancel(self, message_id):
+        self._deadlines.pop(str(message_id), None)
+        self._failures.pop(str(message_id), None)
+
+    def rebuild(self, entries):
+        """Recria o heap a partir de pares (message_id, end_timestamp)"""
+        self._deadlines = {str(msg_id): int(deadline) for msg_id, deadline in entries}
+        self._heap = [(deadline, msg_id) for msg_id, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
+        self._notify()
+
+    def _notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _discard_stale(self):
+        while self._heap:
+            deadline, str_id = self._heap[0]
+            if self._deadlines.get(str_id) == deadline:
+                return
+            heapq.heappop(self._heap)
+
+    def next_deadline(self):
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            _, str_id = heapq.heappop(self._heap)
+            del self._deadlines[str_id]
+            due.append(str_id)
+        return due
+
+    def _retry(self, due, error):
+        """Devolve ao heap os sorteios de um lote que falhou, com espera crescente"""
+        now = time.time()
+        longest = 0
+        for str_id in due:
+            if str_id in self._deadlines:
+                # Reagendado durante a tentativa: vale o prazo novo
+                continue
+            failures = self._failures.get(str_id, 0) + 1
+            self._failures[str_id] = failures
+            delay = min(self.retry_delay * 2 ** (failures - 1), self.max_retry_delay)
+            longest = max(longest, delay)
+            deadline = math.ceil(now + delay)
+            self._deadlines[str_id] = deadline
+            heapq.heappush(self._heap, (deadline, str_id))
+        print(f"Erro ao finalizar {len(due)} sorteios vencidos (nova tentativa em até {longest}s): {error}")
+
+    def start(self):
+        if not self.running:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.running:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            deadline = self.next_deadline()
+
+            if deadline is None:
+                await self._wakeup.wait()
+                continue
+
+            delay = deadline - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(delay, MAX_SLEEP))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = self._pop_due(time.time())
+            if due:
+                try:
+                    await self.on_due(due)
+                except Exception as e:
+                    self._retry(due, e)
+                else:
+                    for str_id in due:
+                        self._failures.pop(str_id, None)
@@ -0,0 +1,261 @@
+import hashlib
+import math
+import hmac
+import secrets
+import struct
+import sys
+import time
+from array import array
+
+# Tentativas de sorteio por índice antes de cair para a varredura em fluxo
+MAX_INDEX_ATTEMPTS_FACTOR = 8
+
+
+# --- Gerador Auditável ---
+class DrawRNG:
+    """CSPRNG determinístico: HMAC-SHA256(semente, contador)
+
+    A semente vem de `secrets` e fica registrada no sorteio; com ela e a
+    mesma ordem de participantes o resultado pode ser reproduzido.
+    """
+
+    def __init__(self, seed=None):
+        self.seed = seed or secrets.token_hex(32)
+        self._key = bytes.fromhex(self.seed)
+        self._counter = 0
+        self._buffer = b""
+
+    def _bytes(self, n):
+        while len(self._buffer) < n:
+            block = hmac.new(self._key, self._counter.to_bytes(8, "big"), hashlib.sha256).digest()
+            self._counter += 1
+            self._buffer += block
+        out, self._buffer = self._buffer[:n], self._buffer[n:]
+        return out
+
+    def randbelow(self, n):
+        """Inteiro uniforme em [0, n) por rejeição, sem viés de módulo"""
+        if n <= 0:
+            raise ValueError("n precisa ser positivo")
+        bits = n.bit_length()
+        nbytes = (bits + 7) // 8
+        mask = (1 << bits) - 1
+        while True:
+            value = int.from_bytes(self._bytes(nbytes), "big") & mask
+            if value < n:
+                return value
+
+    def random(self):
+        """Float em (0, 1), nunca zero (usado com log)"""
+        return (self.randbelow(2**53 - 1) + 1) / 2**53
+
+
+# --- Tabela de Alias (sorteio ponderado) ---
+class AliasTable:
+    """Walker/Vose: construção O(n) uma vez, cada sorteio ponderado em O(1)
+
+    Posição i da tabela = i-ésimo participante na ordem de entrada. Cada
+    posição guarda um limiar de 32 bits e um "alias": sorteia-se uma posição
+    uniforme e um número de 32 bits; abaixo do limiar fica a posição, senão o
+    alias. Pesos são inteiros, então a construção não acumula erro de ponto
+    flutuante. São 8 bytes por participante (limiar + alias).
+    """
+
+    FULL = 2**32 - 1
+
+    __slots__ = ("threshold", "alias")
+
+    def __init__(self, threshold, alias):
+        self.threshold = threshold
+        self.alias = alias
+
+    def __len__(self):
+        return len(self.threshold)
+
+    @classmethod
+    def build(cls, weights):
+        """`weights`: pesos inteiros positivos na ordem de entrada"""
+        # Massa de cada posição escalada por n: a média passa a ser exatamente `total`
+        mass = array("Q", weights)
+        n = len(mass)
+        total = sum(mass)
+        if n == 0 or total == 0:
+            raise ValueError("Tabela de alias precisa de pelo menos um peso positivo")
+        threshold = array("I", [cls.FULL]) * n
+        alias = array("I", range(n))
+        small, large = array("I"), array("I")
+        for i in range(n):
+            mass[i] *= n
+            (small if mass[i] < total else large).append(i)
+
+        full = cls.FULL
+        while small and large:
+            s, l = small.pop(), large.pop()
+            threshold[s] = mass[s] * full // total
+            alias[s] = l
+            # O que sobrou da posição grande depois de completar a pequena
+            mass[l] -= total - mass[s]
+            (small if mass[l] < total else large).append(l)
+        # Restos (inclusive por arredondamento) ficam com a própria posição
+        return cls(threshold, alias)
+
+    def sample(self, rng):
+        """Índice sorteado proporcionalmente ao peso"""
+        i = rng.randbelow(len(self.threshold))
+        return i if rng.randbelow(self.FULL) < self.threshold[i] else self.alias[i]
+
+    def to_bytes(self):
+        threshold, alias = self.threshold, self.alias
+        if sys.byteorder == "big":
+            threshold, alias = array("I", threshold), array("I", alias)
+            threshold.byteswap()
+            alias.byteswap()
+        return struct.pack("<I", len(threshold)) + threshold.tobytes() + alias.tobytes()
+
+    @classmethod
+    def from_bytes(cls, raw):
+        (n,) = struct.unpack_from("<I", raw)
+        # memoryview: as fatias não copiam o blob antes de virar array
+        raw = memoryview(raw)
+        threshold, alias = array("I"), array("I")
+        threshold.frombytes(raw[4:4 + 4 * n])
+        alias.frombytes(raw[4 + 4 * n:4 + 8 * n])
+        if sys.byteorder == "big":
+            threshold.byteswap()
+            alias.byteswap()
+        return cls(threshold, alias)
+
+
+# --- Sorteio de Ganhadores ---
+class Draw:
+    def __init__(self, winners, seed, population, excluded, kind, weighted=False):
+        self.winners = winners
+        self.seed = seed
+        self.population = population
+        self.excluded = excluded
+        self.kind = kind
+        self.weighted = weighted
+
+    def audit(self, **extra):
+        """Registro salvo no histórico do sorteio (`draws`)"""
+        record = {
+            "kind": self.kind,
+            "seed": self.seed,
+            "population": self.population,
+            "excluded": sorted(self.excluded),
+            "winners": list(self.winners),
+            "at": int(time.time()),
+        }
+        if self.weighted:
+            record["weighted"] = True
+        record.update(extra)
+        return record
+
+
+def draw_winners(source, count, exclude=(), seed=None, kind="final"):
+    """Sorteia até `count` participantes distintos de `source`
+
+    `source` precisa de `len()`, acesso por índice e iteração em ordem de
+    entrada (ver storage.ParticipantSource). Sorteia por índice quando há
+    folga; se quase todos estiverem excluídos, percorre a fonte uma vez
+    com amostragem de reservatório. A memória usada é O(count + exclusões).
+    """
+    rng = DrawRNG(seed)
+    exclude = {int(p) for p in exclude}
+    population = len(source)
+
+    if count <= 0 or population == 0:
+        winners = []
+    elif population - len(exclude) <= count:
+        # Todos os elegíveis ganham; a ordem ainda passa pelo gerador
+        winners = _reservoir(source, count, exclude, rng)
+    else:
+        winners = _indexed(source, population, count, exclude, rng)
+        if winners is None:
+            winners = _reservoir(source, count, exclude, rng)
+
+    return Draw(winners, rng.seed, population, exclude, kind)
+
+
+def _indexed(source, population, count, exclude, rng):
+    winners = []
+    seen_idx = set()
+    chosen = set()
+    attempts = MAX_INDEX_ATTEMPTS_FACTOR * (count + len(exclude)) + 64
+
+    while len(winners) < count and attempts > 0:
+        attempts -= 1
+        index = rng.randbelow(population)
+        if index in seen_idx:
+            continue
+        seen_idx.add(index)
+        user_id = source[index]
+        if user_id in exclude or user_id in chosen:
+            continue
+        chosen.add(user_id)
+        winners.append(user_id)
+
+    return winners if len(winners) == count else None
+
+
+def _reservoir(source, count, exclude, rng):
+    """Algoritmo L sobre o fluxo de participantes, pulando os excluídos
+
+    Gera O(count * log(n / count)) números aleatórios em vez de um por item.
+    """
+    eligible = (user_id for user_id in source if user_id not in exclude)
+    reservoir = []
+    for user_id in eligible:
+        reservoir.append(user_id)
+        if len(reservoir) == count:
+            break
+
+    if len(reservoir) == count:
+        w = math.exp(math.log(rng.random()) / count)
+        skip = math.floor(math.log(rng.random()) / math.log(1 - w))
+        for user_id in eligible:
+            if skip > 0:
+                skip -= 1
+                continue
+            reservoir[rng.randbelow(count)] = user_id
+            w *= math.exp(math.log(rng.random()) / count)
+            skip = math.floor(math.log(rng.random()) / math.log(1 - w))
+
+    # Embaralha para que a posição não dependa da ordem de entrada
+    for i in range(len(reservoir) - 1, 0, -1):
+        j = rng.randbelow(i + 1)
+        reservoir[i], reservoir[j] = reservoir[j], reservoir[i]
+    return reservoir
+
+
+def draw_weighted(table, source, count, exclude=(), seed=None, kind="final", entries=None):
+    """Sorteia até `count` participantes distintos de `source` pelos pesos da `table`
+
+    Cada tentativa custa O(1) (uma amostra da tabela e um acesso por índice);
+    excluídos e repetidos são descartados e sorteados de novo. Se quase todo
+    o peso estiver excluído, `entries()` — pares (user_id, peso) na ordem de
+    entrada — monta uma tabela só com os elegíveis.
+    """
+    rng = DrawRNG(seed)
+    exclude = {int(p) for p in exclude}
+    population = len(source)
+
+    winners = []
+    chosen = set()
+    if count > 0 and population:
+        attempts = MAX_INDEX_ATTEMPTS_FACTOR * (count + len(exclude)) + 64
+        while len(winners) < count and attempts > 0:
+            attempts -= 1
+            user_id = source[table.sample(rng)]
+            if user_id in exclude or user_id in chosen:
+                continue
+            chosen.add(user_id)
+            winners.append(user_id)
+
+        if len(winners) < count and entries is not None:
+            eligible = [(u, w) for u, w in entries() if u not in exclude and u not in chosen]
+            while eligible and len(winners) < count:
+                i = AliasTable.build(w for _, w in eligible).sample(rng)
+                winners.append(eligible.pop(i)[0])
+
+    return Draw(winners, rng.seed, population, exclude, kind, weighted=True)
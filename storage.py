@@ -0,0 +1,1366 @@
+import asyncio
+import functools
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from cache import BloomFilter, GiveawayCache, copy_giveaway
+from monitoring import Histogram
+from participants import ParticipantSet
+from selection import AliasTable
+
+# --- Backends de Armazenamento ---
+# Todos os backends expõem a mesma interface usada pela classe Database.
+# O JSON continua disponível para instalações antigas; o SQLite é o padrão.
+
+SCHEMA_VERSION = 4
+
+# Campos que ganham coluna própria (indexáveis); o resto vai para `data`
+INDEXED_FIELDS = ("status", "end_timestamp", "channel_id")
+
+
+# Tamanho de uma linha de participante (message_id, user_id, seq) na contagem de bytes
+PARTICIPANT_ROW_BYTES = 24
+
+# Entradas lidas por vez sob o _io_lock ao percorrer os participantes de um sorteio
+ENTRY_CHUNK = 10000
+
+# Tabelas de alias mantidas em memória (rerolls seguidos do mesmo sorteio)
+ALIAS_CACHE_SIZE = 4
+
+# Insere (user_id, peso, message_id) na próxima posição do sorteio, se ele existir
+INSERT_PARTICIPANT_SQL = """
+    INSERT OR IGNORE INTO participants (message_id, user_id, seq, weight)
+    SELECT g.message_id, ?, COALESCE(
+        (SELECT MAX(p.seq) + 1 FROM participants p WHERE p.message_id = g.message_id), 0
+    ), ?
+    FROM giveaways g WHERE g.message_id = ?
+"""
+
+
+# Maior snowflake que cabe no INTEGER do SQLite (64 bits com sinal)
+MAX_SNOWFLAKE = 2**63 - 1
+
+
+def is_message_id(message_id):
+    """True se o ID (int ou texto digitado num comando) é um snowflake válido"""
+    text = str(message_id)
+    return text.isascii() and text.isdigit() and int(text) <= MAX_SNOWFLAKE
+
+
+def normalize_user_id(user_id):
+    """Converte IDs legados (str) para int"""
+    return int(user_id)
+
+
+def entry_weight(entry):
+    """Peso de uma entrada (message_id, user_id[, peso]); sem peso vale 1"""
+    return entry[2] if len(entry) > 2 else 1
+
+
+class VersionConflict(Exception):
+    """O sorteio foi alterado por outro escritor desde a leitura (compare-and-set)"""
+
+    def __init__(self, message_id, expected, actual):
+        super().__init__(f"Sorteio {message_id}: versão esperada {expected}, atual {actual}")
+        self.message_id = message_id
+        self.expected = expected
+        self.actual = actual
+
+
+class StorageBackend:
+    # Bytes de dados entregues ao armazenamento (métrica; não inclui índices/WAL)
+    bytes_written = 0
+
+    # Cada update incrementa `version`; com expected_version o update só é
+    # aplicado se ninguém gravou o sorteio desde a leitura (senão VersionConflict)
+
+    def get_giveaway(self, message_id, include_participants=True):
+        raise NotImplementedError
+
+    def update_giveaway(self, message_id, update_data, expected_version=None):
+        raise NotImplementedError
+
+    def update_giveaways(self, updates):
+        """Aplica [(message_id, alterações, versão esperada)] de uma vez; devolve os IDs aplicados
+
+        Um conflito de versão pula só aquele sorteio, não o lote inteiro.
+        """
+        applied = []
+        for message_id, update_data, expected_version in updates:
+            try:
+                self.update_giveaway(message_id, update_data, expected_version=expected_version)
+            except VersionConflict:
+                continue
+            applied.append(str(message_id))
+        return applied
+
+    def add_participant(self, message_id, user_id, weight=1):
+        raise NotImplementedError
+
+    def add_participants_bulk(self, entries):
+        """Grava várias entradas (message_id, user_id[, peso]) de uma vez"""
+        raise NotImplementedError
+
+    def get_participants(self, message_id):
+        """Lista de participantes ou None se o sorteio não existir"""
+        giveaway = self.get_giveaway(message_id)
+        if giveaway is None:
+            return None
+        return giveaway.get("participants", [])
+
+    def count_participants(self, message_id):
+        return len(self.get_participants(message_id) or [])
+
+    def participant_at(self, message_id, index):
+        """Participante na posição `index` da ordem de entrada"""
+        return self.get_participants(message_id)[index]
+
+    def iter_participants(self, message_id, chunk_size=10000):
+        yield from self.get_participants(message_id) or []
+
+    def iter_entries(self, message_id, chunk_size=10000):
+        """Pares (user_id, peso) na ordem de entrada"""
+        for user_id in self.iter_participants(message_id, chunk_size):
+            yield user_id, 1
+
+    # Participantes com peso > 1 aparecem em `weights` ({user_id (str): peso})
+    # quando o sorteio é lido com include_participants=True
+
+    def save_alias_table(self, message_id, raw):
+        """Guarda a tabela de alias serializada do sorteio ponderado"""
+        raise NotImplementedError
+
+    def load_alias_table(self, message_id):
+        """Tabela de alias serializada ou None"""
+        raise NotImplementedError
+
+    def iter_giveaways(self, status=None, due_before=None, include_participants=True, limit=None):
+        """Gera (message_id, dados) filtrando por status e/ou prazo"""
+        raise NotImplementedError
+
+    def giveaway_ids(self):
+        """IDs de todos os sorteios gravados (sem carregar os dados)"""
+        return [msg_id for msg_id, _ in self.iter_giveaways(include_participants=False)]
+
+    def delete_giveaways(self, versions):
+        """Remove sorteios {message_id: versão esperada ou None}; devolve os IDs removidos
+
+        Um sorteio alterado desde a leitura (versão diferente) fica onde está.
+        """
+        raise NotImplementedError
+
+    def load(self):
+        return {"giveaways": dict(self.iter_giveaways())}
+
+    def close(self):
+        pass
+
+
+class JSONBackend(StorageBackend):
+    """data.json como snapshot + diário (journal) de alterações só-de-acréscimo
+
+    Cada alteração vira uma linha compacta no journal. A cada
+    `snapshot_every` registros o estado completo é gravado em um arquivo
+    temporário, sincronizado em disco e renomeado sobre o data.json, e o
+    journal é truncado. Na inicialização o journal é reaplicado sobre o
+    último snapshot.
+
+    Com `readonly=True` só lê (migração): nada no disco é alterado, nem ao fechar.
+    """
+
+    def __init__(self, filename, snapshot_every=1000, readonly=False):
+        self.filename = filename
+        self.readonly = readonly
+        self.journal_file = filename + ".journal"
+        # Participantes ficam fora do JSON, um arquivo binário por sorteio
+        self.participants_dir = filename + ".participants"
+        self.snapshot_every = max(1, snapshot_every)
+        self._seq = 0
+        self._since_snapshot = 0
+        # Sorteios cujos participantes mudaram desde o último snapshot
+        self._dirty = set()
+        # Sorteios removidos cujo arquivo de participantes sai no próximo snapshot
+        self._deleted = set()
+        self.data = self._recover()
+        self._journal = None if readonly else open(self.journal_file, 'a', encoding='utf-8')
+
+    # --- Recuperação ---
+
+    def _recover(self):
+        data = {"giveaways": {}}
+        if os.path.exists(self.filename):
+            try:
+                with open(self.filename, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except json.JSONDecodeError as e:
+                # Nunca trocar um arquivo corrompido por um banco vazio
+                raise RuntimeError(f"Snapshot {self.filename} corrompido: {e}") from e
+
+        self._seq = data.pop("journal_seq", 0)
+        for msg_id, giveaway in data["giveaways"].items():
+            giveaway["participants"] = self._load_participants(msg_id, giveaway)
+        replayed = self._replay(data)
+        if replayed:
+            print(f"Reaplicados {replayed} registros do journal.")
+        return data
+
+    def _sidecar(self, msg_id, ext="bin"):
+        return os.path.join(self.participants_dir, f"{msg_id}.{ext}")
+
+    def _load_participants(self, msg_id, giveaway):
+        path = self._sidecar(msg_id)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return ParticipantSet.from_bytes(f.read())
+        # Formato antigo: lista JSON (int e str misturados) convertida na carga
+        self._dirty.add(msg_id)
+        return ParticipantSet(giveaway.get("participants", []))
+
+    def _replay(self, data):
+        if not os.path.exists(self.journal_file):
+            return 0
+
+        replayed = 0
+        valid_bytes = 0
+        with open(self.journal_file, 'rb') as f:
+            for raw in f:
+                try:
+                    record = json.loads(raw)
+                except json.JSONDecodeError:
+                    # Linha parcial de uma escrita interrompida: descarta o resto
+                    break
+                valid_bytes += len(raw)
+                if record["seq"] <= self._seq:
+                    continue
+                self._apply(data, record)
+                self._seq = record["seq"]
+                replayed += 1
+
+        if not self.readonly and valid_bytes < os.path.getsize(self.journal_file):
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(valid_bytes)
+        self._since_snapshot = replayed
+        return replayed
+
+    # --- Registros ---
+
+    def _apply(self, data, record):
+        giveaways = data["giveaways"]
+        if record["op"] == "update":
+            changes = dict(record["data"])
+            changes.pop("version", None)
+            self._deleted.discard(record["id"])
+            giveaway = giveaways.setdefault(record["id"], {})
+            giveaway["version"] = giveaway.get("version", 0) + 1
+            if "participants" in changes:
+                giveaway["participants"] = ParticipantSet(changes.pop("participants"))
+                self._dirty.add(record["id"])
+            giveaway.setdefault("participants", ParticipantSet())
+            if changes.get("weights"):
+                giveaway.setdefault("weights", {}).update(changes.pop("weights"))
+            giveaway.update(changes)
+        elif record["op"] == "updates":
+            for item in record["items"]:
+                self._apply(data, {"op": "update", "id": item["id"], "data": item["data"]})
+        elif record["op"] == "join":
+            for str_id, users in record["entries"].items():
+                if str_id not in giveaways:
+                    continue
+                participants = giveaways[str_id].setdefault("participants", ParticipantSet())
+                for user_id in users:
+                    participants.add(user_id)
+                weights = record.get("weights", {}).get(str_id)
+                if weights:
+                    giveaways[str_id].setdefault("weights", {}).update(weights)
+                self._dirty.add(str_id)
+        elif record["op"] == "delete":
+            for str_id in record["ids"]:
+                giveaways.pop(str_id, None)
+                self._dirty.discard(str_id)
+                self._deleted.add(str_id)
+
+    def _append(self, record):
+        if self.readonly:
+            raise RuntimeError(f"{self.filename} aberto somente para leitura")
+        self._seq += 1
+        record["seq"] = self._seq
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        self._journal.write(line)
+        self.bytes_written += len(line.encode('utf-8'))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        # Arquivos de participantes primeiro: o journal reaplica entradas de forma idempotente
+        if self._dirty:
+            os.makedirs(self.participants_dir, exist_ok=True)
+            for msg_id in self._dirty:
+                giveaway = self.data["giveaways"].get(msg_id)
+                if giveaway is not None:
+                    payload = giveaway["participants"].to_bytes()
+                    _write_atomic(self._sidecar(msg_id), payload)
+                    self.bytes_written += len(payload)
+            _fsync_dir(self._sidecar("x"))
+            self._dirty = set()
+
+        giveaways = {
+            msg_id: {k: v for k, v in g.items() if k != "participants"}
+            for msg_id, g in self.data["giveaways"].items()
+        }
+        payload = json.dumps(
+            {"giveaways": giveaways, "journal_seq": self._seq}, ensure_ascii=False, separators=(",", ":")
+        )
+        payload = payload.encode('utf-8')
+        _write_atomic(self.filename, payload)
+        self.bytes_written += len(payload)
+        _fsync_dir(self.filename)
+
+        # Registros já cobertos pelo snapshot podem sair do journal
+        self._journal.truncate(0)
+        self._journal.seek(0)
+        self._since_snapshot = 0
+
+        # Só depois do snapshot: antes dele o journal ainda pode precisar do arquivo
+        for msg_id in self._deleted:
+            if msg_id not in self.data["giveaways"]:
+                for ext in ("bin", "alias"):
+                    try:
+                        os.remove(self._sidecar(msg_id, ext))
+                    except FileNotFoundError:
+                        pass
+        self._deleted = set()
+
+    # --- Interface ---
+
+    def load(self):
+        return {"giveaways": {msg_id: self._copy(g) for msg_id, g in self.data["giveaways"].items()}}
+
+    @staticmethod
+    def _copy(giveaway):
+        giveaway = dict(giveaway)
+        for key in ("participants", "winners", "draws"):
+            if key in giveaway:
+                giveaway[key] = list(giveaway[key])
+        if "weights" in giveaway:
+            giveaway["weights"] = dict(giveaway["weights"])
+        return giveaway
+
+    def get_giveaway(self, message_id, include_participants=True):
+        giveaway = self.data["giveaways"].get(str(message_id))
+        if giveaway is None:
+            return None
+        giveaway = self._copy(giveaway)
+        giveaway.setdefault("version", 0)
+        if not include_participants:
+            giveaway.pop("participants", None)
+            giveaway.pop("weights", None)
+        return giveaway
+
+    def update_giveaway(self, message_id, update_data, expected_version=None):
+        if expected_version is not None:
+            current = self.data["giveaways"].get(str(message_id), {}).get("version", 0)
+            if current != expected_version:
+                raise VersionConflict(message_id, expected_version, current)
+        record = {"op": "update", "id": str(message_id), "data": self._copy(update_data)}
+        self._apply(self.data, record)
+        self._append(record)
+
+    def update_giveaways(self, updates):
+        giveaways = self.data["giveaways"]
+        items = []
+        for message_id, update_data, expected_version in updates:
+            current = giveaways.get(str(message_id), {}).get("version", 0)
+            if expected_version is not None and current != expected_version:
+                continue
+            items.append({"id": str(message_id), "data": self._copy(update_data)})
+        if items:
+            # Um único registro (e um único fsync) para o lote todo
+            record = {"op": "updates", "items": items}
+            self._apply(self.data, record)
+            self._append(record)
+        return [item["id"] for item in items]
+
+    def add_participant(self, message_id, user_id, weight=1):
+        giveaway = self.data["giveaways"].get(str(message_id))
+        if giveaway is None:
+            return False
+        if user_id in giveaway["participants"]:
+            return False
+        self.add_participants_bulk([(message_id, user_id, weight)])
+        return True
+
+    def add_participants_bulk(self, entries):
+        grouped = {}
+        # Só pesos > 1 vão para o registro (mapa esparso por sorteio)
+        weights = {}
+        for entry in entries:
+            str_id, user_id = str(entry[0]), normalize_user_id(entry[1])
+            grouped.setdefault(str_id, []).append(user_id)
+            if entry_weight(entry) > 1:
+                weights.setdefault(str_id, {})[str(user_id)] = entry_weight(entry)
+        record = {"op": "join", "entries": grouped}
+        if weights:
+            record["weights"] = weights
+        self._apply(self.data, record)
+        self._append(record)
+
+    def _participant_list(self, message_id):
+        giveaway = self.data["giveaways"].get(str(message_id)) or {}
+        return giveaway.get("participants", ())
+
+    def count_participants(self, message_id):
+        return len(self._participant_list(message_id))
+
+    def participant_at(self, message_id, index):
+        return normalize_user_id(self._participant_list(message_id)[index])
+
+    def iter_participants(self, message_id, chunk_size=10000):
+        for user_id in self._participant_list(message_id):
+            yield int(user_id)
+
+    def iter_entries(self, message_id, chunk_size=10000):
+        # Cópias tiradas no primeiro passo: entradas que chegam durante a leitura não a alteram
+        giveaway = self.data["giveaways"].get(str(message_id)) or {}
+        weights = dict(giveaway.get("weights") or {})
+        participants = self._participant_list(message_id)
+        for user_id in participants.snapshot() if participants else ():
+            yield int(user_id), weights.get(str(user_id), 1)
+
+    def save_alias_table(self, message_id, raw):
+        # Sidecar ao lado do arquivo de participantes; sai junto quando o sorteio é apagado
+        os.makedirs(self.participants_dir, exist_ok=True)
+        _write_atomic(self._sidecar(message_id, "alias"), raw)
+        self.bytes_written += len(raw)
+
+    def load_alias_table(self, message_id):
+        try:
+            with open(self._sidecar(message_id, "alias"), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def iter_giveaways(self, status=None, due_before=None, include_participants=True, limit=None):
+        found = 0
+        for msg_id, g_data in list(self.data["giveaways"].items()):
+            if limit is not None and found >= limit:
+                return
+            if status is not None and g_data.get("status") != status:
+                continue
+            if due_before is not None and g_data.get("end_timestamp", 0) > due_before:
+                continue
+            g_data = self._copy(g_data)
+            g_data.setdefault("version", 0)
+            if not include_participants:
+                g_data.pop("participants", None)
+                g_data.pop("weights", None)
+            found += 1
+            yield msg_id, g_data
+
+    def giveaway_ids(self):
+        return list(self.data["giveaways"])
+
+    def delete_giveaways(self, versions):
+        giveaways = self.data["giveaways"]
+        deleted = [
+            str(msg_id) for msg_id, version in versions.items()
+            if str(msg_id) in giveaways
+            and (version is None or giveaways[str(msg_id)].get("version", 0) == version)
+        ]
+        if deleted:
+            record = {"op": "delete", "ids": deleted}
+            self._apply(self.data, record)
+            self._append(record)
+        return deleted
+
+    def close(self):
+        if self.readonly:
+            return
+        self.snapshot()
+        self._journal.close()
+
+
+def _write_atomic(path, payload):
+    """Arquivo temporário + fsync + rename: nunca deixa o destino pela metade"""
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+def _fsync_dir(path):
+    """Garante que o rename do snapshot chegou ao disco"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SQLiteBackend(StorageBackend):
+    """Sorteios indexados por message_id/status; participantes como linhas únicas"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        # A conexão é compartilhada entre threads, então serializamos o acesso
+        self._lock = threading.RLock()
+        # timeout = busy_timeout: outros processos (shards) podem estar gravando
+        self.conn = sqlite3.connect(filename, timeout=10, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self._migrate_schema()
+
+    def _migrate_schema(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        with self.transaction() as cur:
+            for step in range(version + 1, SCHEMA_VERSION + 1):
+                getattr(self, f"_schema_v{step}")(cur)
+            cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _schema_v1(self, cur):
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS giveaways (
+                message_id INTEGER PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'setup',
+                end_timestamp INTEGER,
+                channel_id INTEGER,
+                data TEXT NOT NULL DEFAULT '{}'
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_giveaways_status ON giveaways(status, end_timestamp)")
+        # UNIQUE impede que o mesmo usuário entre duas vezes
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS participants (
+                message_id INTEGER NOT NULL REFERENCES giveaways(message_id) ON DELETE CASCADE,
+                user_id INTEGER NOT NULL,
+                UNIQUE (message_id, user_id)
+            )
+        """)
+
+    def _schema_v2(self, cur):
+        # Posição contínua por sorteio: permite sortear por índice sem carregar a lista
+        cur.execute("ALTER TABLE participants ADD COLUMN seq INTEGER")
+        cur.execute("""
+            WITH ordered AS (
+                SELECT rowid AS rid, ROW_NUMBER() OVER (PARTITION BY message_id ORDER BY rowid) - 1 AS pos
+                FROM participants
+            )
+            UPDATE participants SET seq = ordered.pos FROM ordered WHERE ordered.rid = participants.rowid
+        """)
+        cur.execute("CREATE UNIQUE INDEX idx_participants_seq ON participants(message_id, seq)")
+
+    def _schema_v3(self, cur):
+        # Contador de alterações para compare-and-set entre escritores
+        cur.execute("ALTER TABLE giveaways ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    def _schema_v4(self, cur):
+        # Entradas bônus: peso de cada participante e a tabela de alias gravada no fim
+        cur.execute("ALTER TABLE participants ADD COLUMN weight INTEGER NOT NULL DEFAULT 1")
+        cur.execute("""
+            CREATE TABLE alias_tables (
+                message_id INTEGER PRIMARY KEY REFERENCES giveaways(message_id) ON DELETE CASCADE,
+                data BLOB NOT NULL
+            )
+        """)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                yield cur
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            else:
+                cur.execute("COMMIT")
+            finally:
+                cur.close()
+
+    def is_empty(self):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM giveaways LIMIT 1").fetchone() is None
+
+    def _row_to_dict(self, row):
+        status, end_ts, channel_id, version, raw = row
+        data = json.loads(raw)
+        data["status"] = status
+        data["version"] = version
+        if end_ts is not None:
+            data["end_timestamp"] = end_ts
+        if channel_id is not None:
+            data["channel_id"] = channel_id
+        return data
+
+    def _participants(self, message_id):
+        rows = self.conn.execute(
+            "SELECT user_id FROM participants WHERE message_id = ? ORDER BY seq",
+            (int(message_id),)
+        )
+        return [r[0] for r in rows]
+
+    def _weights(self, message_id):
+        rows = self.conn.execute(
+            "SELECT user_id, weight FROM participants WHERE message_id = ? AND weight > 1",
+            (int(message_id),)
+        )
+        return {str(user_id): weight for user_id, weight in rows}
+
+    def _add_participant_data(self, data, message_id):
+        data["participants"] = self._participants(message_id)
+        weights = self._weights(message_id)
+        if weights:
+            data["weights"] = weights
+
+    def get_giveaway(self, message_id, include_participants=True):
+        if not is_message_id(message_id):
+            return None
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT status, end_timestamp, channel_id, version, data FROM giveaways WHERE message_id = ?",
+                (int(message_id),)
+            ).fetchone()
+            if row is None:
+                return None
+            data = self._row_to_dict(row)
+            if include_participants:
+                self._add_participant_data(data, message_id)
+            return data
+
+    def _upsert(self, cur, message_id, update_data, expected_version=None):
+        update_data = dict(update_data)
+        participants = update_data.pop("participants", None)
+        weights = update_data.pop("weights", None) or {}
+        update_data.pop("version", None)
+
+        row = cur.execute(
+            "SELECT status, end_timestamp, channel_id, version, data FROM giveaways WHERE message_id = ?",
+            (message_id,)
+        ).fetchone()
+        data = self._row_to_dict(row) if row else {}
+        version = data.pop("version", 0)
+        if expected_version is not None and version != expected_version:
+            raise VersionConflict(message_id, expected_version, version)
+        data.update(update_data)
+
+        columns = {key: data.pop(key, None) for key in INDEXED_FIELDS}
+        raw = json.dumps(data, ensure_ascii=False)
+        self.bytes_written += len(raw.encode('utf-8'))
+        cur.execute(
+            """
+            INSERT INTO giveaways (message_id, status, end_timestamp, channel_id, data)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(message_id) DO UPDATE SET
+                status = excluded.status,
+                end_timestamp = excluded.end_timestamp,
+                channel_id = excluded.channel_id,
+                data = excluded.data,
+                version = giveaways.version + 1
+            """,
+            (message_id, columns["status"] or "setup", columns["end_timestamp"],
+             columns["channel_id"], raw)
+        )
+
+        # Participantes só são acrescentados, nunca removidos por um update
+        if participants:
+            cur.executemany(
+                INSERT_PARTICIPANT_SQL,
+                ((normalize_user_id(p), weights.get(str(p), 1), message_id) for p in participants)
+            )
+            self.bytes_written += cur.rowcount * PARTICIPANT_ROW_BYTES
+
+    def update_giveaway(self, message_id, update_data, expected_version=None):
+        with self.transaction() as cur:
+            self._upsert(cur, int(message_id), update_data, expected_version)
+
+    def update_giveaways(self, updates):
+        applied = []
+        with self.transaction() as cur:
+            for message_id, update_data, expected_version in updates:
+                try:
+                    # A versão é conferida antes de qualquer escrita do sorteio
+                    self._upsert(cur, int(message_id), update_data, expected_version)
+                except VersionConflict:
+                    continue
+                applied.append(str(message_id))
+        return applied
+
+    def add_participant(self, message_id, user_id, weight=1):
+        with self.transaction() as cur:
+            cur.execute(INSERT_PARTICIPANT_SQL, (normalize_user_id(user_id), weight, int(message_id)))
+            self.bytes_written += cur.rowcount * PARTICIPANT_ROW_BYTES
+            return cur.rowcount == 1
+
+    def add_participants_bulk(self, entries):
+        with self.transaction() as cur:
+            cur.executemany(
+                INSERT_PARTICIPANT_SQL,
+                ((normalize_user_id(entry[1]), entry_weight(entry), int(entry[0])) for entry in entries)
+            )
+            self.bytes_written += cur.rowcount * PARTICIPANT_ROW_BYTES
+
+    def get_participants(self, message_id):
+        with self._lock:
+            exists = self.conn.execute(
+                "SELECT 1 FROM giveaways WHERE message_id = ?", (int(message_id),)
+            ).fetchone()
+            if exists is None:
+                return None
+            return self._participants(message_id)
+
+    def count_participants(self, message_id):
+        with self._lock:
+            # seq é contínuo a partir de 0: o maior valor + 1 é a contagem (O(log n))
+            return self.conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM participants WHERE message_id = ?", (int(message_id),)
+            ).fetchone()[0]
+
+    def participant_at(self, message_id, index):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT user_id FROM participants WHERE message_id = ? AND seq = ?",
+                (int(message_id), index)
+            ).fetchone()
+        if row is None:
+            raise IndexError(index)
+        return row[0]
+
+    def iter_participants(self, message_id, chunk_size=10000):
+        # Paginação por seq: nunca mantém mais que um bloco em memória
+        last = -1
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    """
+                    SELECT seq, user_id FROM participants
+                    WHERE message_id = ? AND seq > ? ORDER BY seq LIMIT ?
+                    """,
+                    (int(message_id), last, chunk_size)
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            for _, user_id in rows:
+                yield user_id
+
+    def iter_entries(self, message_id, chunk_size=10000):
+        last = -1
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    """
+                    SELECT seq, user_id, weight FROM participants
+                    WHERE message_id = ? AND seq > ? ORDER BY seq LIMIT ?
+                    """,
+                    (int(message_id), last, chunk_size)
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            for _, user_id, weight in rows:
+                yield user_id, weight
+
+    def save_alias_table(self, message_id, raw):
+        with self.transaction() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO alias_tables (message_id, data) VALUES (?, ?)", (int(message_id), raw)
+            )
+            self.bytes_written += len(raw)
+
+    def load_alias_table(self, message_id):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT data FROM alias_tables WHERE message_id = ?", (int(message_id),)
+            ).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def iter_giveaways(self, status=None, due_before=None, include_participants=True, limit=None):
+        query = "SELECT message_id, status, end_timestamp, channel_id, version, data FROM giveaways"
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if due_before is not None:
+            clauses.append("end_timestamp <= ?")
+            params.append(due_before)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        for row in rows:
+            msg_id = str(row[0])
+            data = self._row_to_dict(row[1:])
+            if include_participants:
+                with self._lock:
+                    self._add_participant_data(data, msg_id)
+            yield msg_id, data
+
+    def giveaway_ids(self):
+        with self._lock:
+            return [str(row[0]) for row in self.conn.execute("SELECT message_id FROM giveaways")]
+
+    def delete_giveaways(self, versions):
+        deleted = []
+        with self.transaction() as cur:
+            for message_id, version in versions.items():
+                # Participantes e tabela de alias saem junto (ON DELETE CASCADE)
+                if version is None:
+                    cur.execute("DELETE FROM giveaways WHERE message_id = ?", (int(message_id),))
+                else:
+                    cur.execute(
+                        "DELETE FROM giveaways WHERE message_id = ? AND version = ?", (int(message_id), version)
+                    )
+                if cur.rowcount:
+                    deleted.append(str(message_id))
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def migrate_json_to_sqlite(json_path, backend):
+    """Importa um data.json legado para o SQLite (executa uma única vez)"""
+    if not os.path.exists(json_path) or not backend.is_empty():
+        return 0
+
+    # Lê pelo backend JSON (inclui registros ainda no journal) sem tocar nos arquivos
+    legacy = JSONBackend(json_path, readonly=True)
+    giveaways = legacy.load()["giveaways"]
+    legacy.close()
+
+    with backend.transaction() as cur:
+        for msg_id, g_data in giveaways.items():
+            backend._upsert(cur, int(msg_id), g_data)
+
+    # Só depois do commit: renomeia os originais intactos (backup para voltar à versão antiga)
+    for path in (json_path, legacy.journal_file, legacy.participants_dir):
+        if os.path.exists(path):
+            os.replace(path, path + ".migrated")
+    return len(giveaways)
+
+
+def create_backend(kind, filename, snapshot_every=1000):
+    if kind == "json":
+        return JSONBackend(filename, snapshot_every=snapshot_every)
+    if kind == "sqlite":
+        return SQLiteBackend(filename)
+    raise ValueError(f"Backend de armazenamento desconhecido: {kind}")
+
+
+# --- Fila de Escrita em Lote (write-behind) ---
+class WriteBehindQueue:
+    """Acumula entradas e grava em lote ao atingir max_entries ou max_ms"""
+
+    def __init__(self, flush_fn, max_entries=500, max_ms=200):
+        self.flush_fn = flush_fn
+        self.max_entries = max(1, max_entries)
+        self.max_delay = max(0, max_ms) / 1000
+        self._pending = []
+        self._first_at = None
+        self._closed = False
+        self._cond = threading.Condition()
+        # Garante que um lote retirado da fila já esteja gravado quando flush() retornar
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
+
+    def put(self, item):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Fila de escrita já foi encerrada")
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append(item)
+            if len(self._pending) >= self.max_entries:
+                self._cond.notify()
+            elif len(self._pending) == 1:
+                # Acorda a thread para começar a contar o prazo
+                self._cond.notify()
+
+    def _due(self):
+        if not self._pending:
+            return False
+        if len(self._pending) >= self.max_entries:
+            return True
+        return time.monotonic() - self._first_at >= self.max_delay
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._due():
+                    if self._pending:
+                        self._cond.wait(self._first_at + self.max_delay - time.monotonic())
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # O lote voltou para a fila; nova tentativa após max_ms
+                pass
+
+    def flush(self):
+        with self._write_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+                self._first_at = None
+            if not batch:
+                return
+            try:
+                self.flush_fn(batch)
+            except Exception as e:
+                print(f"Erro ao gravar lote de {len(batch)} participantes: {e}")
+                # Devolve o lote para a frente da fila e tenta de novo depois
+                with self._cond:
+                    self._pending[:0] = batch
+                    self._first_at = time.monotonic()
+                raise
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+
+
+# --- Gerenciamento de Banco de Dados ---
+class Database:
+    def __init__(self, backend, flush_max_entries=500, flush_max_ms=200, cache_bytes=16 * 2**20):
+        self.backend = backend
+        # Dados dos sorteios sem participantes; preenchido e atualizado sob o _io_lock
+        self.cache = GiveawayCache(cache_bytes)
+        # IDs de sorteios existentes: eventos de outras mensagens saem sem tocar no backend
+        ids = backend.giveaway_ids()
+        self._known = BloomFilter(capacity=max(100_000, 2 * len(ids)))
+        for msg_id in ids:
+            self._known.add(msg_id)
+        # Conjuntos compactos em memória por sorteio (IDs normalizados para int)
+        self._participants = {}
+        # Sorteios encerrados por este processo: recusam entradas mesmo com dados antigos em mãos
+        self._closed = set()
+        # Tabelas de alias dos sorteios ponderados usados por último (LRU pequeno)
+        self._alias_tables = OrderedDict()
+        # Serializa o acesso ao backend entre o loop e a thread de escrita
+        self._io_lock = threading.RLock()
+        self._queue = WriteBehindQueue(self._write_participants, flush_max_entries, flush_max_ms)
+        # Tempo de cada operação no backend (inclui a espera pelo _io_lock)
+        self.latency = defaultdict(Histogram)
+
+    @contextmanager
+    def _timed(self, op):
+        started = time.perf_counter()
+        try:
+            with self._io_lock:
+                yield
+        finally:
+            self.latency[op].observe(time.perf_counter() - started)
+
+    def _write_participants(self, batch):
+        with self._timed("save_participants"):
+            self.backend.add_participants_bulk(batch)
+
+    def _participant_set(self, message_id):
+        str_id = str(message_id)
+        participants = self._participants.get(str_id)
+        if participants is None:
+            with self._timed("load_participants"):
+                stored = self.backend.get_participants(str_id)
+            if stored is None:
+                return None
+            participants = ParticipantSet(stored)
+            self._participants[str_id] = participants
+        return participants
+
+    def flush(self):
+        self._queue.flush()
+
+    def load(self):
+        self.flush()
+        with self._io_lock:
+            return self.backend.load()
+
+    def _remember(self, message_id):
+        self._known.add(str(message_id))
+        if self._known.full:
+            # Filtro cheio erra mais: reconstrói com o dobro da capacidade
+            known = BloomFilter(capacity=2 * self._known.capacity)
+            for msg_id in self.backend.giveaway_ids():
+                known.add(msg_id)
+            self._known = known
+
+    def might_exist(self, message_id):
+        """False = com certeza não é um sorteio; True = talvez (confirmar no banco)"""
+        return str(message_id) in self._known
+
+    def get_giveaway(self, message_id, include_participants=True):
+        if not include_participants:
+            data = self.cache.get(message_id)
+            if data is not None:
+                return data
+            self.cache.misses += 1
+        with self._timed("load"):
+            data = self.backend.get_giveaway(message_id, include_participants=include_participants)
+            if data is not None:
+                self.cache.put(message_id, data)
+        participants = self._participants.get(str(message_id))
+        if data is not None and participants is not None and include_participants:
+            # A fila ainda pode ter entradas não gravadas
+            data["participants"] = list(participants)
+        return data
+
+    def update_giveaway(self, message_id, update_data, expected_version=None):
+        with self._timed("save"):
+            try:
+                self.backend.update_giveaway(message_id, update_data, expected_version=expected_version)
+            except VersionConflict:
+                # Outro escritor mudou o sorteio: a próxima leitura busca a versão atual
+                self.cache.invalidate(message_id)
+                raise
+            self.cache.apply(message_id, update_data)
+            self._remember(message_id)
+        if update_data.get("status") == "ended":
+            self._release([str(message_id)])
+
+    def update_giveaways(self, updates):
+        """Vários updates em uma única transação; devolve os IDs aplicados"""
+        with self._timed("save_batch"):
+            applied = self.backend.update_giveaways(updates)
+            applied_ids = set(applied)
+            # Sorteio repetido no lote: não dá para saber qual update valeu, relê do backend
+            repeated = {k for k, n in Counter(str(m) for m, _, _ in updates).items() if n > 1}
+            for message_id, update_data, _ in updates:
+                if str(message_id) in repeated:
+                    self.cache.invalidate(message_id)
+                    self._remember(message_id)
+                elif str(message_id) in applied_ids:
+                    self.cache.apply(message_id, update_data)
+                    self._remember(message_id)
+                else:
+                    self.cache.invalidate(message_id)
+        ended = {str(message_id) for message_id, update_data, _ in updates if update_data.get("status") == "ended"}
+        self._release([str_id for str_id in applied if str_id in ended])
+        return applied
+
+    def _release(self, str_ids):
+        # Sorteio encerrado não recebe mais entradas: grava e libera a memória
+        if not str_ids:
+            return
+        self._closed.update(str_ids)
+        self.flush()
+        for str_id in str_ids:
+            participants = self._participants.pop(str_id, None)
+            if participants is not None:
+                # Contagem final fica no cache: cliques no resultado não voltam ao backend
+                self.cache.put_count(str_id, len(participants))
+
+    def end_giveaway_db(self, message_id):
+        """Marca um sorteio como finalizado no DB sem apagar os dados"""
+        self.update_giveaway(message_id, {"status": "ended"})
+
+    def has_participant(self, message_id, user_id):
+        participants = self._participant_set(message_id)
+        return participants is not None and normalize_user_id(user_id) in participants
+
+    def is_closed(self, message_id):
+        return str(message_id) in self._closed
+
+    def close_entries(self, message_id):
+        """Recusa entradas novas enquanto o sorteio é encerrado (desfeito por reopen_entries)"""
+        self._closed.add(str(message_id))
+
+    def reopen_entries(self, message_id):
+        self._closed.discard(str(message_id))
+
+    def add_participant(self, message_id, user_id, weight=1):
+        if self.is_closed(message_id):
+            return False
+        participants = self._participant_set(message_id)
+        if participants is None:
+            return False
+
+        user_id = normalize_user_id(user_id)
+        if not participants.add(user_id):
+            return False
+
+        self._queue.put((str(message_id), user_id, weight))
+        return True
+
+    def load_participants(self, message_id):
+        return self._participant_set(message_id) is not None
+
+    def participants_loaded(self, message_id):
+        return str(message_id) in self._participants
+
+    def cached_participant_count(self, message_id):
+        """Contagem sem E/S (conjunto em memória ou cache); None se for preciso ir ao backend"""
+        participants = self._participants.get(str(message_id))
+        if participants is not None:
+            return len(participants)
+        return self.cache.get_count(message_id)
+
+    def participant_count(self, message_id):
+        count = self.cached_participant_count(message_id)
+        if count is not None:
+            return count
+        # Sem conjunto em memória não há entradas pendentes: conta direto no backend
+        with self._timed("count"):
+            count = self.backend.count_participants(message_id)
+            # Só muda de novo com entradas novas, que carregam o conjunto em memória
+            self.cache.put_count(message_id, count)
+        return count
+
+    def participant_source(self, message_id):
+        """Acesso indexado aos participantes gravados, para o sorteio"""
+        self.flush()
+        return ParticipantSource(self, str(message_id))
+
+    def participant_entries(self, message_id):
+        """Pares (user_id, peso) gravados, na ordem de entrada
+
+        Pode ser percorrido fora do executor do banco (exportação): cada bloco
+        é lido do backend sob o _io_lock, sem correr com a thread de escrita.
+        """
+        self.flush()
+        entries = self.backend.iter_entries(str(message_id))
+        while True:
+            with self._timed("entries"):
+                chunk = list(itertools.islice(entries, ENTRY_CHUNK))
+            if not chunk:
+                return
+            yield from chunk
+
+    def alias_table(self, message_id, rebuild=False):
+        """Tabela de alias do sorteio ponderado: a gravada ou, se faltar, montada e gravada
+
+        `rebuild` monta de novo a partir das entradas (no fim do sorteio,
+        quando não entra mais ninguém); rerolls reaproveitam a gravada.
+        """
+        str_id = str(message_id)
+        table = None if rebuild else self._alias_tables.get(str_id)
+        if table is None:
+            raw = None
+            if not rebuild:
+                with self._timed("load_alias"):
+                    raw = self.backend.load_alias_table(str_id)
+            if raw is not None:
+                table = AliasTable.from_bytes(raw)
+            else:
+                table = AliasTable.build(weight for _, weight in self.participant_entries(str_id))
+                with self._timed("save_alias"):
+                    self.backend.save_alias_table(str_id, table.to_bytes())
+        self._alias_tables[str_id] = table
+        self._alias_tables.move_to_end(str_id)
+        while len(self._alias_tables) > ALIAS_CACHE_SIZE:
+            self._alias_tables.popitem(last=False)
+        return table
+
+    def iter_giveaways(self, status=None, due_before=None, include_participants=True, limit=None):
+        # Entradas pendentes precisam estar no backend antes da leitura em massa
+        if include_participants:
+            self.flush()
+        with self._timed("scan"):
+            return list(self.backend.iter_giveaways(
+                status=status, due_before=due_before, include_participants=include_participants, limit=limit
+            ))
+
+    def revalidate(self, message_id):
+        """Confere no backend um sorteio lido do cache; False (e memória limpa) se ele saiu do banco
+
+        Com vários processos, outro pode ter arquivado e apagado o sorteio sem
+        que o cache deste fique sabendo.
+        """
+        str_id = str(message_id)
+        with self._timed("load"):
+            exists = self.backend.get_giveaway(str_id, include_participants=False) is not None
+            if not exists:
+                self.cache.invalidate(str_id)
+        if not exists:
+            self._participants.pop(str_id, None)
+            self._alias_tables.pop(str_id, None)
+        return exists
+
+    def delete_giveaways(self, versions):
+        """Tira sorteios do armazenamento (ex.: depois de arquivados)"""
+        self.flush()
+        with self._timed("delete"):
+            deleted = self.backend.delete_giveaways(versions)
+            for message_id in versions:
+                self.cache.invalidate(message_id)
+        for str_id in deleted:
+            self._participants.pop(str_id, None)
+            self._alias_tables.pop(str_id, None)
+            self._closed.discard(str_id)
+        return deleted
+
+    def close(self):
+        self._queue.close()
+        with self._io_lock:
+            self.backend.close()
+
+
+class ParticipantSource:
+    """Visão somente-leitura dos participantes de um sorteio (sem materializar a lista)"""
+
+    def __init__(self, db, message_id):
+        self.db = db
+        self.message_id = message_id
+
+    def __len__(self):
+        with self.db._io_lock:
+            return self.db.backend.count_participants(self.message_id)
+
+    def __getitem__(self, index):
+        with self.db._io_lock:
+            return self.db.backend.participant_at(self.message_id, index)
+
+    def __iter__(self):
+        # O lock é liberado entre blocos; a ordem de entrada é estável
+        return self.db.backend.iter_participants(self.message_id)
+
+
+# --- Fachada Assíncrona ---
+class AsyncDatabase:
+    """Executa a E/S do banco em um executor dedicado, fora do event loop"""
+
+    def __init__(self, db):
+        self.db = db
+        # Uma única thread: as escritas saem na ordem em que foram enviadas
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+        # message_id -> (alterações acumuladas, future da escrita)
+        self._pending_updates = {}
+        # Leituras em voo por (operação, message_id): uma rajada de cliques vira uma só ida ao executor
+        self._inflight = {}
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def _shared(self, key, fn, *args):
+        waiters = self._inflight.get(key)
+        if waiters is None:
+            waiters = self._inflight[key] = []
+            asyncio.ensure_future(self._resolve(key, fn, args))
+        # Um future simples por chamador: cancelar um não cancela a leitura dos outros
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        return await waiter
+
+    async def _resolve(self, key, fn, args):
+        try:
+            result = await self._run(fn, *args)
+        except Exception as e:
+            for waiter in self._inflight.pop(key):
+                if not waiter.done():
+                    waiter.set_exception(e)
+        else:
+            for waiter in self._inflight.pop(key):
+                if not waiter.done():
+                    waiter.set_result(result)
+
+    async def arun(self, fn, *args, **kwargs):
+        """Executa qualquer função de banco no executor dedicado"""
+        return await self._run(fn, *args, **kwargs)
+
+    async def aget(self, message_id, include_participants=True):
+        if not include_participants:
+            # Acerto no cache não precisa passar pelo executor
+            data = self.db.cache.get(message_id)
+            if data is not None:
+                return data
+            data = await self._shared(("get", str(message_id)), self.db.get_giveaway, message_id, False)
+            # Cada chamador recebe a sua cópia do resultado compartilhado
+            return None if data is None else copy_giveaway(data)
+        return await self._run(self.db.get_giveaway, message_id, include_participants=include_participants)
+
+    async def aupdate(self, message_id, update_data, expected_version=None):
+        str_id = str(message_id)
+        entry = self._pending_updates.get(str_id)
+        if expected_version is not None:
+            # Compare-and-set não se junta a outras escritas; espera as pendentes saírem antes
+            if entry is not None:
+                await asyncio.shield(entry[1])
+            await self._run(self.db.update_giveaway, str_id, update_data, expected_version=expected_version)
+            return
+        if entry is None:
+            entry = ({}, asyncio.get_running_loop().create_future())
+            self._pending_updates[str_id] = entry
+            # A escrita só sai na próxima volta do loop, juntando chamadas concorrentes
+            asyncio.create_task(self._write_update(str_id))
+        entry[0].update(update_data)
+        await asyncio.shield(entry[1])
+
+    async def _write_update(self, str_id):
+        changes, future = self._pending_updates.pop(str_id)
+        try:
+            await self._run(self.db.update_giveaway, str_id, changes)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(None)
+
+    async def settle(self, message_ids):
+        """Espera as escritas agrupadas ainda pendentes destes sorteios"""
+        for message_id in message_ids:
+            entry = self._pending_updates.get(str(message_id))
+            if entry is not None:
+                await asyncio.shield(entry[1])
+
+    async def aend_giveaway(self, message_id):
+        await self.aupdate(message_id, {"status": "ended"})
+
+    async def aparticipant_count(self, message_id):
+        count = self.db.cached_participant_count(message_id)
+        if count is not None:
+            return count
+        return await self._shared(("count", str(message_id)), self.db.participant_count, message_id)
+
+    async def aload_participants(self, message_id):
+        """Deixa o conjunto de participantes em memória (a partir daí, entradas sem E/S)"""
+        if not self.db.participants_loaded(message_id):
+            await self._shared(("participants", str(message_id)), self.db.load_participants, message_id)
+
+    async def aadd_participant(self, message_id, user_id, weight=1):
+        if self.db.participants_loaded(message_id):
+            # Conjunto já em memória: verificação O(1), sem E/S
+            return self.db.add_participant(message_id, user_id, weight)
+        return await self._run(self.db.add_participant, message_id, user_id, weight)
+
+    async def aiter_giveaways(self, status=None, due_before=None, include_participants=True, limit=None):
+        return await self._run(
+            self.db.iter_giveaways,
+            status=status, due_before=due_before, include_participants=include_participants, limit=limit
+        )
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.db.close()